@@ -0,0 +1,75 @@
+import os
+import secrets
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.models.database import async_engine
+from app.services.export import EXPORT_CHUNK_ROWS, EXPORT_TABLES, ExportFilters, encoder_for, export_query
+from app.services.query_budget import query_budget
+
+router = APIRouter()
+
+# Exports cover every student: off unless a token is configured
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN", "")
+
+def require_export_token(authorization: Optional[str] = Header(None)):
+    if not EXPORT_TOKEN:
+        raise HTTPException(status_code=404, detail="Export is not enabled")
+    if not secrets.compare_digest(authorization or "", f"Bearer {EXPORT_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid export token")
+
+@router.get("/{table}")
+@query_budget(1)
+async def export_table(
+    table: str,
+    format: str = "csv",
+    user_id: Optional[str] = None,
+    topic_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    _: None = Depends(require_export_token),
+):
+    """
+    Stream `sessions`, `session_items`, `user_question_state` or `review_log`
+    as CSV or Parquet (chunked transfer, constant memory):
+    1. One query, read through a server-side cursor EXPORT_CHUNK_ROWS rows at a time
+    2. Each chunk is encoded and sent before the next one is fetched
+    Filters: user_id, topic_id and a [since, until) range on the table's time column.
+    """
+    export = EXPORT_TABLES.get(table)
+    if export is None:
+        raise HTTPException(status_code=404, detail=f"Unknown table; one of: {', '.join(EXPORT_TABLES)}")
+    try:
+        encoder = encoder_for(export, format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except ImportError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+
+    query, params = export_query(export, ExportFilters(user_id, topic_id, since, until))
+    # Its own connection: the response outlives the request's dependencies
+    conn = await async_engine.connect()
+    try:
+        result = await conn.stream(query, params, execution_options={"yield_per": EXPORT_CHUNK_ROWS})
+    except BaseException:
+        await conn.close()
+        raise
+
+    async def body():
+        try:
+            yield encoder.begin()
+            async for rows in result.partitions(EXPORT_CHUNK_ROWS):
+                yield encoder.encode(rows)
+            yield encoder.finish()
+        finally:
+            await result.close()
+            await conn.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=encoder.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}.{encoder.extension}"'},
+    )
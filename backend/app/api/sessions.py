@@ -1,13 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
-import uuid
 
-from app.models.database import get_db
-from app.models.models import User, Topic, Question, Session as DbSession, SessionItem, UserQuestionState
+from app.models.database import get_async_db
+from app.models.models import Session as DbSession, SessionItem
+from app.services.answer_buffer import answer_buffer
+from app.services.catalog_cache import catalog_cache
+from app.services.fsrs_service import CONFIDENCE_TO_RATING
+from app.services.query_budget import query_budget
+from app.services.response_cache import data_versions
+from app.services.session_queue import session_queues
+from app.services.session_store import (
+    complete_session as store_complete_session,
+    insert_session_with_items,
+    load_session_for_completion,
+    session_id_at,
+)
 
 router = APIRouter()
 
@@ -34,128 +45,83 @@ class CreateSessionResponse(BaseModel):
     questions: List[QuestionResponse]
 
 @router.post("", response_model=CreateSessionResponse)
-async def create_session(request: CreateSessionRequest, db: Session = Depends(get_db)):
+@query_budget(2)
+async def create_session(request: CreateSessionRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Start a new practice session for a topic.
     Algorithm:
     1. Priority 1: Questions due for review (FSRS)
     2. Priority 2: New questions never seen
     3. Priority 3: (Optional fallback) Random review if exhausted
+    The order is usually precomputed (app/services/session_queue.py).
     """
-    # 1. Validate User & Topic
-    user = db.query(User).filter(User.id == request.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    topic = db.query(Topic).filter(Topic.id == request.topic_id).first()
+    # 1. Validate Topic (catalog cache, no DB round trip)
+    catalog = await catalog_cache.get(db)
+    topic = catalog.topics.get(request.topic_id)
     if not topic:
         raise HTTPException(status_code=404, detail="Topic not found")
 
-    # 2. Fetch Questions
+    # 2. Fetch Questions: the first N of the precomputed queue, or (queue
+    # missing/stale) user lookup + the user's states in one query, new
+    # questions sampled in memory from the catalog, stored as the next queue
     now = datetime.now(timezone.utc)
-    
-    # Priority 1: Due Questions
-    # Join with UserQuestionState to check next_due_at
-    due_questions = db.query(Question)\
-        .join(UserQuestionState, Question.id == UserQuestionState.question_id)\
-        .filter(
-            UserQuestionState.user_id == request.user_id,
-            Question.topic_id == request.topic_id,
-            UserQuestionState.next_due_at <= now,
-            Question.class_level == user.class_level
-        )\
-        .order_by(UserQuestionState.next_due_at.asc())\
-        .limit(request.session_size)\
-        .all()
-        
-    # Priority 2: New Questions
-    remaining_slots = request.session_size - len(due_questions)
-    new_questions = []
-    
-    if remaining_slots > 0:
-        # Subquery for questions user has already seen
-        seen_questions_subquery = db.query(UserQuestionState.question_id).filter(
-            UserQuestionState.user_id == request.user_id
+    queue, stamp = await session_queues.lookup(request.user_id, request.topic_id, catalog.version, now)
+    session_question_ids = queue.take(request.session_size) if queue else None
+    if session_question_ids is not None:
+        class_level = queue.class_level
+        # Served: the next start gets the rest, then a rebuilt queue
+        await session_queues.consume(request.user_id, request.topic_id, queue, len(session_question_ids))
+    else:
+        selection = await session_queues.build(
+            db,
+            user_id=request.user_id,
+            topic_id=request.topic_id,
+            stamp=stamp,
+            catalog_version=catalog.version,
+            pool_for_class=lambda class_level: catalog.question_ids_for(request.topic_id, class_level),
+            now=now,
+            limit=request.session_size,
+            served=request.session_size,
         )
-        
-        new_questions = db.query(Question).filter(
-            Question.topic_id == request.topic_id,
-            Question.class_level == user.class_level,
-            ~Question.id.in_(seen_questions_subquery)
-        )\
-        .order_by(func.random())\
-        .limit(remaining_slots)\
-        .all()
-        
-    session_questions = due_questions + new_questions
-    
-    # Priority 3: Fallback (if total < session_size, just fill with random already-done questions)
-    # This ensures the user can always practice even if "mastered" everything.
-    remaining_slots = request.session_size - len(session_questions)
-    if remaining_slots > 0:
-         # Exclude questions we already picked
-         picked_ids = [q.id for q in session_questions]
-         
-         extra_questions = db.query(Question).filter(
-             Question.topic_id == request.topic_id,
-             Question.class_level == user.class_level,
-             ~Question.id.in_(picked_ids)
-         )\
-         .order_by(func.random())\
-         .limit(remaining_slots)\
-         .all()
-         
-         session_questions.extend(extra_questions)
+        if selection.class_level is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        class_level = selection.class_level
+        session_question_ids = selection.question_ids[:request.session_size]
+    
+    # Question content comes from the catalog cache (options already parsed)
+    session_questions = [catalog.questions[qid] for qid in session_question_ids if qid in catalog.questions]
     
     if not session_questions:
         # Should only happen if the topic has literally 0 questions in DB
         raise HTTPException(status_code=400, detail="No questions available for this topic/level")
 
-    # 3. Create Session Record
-    session_id = str(uuid.uuid4())
-    session = DbSession(
-        id=session_id,
+    # 3. Create Session Record + Session Items (one multi-row write)
+    session_id = session_id_at(now)
+    await insert_session_with_items(
+        db,
+        session_id=session_id,
         user_id=request.user_id,
         topic_id=request.topic_id,
-        status="in_progress",
-        started_at=now
+        class_level=class_level,
+        started_at=now,
+        question_ids=[q.id for q in session_questions],
     )
-    db.add(session)
-    
-    # 4. Create Session Items
-    response_questions = []
-    for idx, q in enumerate(session_questions):
-        sequence = idx + 1
-        item = SessionItem(
-            id=str(uuid.uuid4()),
-            session_id=session_id,
-            question_id=q.id,
-            sequence=sequence
-        )
-        db.add(item)
-        
-        # Handle options safely
-        options = q.options
-        if isinstance(options, str):
-            import json
-            try:
-                options = json.loads(options)
-            except:
-                options = []
-        elif options is None:
-            options = []
-            
-        response_questions.append(QuestionResponse(
+    await db.commit()
+    answer_buffer.register_session(session_id, request.user_id, [q.id for q in session_questions])
+    await data_versions.bump(request.user_id)
+    
+    # 4. Build the response from the catalog (nothing to read back)
+    response_questions = [
+        QuestionResponse(
             id=q.id,
-            sequence=sequence,
+            sequence=idx + 1,
             type=q.type,
             prompt_text=q.prompt_text,
             prompt_image_url=q.prompt_image_url,
-            options=options
-        ))
-        
-    db.commit()
-    db.refresh(session)
+            options=list(q.options)
+        )
+        for idx, q in enumerate(session_questions)
+    ]
     
     return CreateSessionResponse(
         session_id=session_id,
@@ -167,6 +133,7 @@ class SubmitAnswerRequest(BaseModel):
     user_id: str
     question_id: str
     answer: str # The option string or key, e.g. "A" or "A) ..."
+    confidence: Optional[str] = None # 'guessed' | 'pretty_sure' | 'very_sure' (PRD 6.3)
 
 class SubmitAnswerResponse(BaseModel):
     success: bool
@@ -181,32 +148,64 @@ class SubmitAnswerResponse(BaseModel):
     
 
 @router.post("/{session_id}/answer", response_model=SubmitAnswerResponse)
+@query_budget(2)
 async def submit_answer(
     session_id: str, 
     request: SubmitAnswerRequest, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Submit an answer for a question in a session.
+    With ANSWER_WRITE_BEHIND the answer is checked in memory and the
+    session_items write is batched (see app/services/answer_buffer.py).
     """
     now = datetime.now(timezone.utc)
+    if request.confidence is not None and request.confidence not in CONFIDENCE_TO_RATING:
+        raise HTTPException(
+            status_code=400, detail=f"confidence must be one of: {', '.join(CONFIDENCE_TO_RATING)}"
+        )
+    
+    if answer_buffer.enabled:
+        active = await answer_buffer.active_session(db, session_id)
+        if (
+            not active
+            or active.user_id != request.user_id
+            or request.question_id not in active.question_ids
+        ):
+            raise HTTPException(status_code=404, detail="Session item not found or session not active")
+        
+        catalog = await catalog_cache.get(db)
+        correct_opt = catalog.answer_keys.get(request.question_id)
+        if correct_opt is None:
+            raise HTTPException(status_code=404, detail="Question not found")
+        
+        user_ans = (request.answer or "").strip()
+        is_correct = (user_ans.lower() == correct_opt.lower())
+        answer_buffer.add(session_id, request.question_id, user_ans, is_correct, request.confidence, now)
+        await data_versions.bump(request.user_id)
+        
+        return SubmitAnswerResponse(success=True, is_correct=is_correct, correct_answer="")
     
     # 1. Get Session Item
     # We join with Session to verify user_id ownership implicitly or explicitly
-    session_item = db.query(SessionItem).join(DbSession)\
-        .filter(
+    item_result = await db.execute(
+        select(SessionItem).join(DbSession)
+        .where(
             SessionItem.session_id == session_id,
             SessionItem.question_id == request.question_id,
             DbSession.user_id == request.user_id,
             DbSession.status == "in_progress"
-        ).first()
+        )
+    )
+    session_item = item_result.scalars().first()
         
     if not session_item:
         raise HTTPException(status_code=404, detail="Session item not found or session not active")
         
-    # 2. Validate Answer
-    question = db.query(Question).filter(Question.id == request.question_id).first()
-    if not question:
+    # 2. Validate Answer (answer key comes from the catalog cache)
+    catalog = await catalog_cache.get(db)
+    correct_opt = catalog.answer_keys.get(request.question_id)
+    if correct_opt is None:
          raise HTTPException(status_code=404, detail="Question not found")
     
     # Simple MCQ check: exact match of the option key (e.g. "A") or the full text?
@@ -214,18 +213,20 @@ async def submit_answer(
     # We'll normalize to be safe.
     
     user_ans = (request.answer or "").strip()
-    correct_opt = (question.correct_option or "")
     
     is_correct = (user_ans.lower() == correct_opt.lower())
     
     # 3. Update Session Item
     session_item.user_answer = user_ans
     session_item.is_correct = is_correct
+    session_item.confidence = request.confidence
     session_item.answered_at = now
     
-    db.commit()
+    await db.commit()
+    await data_versions.bump(request.user_id)
     
-    # Note: We do NOT update FSRS state here. That happens at session completion.
+    # Note: We do NOT update FSRS state here. That happens at session completion
+    # (confidence picks the rating of a right answer).
     
     return SubmitAnswerResponse(
         success=True,
@@ -233,4 +234,54 @@ async def submit_answer(
         correct_answer="" # Hidden for now as per PRD 8.2
     )
 
-# Missing: POST /{session_id}/complete
+class CompleteSessionRequest(BaseModel):
+    user_id: str
+
+class CompleteSessionResponse(BaseModel):
+    success: bool
+    session_id: str
+    redirect_url: str
+
+@router.post("/{session_id}/complete", response_model=CompleteSessionResponse)
+@query_budget(3)
+async def complete_session(
+    session_id: str,
+    request: CompleteSessionRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Complete a session and apply FSRS scheduling to every answered item.
+    Constant round trips regardless of session size:
+    1. One read: session + items + the user's current states
+    2. FSRS in memory (wrong -> Again, correct -> Good, or by confidence:
+       guessed -> Hard, very sure -> Easy)
+    3. One write: session status + review_log + bulk upsert of user_question_state
+    4. Refresh the user's dashboard aggregates for the topic
+    """
+    now = datetime.now(timezone.utc)
+    
+    # Buffered answers must be in session_items before they are scheduled
+    # (the flush is not counted against this route's budget)
+    await answer_buffer.flush_session(session_id)
+    
+    session = await load_session_for_completion(db, session_id)
+    if not session or session.user_id != request.user_id:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    # Completing twice (e.g. a retried request) must not re-apply FSRS
+    if session.status == "in_progress":
+        await store_complete_session(db, session_id, session, now)
+        await db.commit()
+        answer_buffer.forget_session(session_id)
+        await data_versions.bump(request.user_id)
+        # New FSRS state: the precomputed next session is out of date
+        await session_queues.invalidate(request.user_id)
+        session_queues.schedule(request.user_id, session.topic_id)
+    elif session.status != "completed":
+        raise HTTPException(status_code=400, detail="Session is not active")
+    
+    return CompleteSessionResponse(
+        success=True,
+        session_id=session_id,
+        redirect_url=f"/sessions/{session_id}/summary"
+    )
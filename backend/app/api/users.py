@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
-from app.models.database import get_db
+from app.models.database import get_async_db
 from app.models.models import User
-from app.services.user_id_service import generate_user_id
+from app.services.query_budget import query_budget
+from app.services.response_cache import data_versions
+from app.services.session_queue import session_queues
+from app.services.user_id_service import create_user_with_new_id
 
 router = APIRouter()
 
@@ -20,9 +23,11 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 @router.post("", response_model=UserResponse)
+# Sequence lease (once per block) + insert; one spare for a legacy ID clash
+@query_budget(3)
 async def create_user(
     request: UserCreateRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new user with an 8-digit numeric ID.
@@ -30,8 +35,6 @@ async def create_user(
     or with grade/class (for complete user creation).
     """
     try:
-        user_id = generate_user_id(db)
-        
         # If grade_level and class_level are provided, create complete user
         if request.grade_level and request.class_level:
             if request.grade_level not in ['SMP', 'SMA']:
@@ -39,24 +42,16 @@ async def create_user(
             if request.class_level not in range(7, 13):
                 raise HTTPException(status_code=400, detail="class_level must be between 7 and 12")
             
-            user = User(
-                id=user_id,
-                grade_level=request.grade_level,
-                class_level=request.class_level
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
+            user = await create_user_with_new_id(db, request.grade_level, request.class_level)
         else:
             # Create user with default values (will be updated later)
-            user = User(
-                id=user_id,
+            user = await create_user_with_new_id(
+                db,
                 grade_level='SMP',  # Default, will be updated
                 class_level=7  # Default, will be updated
             )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
+        await db.commit()
+        user_id = user.id
         
         return UserResponse(
             user_id=user_id,
@@ -98,12 +93,13 @@ async def create_user(
             )
 
 @router.get("/{user_id}")
+@query_budget(1)
 async def get_user(
     user_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -119,13 +115,14 @@ class UserUpdateRequest(BaseModel):
     class_level: Optional[int] = None
 
 @router.patch("/{user_id}")
+@query_budget(2)
 async def update_user(
     user_id: str,
     request: UserUpdateRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user's grade level and class level"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -139,8 +136,12 @@ async def update_user(
             raise HTTPException(status_code=400, detail="class_level must be between 7 and 12")
         user.class_level = request.class_level
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await data_versions.bump(user_id)
+    if request.class_level:
+        # Queues are per class level
+        await session_queues.invalidate(user_id)
+    await db.refresh(user)
     
     return {
         "id": user.id,
@@ -150,12 +151,13 @@ async def update_user(
     }
 
 @router.get("/{user_id}/validate")
+@query_budget(1)
 async def validate_user(
     user_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Validate if user ID exists"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
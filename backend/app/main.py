@@ -1,14 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+from app.models.database import async_engine, get_pool_stats
+from app.services.answer_buffer import answer_buffer
+from app.services.cache import cache
+from app.services.catalog_cache import catalog_cache
+from app.services.metrics import MetricsMiddleware, install_query_hooks, render_metrics
+from app.services.query_budget import QUERY_BUDGET_MODE, QueryBudgetMiddleware, install_query_budget_hooks
+from app.services.session_queue import session_queues
+
+# Per-request DB query count and time (see app/services/metrics.py)
+install_query_hooks(async_engine.sync_engine)
+# Route query budgets and slow-query logging (see app/services/query_budget.py)
+install_query_budget_hooks(async_engine.sync_engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the question catalog so the first sessions don't pay for it
+    await catalog_cache.start()
+    await answer_buffer.start()
+    await session_queues.start()
+    yield
+    await session_queues.stop()
+    # Write buffered answers before the process exits
+    await answer_buffer.stop()
+    await catalog_cache.stop()
+    await cache.close()
+
 app = FastAPI(
     title="Math Practice API",
     description="Backend API for Math Deliberate Practice MVP",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -19,6 +48,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if QUERY_BUDGET_MODE != "off":
+    app.add_middleware(QueryBudgetMiddleware)
+# Added last so it is outermost and times the whole request
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 async def root():
@@ -28,12 +61,23 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/health/db")
+async def health_db():
+    """Connection pool usage, for sizing replicas against the DB connection cap"""
+    return {"status": "healthy", "pools": get_pool_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint: per-route latency and DB usage, pool stats"""
+    return PlainTextResponse(render_metrics(get_pool_stats()), media_type="text/plain; version=0.0.4")
+
 # Import and include routers
 # Import and include routers
-from app.api import users, dashboard, sessions
+from app.api import users, dashboard, sessions, export
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
 app.include_router(sessions.router, prefix="/api/sessions", tags=["sessions"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
 # TODO: Add topics router if needed in later phases
 # from app.api import topics
 # app.include_router(topics.router, prefix="/api/topics", tags=["topics"])
@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from uuid import uuid4
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,16 +16,177 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
-engine = create_engine(DATABASE_URL)
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# Pool configuration. Size these against the Supabase connection cap:
+# replicas * (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below it.
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)  # seconds to wait for a free connection
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)  # seconds; -1 disables
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)  # 0 disables
+# Set when DATABASE_URL points at PgBouncer / Supavisor in transaction mode
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER", False)
+# Let the external pooler own all pooling (one connection per checkout)
+DB_NULL_POOL = _env_bool("DB_NULL_POOL", False)
+
+def to_async_url(url: str) -> str:
+    """
+    Map a sync Postgres URL (psycopg2) onto the asyncpg driver.
+    asyncpg does not understand libpq's `sslmode`, so it is passed on as `ssl`.
+    """
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+
+    parsed = make_url(url)
+    if parsed.drivername in ("postgresql", "postgresql+psycopg2"):
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+
+    if "sslmode" in parsed.query:
+        sslmode = parsed.query["sslmode"]
+        parsed = parsed.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+
+    return parsed.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+class PoolMetrics:
+    """Checkout counters for one engine's connection pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+        self.connections_opened = 0
+
+    def observe_checkout(self, wait_seconds: float):
+        self.checkouts += 1
+        self.checkout_wait_seconds_total += wait_seconds
+        self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, wait_seconds)
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "pool_size": pool.size() if hasattr(pool, "size") else 0,
+            "max_overflow": 0 if DB_NULL_POOL else DB_MAX_OVERFLOW,
+            "in_use": pool.checkedout() if hasattr(pool, "checkedout") else 0,
+            "idle": pool.checkedin() if hasattr(pool, "checkedin") else 0,
+            # QueuePool counts overflow from -pool_size; only report real overflow
+            "overflow": max(pool.overflow(), 0) if hasattr(pool, "overflow") else 0,
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "checkout_wait_seconds_total": round(self.checkout_wait_seconds_total, 6),
+            "checkout_wait_seconds_max": round(self.checkout_wait_seconds_max, 6),
+            "connections_opened": self.connections_opened,
+        }
+
+def _instrumented_pool(pool_class, metrics: PoolMetrics):
+    """Subclass `pool_class` so every checkout records how long it waited"""
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                record = super()._do_get()
+            except exc.TimeoutError:
+                metrics.checkout_timeouts += 1
+                raise
+            metrics.observe_checkout(time.perf_counter() - start)
+            return record
+
+    return InstrumentedPool
+
+def _pool_kwargs(pool_class, metrics: PoolMetrics) -> dict:
+    if DB_NULL_POOL:
+        return {"poolclass": _instrumented_pool(NullPool, metrics), "pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "poolclass": _instrumented_pool(pool_class, metrics),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _sync_connect_args() -> dict:
+    # Transaction-mode poolers reject startup options; set statement_timeout
+    # on the database role instead (ALTER ROLE ... SET statement_timeout).
+    if DB_STATEMENT_TIMEOUT_MS and not DB_PGBOUNCER:
+        return {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+def _async_connect_args() -> dict:
+    args = {}
+    if DB_PGBOUNCER:
+        # Server connections are shared between clients, so asyncpg must not
+        # cache prepared statements or reuse its sequential statement names.
+        args["statement_cache_size"] = 0
+        args["prepared_statement_cache_size"] = 0
+        args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    elif DB_STATEMENT_TIMEOUT_MS:
+        args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    return args
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+# Sync engine: used by scripts and maintenance commands
+engine = create_engine(
+    DATABASE_URL,
+    connect_args=_sync_connect_args(),
+    **_pool_kwargs(QueuePool, sync_pool_metrics),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: used by the API so DB round trips don't block the event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=_async_connect_args(),
+    **_pool_kwargs(AsyncAdaptedQueuePool, async_pool_metrics),
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+@event.listens_for(engine, "connect")
+def _count_sync_connect(dbapi_connection, connection_record):
+    sync_pool_metrics.connections_opened += 1
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _count_async_connect(dbapi_connection, connection_record):
+    async_pool_metrics.connections_opened += 1
+
+def get_pool_stats() -> dict:
+    """Current pool usage for both engines (see /health/db)"""
+    return {
+        "async": async_pool_metrics.snapshot(async_engine.sync_engine.pool),
+        "sync": sync_pool_metrics.snapshot(engine.pool),
+    }
+
 Base = declarative_base()
 
 def get_db():
-    """Dependency for getting database session"""
+    """Dependency for getting database session (sync, for scripts)"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency for getting an async database session (API handlers)"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, JSON, Numeric, Text, CheckConstraint
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, Date, DateTime, Float, ForeignKey, JSON, Numeric, Text, CheckConstraint
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.database import Base
@@ -57,6 +58,9 @@ class UserQuestionState(Base):
     
     user_id = Column(String(8), ForeignKey("users.id"), primary_key=True)
     question_id = Column(String, ForeignKey("questions.id"), primary_key=True)
+    # Copied from the question by a trigger (migration 009) for slice lookups
+    topic_id = Column(String, nullable=False)
+    class_level = Column(Integer, nullable=False)
     
     state = Column(String(20), nullable=False, default="new")  # new, learning, review, relearning
     stability = Column(Numeric, nullable=False, default=0)
@@ -67,13 +71,19 @@ class UserQuestionState(Base):
     last_result_correct = Column(Boolean, nullable=True)
     last_reviewed_at = Column(DateTime(timezone=True), nullable=True)
     next_due_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # What the last review started from, to replay it (migration 014)
+    last_rating = Column(Integer, nullable=True)  # fsrs Rating
+    last_state_before = Column(String(20), nullable=True)
+    last_stability_before = Column(Numeric, nullable=True)
+    last_difficulty_before = Column(Numeric, nullable=True)
+    last_elapsed_days = Column(Integer, nullable=True)
     
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class Session(Base):
     __tablename__ = "sessions"
     
-    id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True)  # time-ordered, see session_store.session_id_at
     user_id = Column(String(8), ForeignKey("users.id"), nullable=False)
     topic_id = Column(String, ForeignKey("topics.id"), nullable=False)
     
@@ -89,11 +99,71 @@ class SessionItem(Base):
     __tablename__ = "session_items"
     
     id = Column(String, primary_key=True)
-    session_id = Column(String, ForeignKey("sessions.id"), nullable=False)
+    # Partition key (migration 010), hence part of the primary key
+    session_id = Column(String, ForeignKey("sessions.id"), primary_key=True)
     question_id = Column(String, ForeignKey("questions.id"), nullable=False)
     
     sequence = Column(Integer, nullable=False)
     user_answer = Column(String, nullable=True)
     is_correct = Column(Boolean, nullable=True)
+    confidence = Column(String, nullable=True)  # 'guessed', 'pretty_sure', 'very_sure'
     answered_at = Column(DateTime(timezone=True), nullable=True)
 
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+    
+    id = Column(Boolean, primary_key=True, default=True)  # single-row table
+    version = Column(BigInteger, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class UserTopicStats(Base):
+    __tablename__ = "user_topic_stats"
+    
+    user_id = Column(String(8), ForeignKey("users.id"), primary_key=True)
+    class_level = Column(Integer, primary_key=True)
+    topic_id = Column(String, ForeignKey("topics.id"), primary_key=True)
+    
+    seen_count = Column(Integer, nullable=False, default=0)
+    due_dates = Column(ARRAY(DateTime), nullable=False, default=list)  # sorted times at which seen cards become due
+    due_counts = Column(ARRAY(Integer), nullable=False, default=list)  # cards due by each of those times (running total)
+    last_practiced_at = Column(DateTime(timezone=True), nullable=True)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class UserDailyActivity(Base):
+    __tablename__ = "user_daily_activity"
+    
+    user_id = Column(String(8), ForeignKey("users.id"), primary_key=True)
+    activity_date = Column(Date, primary_key=True)  # local date in STREAK_TIMEZONE (Asia/Jakarta)
+    sessions_started = Column(Integer, nullable=False, default=0)
+
+
+class UserStreak(Base):
+    __tablename__ = "user_streaks"
+    
+    user_id = Column(String(8), ForeignKey("users.id"), primary_key=True)
+    current_streak = Column(Integer, nullable=False, default=0)  # run of days ending at last_active_date
+    longest_streak = Column(Integer, nullable=False, default=0)
+    last_active_date = Column(Date, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ReviewLog(Base):
+    __tablename__ = "review_log"
+
+    # Append-only: one row per review scheduled at session completion
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(String(8), ForeignKey("users.id"), nullable=False)
+    question_id = Column(String, ForeignKey("questions.id"), nullable=False)
+    session_id = Column(String, nullable=False)  # no foreign key: old session partitions are dropped
+    class_level = Column(Integer, nullable=False)
+
+    rating = Column(Integer, nullable=False)  # fsrs Rating: 0 again .. 3 easy
+    confidence = Column(String, nullable=True)
+    state_before = Column(String, nullable=False)
+    elapsed_days = Column(Float, nullable=True)  # since the card's previous review
+
+    reviewed_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,220 @@
+"""
+Write-behind buffer for answer submissions (optional, ANSWER_WRITE_BEHIND=true).
+
+In this mode `POST /api/sessions/{id}/answer` checks the answer against the
+cached answer key and a registry of active sessions, acknowledges right away
+and leaves the `session_items` update here. Pending answers are written in
+one statement when the buffer reaches ANSWER_FLUSH_BATCH_SIZE or every
+ANSWER_FLUSH_INTERVAL_MS, before a session is completed and on shutdown.
+
+Answers live in process memory until flushed, so a crash loses at most one
+flush interval, and all requests of a session must reach the same replica
+(sticky sessions or a single instance) for completion to see them.
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import AsyncSessionLocal
+from app.services.query_budget import untracked
+
+logger = logging.getLogger(__name__)
+
+ANSWER_WRITE_BEHIND = os.getenv("ANSWER_WRITE_BEHIND", "false").strip().lower() in ("1", "true", "yes", "on")
+ANSWER_FLUSH_INTERVAL_MS = int(os.getenv("ANSWER_FLUSH_INTERVAL_MS", "250"))
+ANSWER_FLUSH_BATCH_SIZE = int(os.getenv("ANSWER_FLUSH_BATCH_SIZE", "200"))
+# Active sessions kept in memory; older ones are reloaded from the DB on use
+ACTIVE_SESSION_CACHE_SIZE = int(os.getenv("ACTIVE_SESSION_CACHE_SIZE", "10000"))
+
+LOAD_ACTIVE_SESSION_SQL = text("""
+SELECT s.user_id, i.question_id
+FROM sessions s
+JOIN session_items i ON i.session_id = s.id
+WHERE s.id = :session_id AND s.status = 'in_progress'
+""")
+
+# Only sessions still in progress accept answers, as in the synchronous path
+FLUSH_ANSWERS_SQL = text("""
+UPDATE session_items AS i
+SET user_answer = a.user_answer,
+    is_correct = a.is_correct,
+    confidence = a.confidence,
+    answered_at = a.answered_at
+FROM unnest(
+    CAST(:session_ids AS text[]),
+    CAST(:question_ids AS text[]),
+    CAST(:answers AS text[]),
+    CAST(:is_correct AS boolean[]),
+    CAST(:confidences AS text[]),
+    CAST(:answered_at AS timestamptz[])
+) AS a(session_id, question_id, user_answer, is_correct, confidence, answered_at),
+sessions s
+WHERE i.session_id = a.session_id
+  AND i.question_id = a.question_id
+  AND s.id = a.session_id
+  AND s.status = 'in_progress'
+""")
+
+@dataclass(frozen=True)
+class ActiveSession:
+    user_id: str
+    question_ids: FrozenSet[str]
+
+@dataclass
+class PendingAnswer:
+    user_answer: str
+    is_correct: bool
+    confidence: Optional[str]
+    answered_at: datetime
+
+AnswerKey = Tuple[str, str]  # (session_id, question_id)
+
+class AnswerBuffer:
+    def __init__(self, enabled: bool = ANSWER_WRITE_BEHIND):
+        self.enabled = enabled
+        self._sessions: "OrderedDict[str, ActiveSession]" = OrderedDict()
+        self._pending: Dict[AnswerKey, PendingAnswer] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    # Session registry
+
+    def register_session(self, session_id: str, user_id: str, question_ids: Iterable[str]):
+        """Remember a new session so answers can be checked without a query"""
+        if not self.enabled:
+            return
+        self._sessions[session_id] = ActiveSession(user_id=user_id, question_ids=frozenset(question_ids))
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > ACTIVE_SESSION_CACHE_SIZE:
+            self._sessions.popitem(last=False)
+
+    def forget_session(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def active_session(self, db: AsyncSession, session_id: str) -> Optional[ActiveSession]:
+        """Registry lookup, falling back to the DB (restart, other replica, evicted)"""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            return session
+
+        rows = (await db.execute(LOAD_ACTIVE_SESSION_SQL, {"session_id": session_id})).all()
+        if not rows:
+            return None
+        self.register_session(session_id, rows[0].user_id, (row.question_id for row in rows))
+        return self._sessions.get(session_id)
+
+    # Buffering
+
+    def add(
+        self,
+        session_id: str,
+        question_id: str,
+        user_answer: str,
+        is_correct: bool,
+        confidence: Optional[str],
+        answered_at: datetime,
+    ):
+        """Queue an answer; a later answer to the same item replaces it"""
+        self._pending[(session_id, question_id)] = PendingAnswer(user_answer, is_correct, confidence, answered_at)
+        if len(self._pending) >= ANSWER_FLUSH_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def flush(self, session_id: Optional[str] = None) -> int:
+        """
+        Write pending answers (all, or one session's) in one statement.
+        Returns how many were written. On failure they are put back.
+        """
+        async with self._flush_lock:
+            if session_id is None:
+                batch, self._pending = self._pending, {}
+            else:
+                keys = [key for key in self._pending if key[0] == session_id]
+                batch = {key: self._pending.pop(key) for key in keys}
+            if not batch:
+                return 0
+
+            try:
+                # The answers came in with earlier requests: the write does not
+                # count against the budget of the request that triggers it
+                with untracked():
+                    async with AsyncSessionLocal() as db:
+                        await db.execute(FLUSH_ANSWERS_SQL, _flush_params(batch))
+                        await db.commit()
+            except BaseException:
+                # Also on cancellation: keep anything answered again meanwhile,
+                # retry on the next flush
+                for key, answer in batch.items():
+                    self._pending.setdefault(key, answer)
+                raise
+            return len(batch)
+
+    async def flush_session(self, session_id: str) -> int:
+        if not self.enabled:
+            return 0
+        return await self.flush(session_id)
+
+    async def _run(self):
+        interval = ANSWER_FLUSH_INTERVAL_MS / 1000
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Flushing %d buffered answers failed", self.pending_count)
+
+    async def start(self):
+        if self.enabled and self._flusher is None:
+            self._stopping = False
+            self._flusher = asyncio.create_task(self._run())
+            logger.info(
+                "Answer write-behind enabled (every %dms or %d answers)",
+                ANSWER_FLUSH_INTERVAL_MS, ANSWER_FLUSH_BATCH_SIZE,
+            )
+
+    async def stop(self):
+        """
+        Stop the background flusher and write whatever is still pending.
+        The flusher is not cancelled: a write in progress finishes first.
+        """
+        if self._flusher is not None:
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                # Cancelled from outside; its batch went back to _pending
+                pass
+            self._flusher = None
+        if self._pending:
+            written = await self.flush()
+            logger.info("Flushed %d buffered answers on shutdown", written)
+
+def _flush_params(batch: Dict[AnswerKey, PendingAnswer]) -> dict:
+    keys: List[AnswerKey] = list(batch)
+    return {
+        "session_ids": [session_id for session_id, _ in keys],
+        "question_ids": [question_id for _, question_id in keys],
+        "answers": [batch[key].user_answer for key in keys],
+        "is_correct": [batch[key].is_correct for key in keys],
+        "confidences": [batch[key].confidence for key in keys],
+        "answered_at": [batch[key].answered_at for key in keys],
+    }
+
+answer_buffer = AnswerBuffer()
@@ -0,0 +1,188 @@
+"""
+Shared cache used by the API layer.
+
+CACHE_URL picks the backend:
+- unset / "memory://": in-process LRU with per-key TTL (per replica, cold
+  after every deploy; fine for one instance and for local development)
+- "redis://..." / "rediss://...": any Redis-protocol server, shared by all
+  replicas and surviving deploys (needs the `cache` extra: redis)
+
+The cache only ever saves work: if Redis cannot be reached, RedisCache
+logs the error and answers as if the key were missing (reads) or drops the
+write, so requests fall back to the database instead of failing. Entries
+written before an outage can then outlive it by up to their TTL.
+
+Values are bytes. `SingleFlight` collapses concurrent builds of the same key
+in this process so a cold key is computed once, not once per request.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "mikir:")
+MEMORY_CACHE_MAX_ENTRIES = int(os.getenv("MEMORY_CACHE_MAX_ENTRIES", "20000"))
+
+T = TypeVar("T")
+
+class CacheBackend:
+    """Minimal key/value interface; `ttl` is in seconds, None = no expiry"""
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set only if the key does not exist; True if it was set"""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_many([key]))[0]
+
+class MemoryCache(CacheBackend):
+    """LRU + TTL dictionary, bounded to `max_entries` keys"""
+
+    def __init__(self, max_entries: int = MEMORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float]):
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [self._lookup(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._store(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        if self._lookup(key) is not None:
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+class RedisCache(CacheBackend):
+    """Redis (or any RESP-compatible server) via redis-py's asyncio client"""
+
+    def __init__(self, url: str, prefix: str = CACHE_KEY_PREFIX):
+        try:
+            from redis import RedisError
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:
+            raise ImportError(
+                "CACHE_URL points at Redis but redis is not installed: pip install \"mikir-kids-backend[cache]\""
+            ) from exc
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+        self._errors = RedisError
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl is not None else None
+
+    def _failed(self, operation: str, exc: Exception):
+        logger.warning("Redis cache %s failed: %s", operation, exc)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        try:
+            return await self._client.mget([self._key(key) for key in keys])
+        except self._errors as exc:
+            self._failed("read", exc)
+            return [None] * len(keys)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        try:
+            await self._client.set(self._key(key), value, px=self._px(ttl))
+        except self._errors as exc:
+            self._failed("write", exc)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        try:
+            return bool(await self._client.set(self._key(key), value, px=self._px(ttl), nx=True))
+        except self._errors as exc:
+            self._failed("write", exc)
+            return False
+
+    async def delete(self, key: str):
+        try:
+            await self._client.delete(self._key(key))
+        except self._errors as exc:
+            self._failed("delete", exc)
+
+    async def close(self):
+        await self._client.aclose()
+
+class SingleFlight:
+    """Run at most one build per key at a time; concurrent callers share its result"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, build: Callable[[], Awaitable[T]]) -> T:
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await build()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Nobody else may be waiting; don't log "exception never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+def create_cache(url: str = CACHE_URL) -> CacheBackend:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        logger.info("Using Redis cache at %s", url.split("@")[-1])
+        return RedisCache(url)
+    if url.startswith("memory://"):
+        return MemoryCache()
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+cache = create_cache()
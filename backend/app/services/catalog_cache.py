@@ -0,0 +1,199 @@
+"""
+In-process cache of the question catalog (topics + questions).
+
+Content only changes through migrations/imports, so each replica loads it once
+and serves hot paths (session creation, answer checking, dashboard topics)
+from memory. A version stamp in `catalog_version` is polled in the background;
+when it changes the catalog is reloaded.
+"""
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import AsyncSessionLocal
+from app.models.models import CatalogVersion, Question, Topic
+from app.services.cache import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_CHECK_SECONDS = int(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "60"))
+
+@dataclass(frozen=True)
+class CachedTopic:
+    id: str
+    name: str
+    short_code: str
+    grade_level: str
+    class_levels: Tuple[int, ...]
+
+@dataclass(frozen=True)
+class CachedQuestion:
+    id: str
+    topic_id: str
+    class_level: int
+    type: str
+    prompt_text: str
+    prompt_image_url: Optional[str]
+    options: Tuple[str, ...]
+    correct_option: str
+
+@dataclass
+class Catalog:
+    version: int
+    topics: Dict[str, CachedTopic] = field(default_factory=dict)
+    topics_by_grade_class: Dict[Tuple[str, int], List[CachedTopic]] = field(default_factory=dict)
+    questions: Dict[str, CachedQuestion] = field(default_factory=dict)
+    questions_by_topic_class: Dict[Tuple[str, int], List[CachedQuestion]] = field(default_factory=dict)
+    question_ids_by_topic_class: Dict[Tuple[str, int], Tuple[str, ...]] = field(default_factory=dict)
+    answer_keys: Dict[str, str] = field(default_factory=dict)
+
+    def topics_for(self, grade_level: str, class_level: int) -> List[CachedTopic]:
+        return self.topics_by_grade_class.get((grade_level, class_level), [])
+
+    def questions_for(self, topic_id: str, class_level: int) -> List[CachedQuestion]:
+        return self.questions_by_topic_class.get((topic_id, class_level), [])
+
+    def question_ids_for(self, topic_id: str, class_level: int) -> Tuple[str, ...]:
+        """Id list used for in-memory sampling of new questions"""
+        return self.question_ids_by_topic_class.get((topic_id, class_level), ())
+
+def _parse_options(options) -> Tuple[str, ...]:
+    if isinstance(options, str):
+        try:
+            options = json.loads(options)
+        except ValueError:
+            options = []
+    elif options is None:
+        options = []
+    return tuple(options)
+
+async def _fetch_version(db: AsyncSession) -> int:
+    version = await db.scalar(select(CatalogVersion.version))
+    return int(version or 0)
+
+async def _load_catalog(db: AsyncSession) -> Catalog:
+    version = await _fetch_version(db)
+    catalog = Catalog(version=version)
+
+    topics = (await db.execute(select(Topic).order_by(Topic.id))).scalars().all()
+    for t in topics:
+        topic = CachedTopic(
+            id=t.id,
+            name=t.name,
+            short_code=t.short_code,
+            grade_level=t.grade_level,
+            class_levels=tuple(t.class_levels or ()),
+        )
+        catalog.topics[topic.id] = topic
+        for class_level in topic.class_levels:
+            catalog.topics_by_grade_class.setdefault((topic.grade_level, class_level), []).append(topic)
+
+    rows = (await db.execute(
+        select(
+            Question.id,
+            Question.topic_id,
+            Question.class_level,
+            Question.type,
+            Question.prompt_text,
+            Question.prompt_image_url,
+            Question.options,
+            Question.correct_option,
+        ).order_by(Question.topic_id, Question.class_level, Question.id)
+    )).all()
+    for row in rows:
+        question = CachedQuestion(
+            id=row.id,
+            topic_id=row.topic_id,
+            class_level=row.class_level,
+            type=row.type,
+            prompt_text=row.prompt_text,
+            prompt_image_url=row.prompt_image_url,
+            options=_parse_options(row.options),
+            correct_option=row.correct_option or "",
+        )
+        catalog.questions[question.id] = question
+        catalog.questions_by_topic_class.setdefault((question.topic_id, question.class_level), []).append(question)
+        catalog.answer_keys[question.id] = question.correct_option
+
+    for key, questions in catalog.questions_by_topic_class.items():
+        catalog.question_ids_by_topic_class[key] = tuple(q.id for q in questions)
+
+    return catalog
+
+class CatalogCache:
+    """Holds the current Catalog and reloads it when the version stamp changes"""
+
+    def __init__(self):
+        self._catalog: Optional[Catalog] = None
+        self._lock = asyncio.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+        self._single_flight = SingleFlight()
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._catalog.version if self._catalog else None
+
+    async def get(self, db: Optional[AsyncSession] = None) -> Catalog:
+        """Return the cached catalog, loading it on first use (read-through)"""
+        if self._catalog is None:
+            # Concurrent cold requests share one load
+            await self._single_flight.do("catalog", lambda: self.reload(db))
+        return self._catalog
+
+    async def reload(self, db: Optional[AsyncSession] = None):
+        async with self._lock:
+            if db is not None:
+                catalog = await _load_catalog(db)
+            else:
+                async with AsyncSessionLocal() as own_db:
+                    catalog = await _load_catalog(own_db)
+            self._catalog = catalog
+            logger.info(
+                "Loaded question catalog v%s (%d topics, %d questions)",
+                catalog.version, len(catalog.topics), len(catalog.questions),
+            )
+
+    async def refresh_if_stale(self):
+        """Reload when the database version stamp differs from the cached one"""
+        async with AsyncSessionLocal() as db:
+            version = await _fetch_version(db)
+        if version != self.version:
+            await self.reload()
+
+    def invalidate(self):
+        self._catalog = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(CATALOG_VERSION_CHECK_SECONDS)
+            try:
+                await self.refresh_if_stale()
+            except Exception:
+                logger.exception("Catalog version check failed")
+
+    async def start(self):
+        """Warm the cache and start the version watcher (app startup)"""
+        try:
+            await self.reload()
+        except Exception:
+            # Don't block startup on the DB; the first request will load it
+            logger.exception("Could not preload question catalog")
+        if self._watcher is None and CATALOG_VERSION_CHECK_SECONDS > 0:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+catalog_cache = CatalogCache()
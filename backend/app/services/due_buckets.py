@@ -0,0 +1,29 @@
+"""
+Hourly due buckets for background work.
+
+A card's bucket hour is the first full hour (UTC) at or after its FSRS
+`next_due_at`. The session queue builder (session_queue.py) batches its
+background rebuilds on these hours instead of waking up for every card.
+
+Due counts do not use them: the dashboard (topic_stats.py, migration 015)
+and session selection both count a card as due once `next_due_at <= now`.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.services.fsrs_service import as_utc
+
+DUE_BUCKET = timedelta(hours=1)
+
+def due_cutoff(now: datetime) -> datetime:
+    """Start of the hour `now` is in (UTC)"""
+    now = as_utc(now).astimezone(timezone.utc)
+    return now.replace(minute=0, second=0, microsecond=0)
+
+def due_hour(due_at: Optional[datetime]) -> Optional[datetime]:
+    """Bucket hour of a due time: the first full hour at or after it"""
+    if due_at is None:
+        return None
+    due_at = as_utc(due_at).astimezone(timezone.utc)
+    start = due_cutoff(due_at)
+    return start if start == due_at else start + DUE_BUCKET
@@ -0,0 +1,231 @@
+"""
+Streaming exports of practice data: CSV, or Parquet with the `export` extra.
+
+Rows are read through a server-side cursor, EXPORT_CHUNK_ROWS at a time, and
+each chunk is encoded and handed on before the next one is fetched, so an
+export takes the same memory whatever its size, in the API
+(GET /api/export/{table}, a chunked HTTP response) and in
+scripts/export_data.py (a file or stdout).
+
+Exports can be filtered by user, topic and a [since, until) time range on
+the table's time column. Session IDs are time-ordered (migration 010), so a
+range on session start also bounds the ID and only the months in it are
+read. In-progress sessions from before migration 010 kept random IDs and
+only show up in exports without a time range.
+"""
+import csv
+import io
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from app.services.fsrs_service import as_utc
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+@dataclass(frozen=True)
+class ExportTable:
+    name: str
+    select: str  # SELECT ... FROM ..., without WHERE / ORDER BY
+    order_by: str
+    columns: Tuple[Tuple[str, str], ...]  # (name, kind): text, int, float, bool, timestamp
+    user_column: str
+    topic_column: str
+    time_column: str
+    # Session ID columns bounded by the time range (time_column is session start)
+    session_id_columns: Tuple[str, ...] = ()
+
+EXPORT_TABLES: Dict[str, ExportTable] = {
+    table.name: table for table in (
+        ExportTable(
+            name="sessions",
+            select="SELECT s.id, s.user_id, s.topic_id, s.status, s.started_at, s.completed_at FROM sessions s",
+            order_by="s.id",
+            columns=(
+                ("id", "text"), ("user_id", "text"), ("topic_id", "text"), ("status", "text"),
+                ("started_at", "timestamp"), ("completed_at", "timestamp"),
+            ),
+            user_column="s.user_id",
+            topic_column="s.topic_id",
+            time_column="s.started_at",
+            session_id_columns=("s.id",),
+        ),
+        ExportTable(
+            name="session_items",
+            select="""SELECT i.session_id, s.user_id, s.topic_id, i.sequence, i.question_id,
+                             i.user_answer, i.is_correct, i.confidence, i.answered_at
+                      FROM session_items i
+                      JOIN sessions s ON s.id = i.session_id""",
+            order_by="i.session_id, i.sequence",
+            columns=(
+                ("session_id", "text"), ("user_id", "text"), ("topic_id", "text"), ("sequence", "int"),
+                ("question_id", "text"), ("user_answer", "text"), ("is_correct", "bool"),
+                ("confidence", "text"), ("answered_at", "timestamp"),
+            ),
+            user_column="s.user_id",
+            topic_column="s.topic_id",
+            time_column="s.started_at",
+            session_id_columns=("i.session_id", "s.id"),
+        ),
+        ExportTable(
+            name="user_question_state",
+            select="""SELECT s.user_id, s.question_id, s.topic_id, s.class_level, s.state, s.stability,
+                             s.difficulty, s.reps, s.lapses, s.last_result_correct, s.last_reviewed_at,
+                             s.next_due_at
+                      FROM user_question_state s""",
+            order_by="s.user_id, s.question_id",
+            columns=(
+                ("user_id", "text"), ("question_id", "text"), ("topic_id", "text"), ("class_level", "int"),
+                ("state", "text"), ("stability", "float"), ("difficulty", "float"), ("reps", "int"),
+                ("lapses", "int"), ("last_result_correct", "bool"), ("last_reviewed_at", "timestamp"),
+                ("next_due_at", "timestamp"),
+            ),
+            user_column="s.user_id",
+            topic_column="s.topic_id",
+            time_column="s.last_reviewed_at",
+        ),
+        ExportTable(
+            name="review_log",
+            select="""SELECT r.id, r.user_id, r.question_id, q.topic_id, r.session_id, r.class_level, r.rating,
+                             r.confidence, r.state_before, r.elapsed_days, r.reviewed_at
+                      FROM review_log r
+                      JOIN questions q ON q.id = r.question_id""",
+            order_by="r.id",
+            columns=(
+                ("id", "int"), ("user_id", "text"), ("question_id", "text"), ("topic_id", "text"),
+                ("session_id", "text"), ("class_level", "int"), ("rating", "int"), ("confidence", "text"),
+                ("state_before", "text"), ("elapsed_days", "float"), ("reviewed_at", "timestamp"),
+            ),
+            user_column="r.user_id",
+            topic_column="q.topic_id",
+            time_column="r.reviewed_at",
+        ),
+    )
+}
+
+@dataclass
+class ExportFilters:
+    user_id: Optional[str] = None
+    topic_id: Optional[str] = None
+    since: Optional[datetime] = None  # inclusive
+    until: Optional[datetime] = None  # exclusive
+
+def export_query(table: ExportTable, filters: ExportFilters):
+    """The table's SELECT with the filters applied, and its parameters"""
+    conditions, params = [], {}
+    if filters.user_id is not None:
+        conditions.append(f"{table.user_column} = :user_id")
+        params["user_id"] = filters.user_id
+    if filters.topic_id is not None:
+        conditions.append(f"{table.topic_column} = :topic_id")
+        params["topic_id"] = filters.topic_id
+    for name, op in (("since", ">="), ("until", "<")):
+        value = getattr(filters, name)
+        if value is None:
+            continue
+        conditions.append(f"{table.time_column} {op} CAST(:{name} AS timestamptz)")
+        for column in table.session_id_columns:
+            conditions.append(f"{column} {op} session_id_floor(CAST(:{name} AS timestamptz))")
+        params[name] = as_utc(value)
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return text(f"{table.select}{where} ORDER BY {table.order_by}"), params
+
+class CsvEncoder:
+    media_type = "text/csv; charset=utf-8"
+    extension = "csv"
+
+    def __init__(self, table: ExportTable):
+        self._columns = [name for name, _ in table.columns]
+
+    def begin(self) -> bytes:
+        return self.encode([self._columns])
+
+    def encode(self, rows: Sequence[Sequence]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+    def finish(self) -> bytes:
+        return b""
+
+class _ChunkSink(io.RawIOBase):
+    """File object the Parquet writer writes to; drained after every row group"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class ParquetEncoder:
+    """One row group per chunk; the footer is written by `finish`"""
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self, table: ExportTable):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError(
+                "Parquet export needs pyarrow: pip install \"mikir-kids-backend[export]\""
+            ) from exc
+        self._pa = pa
+        types = {
+            "text": pa.string(),
+            "int": pa.int64(),
+            "float": pa.float64(),
+            "bool": pa.bool_(),
+            "timestamp": pa.timestamp("us", tz="UTC"),
+        }
+        self._kinds = [kind for _, kind in table.columns]
+        self._schema = pa.schema([(name, types[kind]) for name, kind in table.columns])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression="zstd")
+
+    def begin(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence[Sequence]) -> bytes:
+        if not rows:
+            return b""
+        arrays = []
+        for values, kind, field in zip(zip(*rows), self._kinds, self._schema):
+            if kind == "float":
+                # NUMERIC columns come back as Decimal
+                values = [None if v is None else float(v) for v in values]
+            arrays.append(self._pa.array(values, type=field.type))
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+def encoder_for(table: ExportTable, export_format: str):
+    """Raises ValueError for an unknown format, ImportError if pyarrow is missing"""
+    if export_format == "csv":
+        return CsvEncoder(table)
+    if export_format == "parquet":
+        return ParquetEncoder(table)
+    raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
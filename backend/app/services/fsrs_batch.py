@@ -0,0 +1,185 @@
+"""
+Vectorized FSRS scheduling for re-scheduling many cards at once.
+
+Same model and update rules as `fsrs.FSRS.repeat` (fsrs==0.1.0), applied to
+NumPy arrays instead of one `Card` at a time, so parameter changes can be
+rolled over millions of `user_question_state` rows in seconds.
+`test_fsrs_batch.py` checks it against the scalar scheduler.
+
+Needs numpy: pip install "mikir-kids-backend[batch]"
+"""
+import math
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Tuple
+
+try:
+    import numpy as np
+except ImportError as exc:
+    raise ImportError(
+        "app.services.fsrs_batch needs numpy: pip install \"mikir-kids-backend[batch]\""
+    ) from exc
+
+from fsrs import Rating, State
+from fsrs.models import Parameters
+
+# Integer codes, identical to fsrs.State / fsrs.Rating
+NEW, LEARNING, REVIEW, RELEARNING = (int(s) for s in (State.New, State.Learning, State.Review, State.Relearning))
+AGAIN, HARD, GOOD, EASY = (int(r) for r in (Rating.Again, Rating.Hard, Rating.Good, Rating.Easy))
+
+STATE_CODES = {"new": NEW, "learning": LEARNING, "review": REVIEW, "relearning": RELEARNING}
+STATE_NAMES = {code: name for name, code in STATE_CODES.items()}
+
+SECONDS_PER_DAY = 86400
+
+# Short learning steps used by fsrs for new and lapsed cards
+NEW_STEP_SECONDS = np.array([60, 5 * 60, 10 * 60], dtype=np.int64)  # again, hard, good
+AGAIN_STEP_SECONDS = 5 * 60
+
+def _default_weights() -> Tuple[float, ...]:
+    return tuple(Parameters().w)
+
+@dataclass(frozen=True)
+class BatchParameters:
+    """Mirror of fsrs.Parameters; override fields to try tuned values"""
+    w: Tuple[float, ...] = field(default_factory=_default_weights)
+    request_retention: float = 0.9
+    maximum_interval: int = 36500
+    easy_bonus: float = 1.3
+    hard_factor: float = 1.2
+
+@dataclass
+class BatchResult:
+    state: "np.ndarray"  # int8 state codes
+    stability: "np.ndarray"
+    difficulty: "np.ndarray"
+    interval_seconds: "np.ndarray"  # int64, due = now + interval
+    scheduled_days: "np.ndarray"  # int64, 0 for minute steps
+    lapsed: "np.ndarray"  # bool, lapses += 1
+
+    def due_dates(self, now: datetime) -> "np.ndarray":
+        """Due timestamps as datetime64[us] (UTC)"""
+        if now.tzinfo is not None:
+            now = now.astimezone(timezone.utc).replace(tzinfo=None)
+        return np.datetime64(now, "us") + self.interval_seconds.astype("timedelta64[s]")
+
+def next_interval(stability: "np.ndarray", p: BatchParameters) -> "np.ndarray":
+    """Days until the next review; np.rint rounds half to even like round()"""
+    days = stability * math.log(p.request_retention) / math.log(0.9)
+    return np.clip(np.rint(days), 1, p.maximum_interval).astype(np.int64)
+
+def init_stability(rating: "np.ndarray", p: BatchParameters) -> "np.ndarray":
+    return np.maximum(p.w[0] + p.w[1] * rating, 0.1)
+
+def init_difficulty(rating: "np.ndarray", p: BatchParameters) -> "np.ndarray":
+    return np.clip(p.w[2] + p.w[3] * (rating - 2), 1, 10)
+
+def next_difficulty(difficulty: "np.ndarray", rating: "np.ndarray", p: BatchParameters) -> "np.ndarray":
+    next_d = difficulty + p.w[4] * (rating - 2)
+    return np.clip(p.w[5] * p.w[2] + (1 - p.w[5]) * next_d, 1, 10)
+
+def next_recall_stability(d, s, r, p: BatchParameters) -> "np.ndarray":
+    return s * (1 + np.exp(p.w[6]) * (11 - d) * np.power(s, p.w[7]) * (np.exp((1 - r) * p.w[8]) - 1))
+
+def next_forget_stability(d, s, r, p: BatchParameters) -> "np.ndarray":
+    return p.w[9] * np.power(d, p.w[10]) * np.power(s, p.w[11]) * np.exp((1 - r) * p.w[12])
+
+def schedule_batch(
+    state,
+    stability,
+    difficulty,
+    elapsed_days,
+    rating,
+    params: BatchParameters = BatchParameters(),
+) -> BatchResult:
+    """
+    Apply one review with `rating` to every card.
+
+    `state` and `rating` are fsrs integer codes, `elapsed_days` is whole days
+    since the last review (what `FSRS.repeat` computes from `last_review`).
+    Arrays must have the same length; inputs are not modified.
+    """
+    state = np.asarray(state, dtype=np.int8)
+    stability = np.asarray(stability, dtype=np.float64)
+    difficulty = np.asarray(difficulty, dtype=np.float64)
+    elapsed_days = np.asarray(elapsed_days, dtype=np.float64)
+    rating = np.asarray(rating, dtype=np.int64)
+    p = params
+
+    new_state = state.copy()
+    new_s = stability.copy()
+    new_d = difficulty.copy()
+    interval = np.zeros(state.shape, dtype=np.int64)
+    days = np.zeros(state.shape, dtype=np.int64)
+    lapsed = np.zeros(state.shape, dtype=bool)
+
+    # New cards: initial stability/difficulty, minute steps unless Easy
+    m = state == NEW
+    if m.any():
+        r = rating[m]
+        s = init_stability(r, p)
+        new_s[m] = s
+        new_d[m] = init_difficulty(r, p)
+        easy = r == EASY
+        new_state[m] = np.where(easy, REVIEW, LEARNING)
+        easy_days = next_interval(s * p.easy_bonus, p)
+        step = NEW_STEP_SECONDS[np.minimum(r, GOOD)]
+        interval[m] = np.where(easy, easy_days * SECONDS_PER_DAY, step)
+        days[m] = np.where(easy, easy_days, 0)
+        lapsed[m] = r == AGAIN
+
+    # Learning / relearning: stability and difficulty are left as they are
+    m = (state == LEARNING) | (state == RELEARNING)
+    if m.any():
+        r = rating[m]
+        s = stability[m]
+        hard_days = next_interval(s, p)
+        good_days = np.maximum(next_interval(s, p), hard_days + 1)
+        easy_days = np.maximum(next_interval(s * p.easy_bonus, p), good_days + 1)
+        graduated = np.select([r == HARD, r == GOOD], [hard_days, good_days], easy_days)
+        again = r == AGAIN
+        new_state[m] = np.where(again, state[m], REVIEW)
+        days[m] = np.where(again, 0, graduated)
+        interval[m] = np.where(again, AGAIN_STEP_SECONDS, graduated * SECONDS_PER_DAY)
+
+    # Review: update memory state from retrievability at review time
+    m = state == REVIEW
+    if m.any():
+        r = rating[m]
+        last_s = stability[m]
+        last_d = difficulty[m]
+        retrievability = np.exp(math.log(0.9) * elapsed_days[m] / last_s)
+
+        d = next_difficulty(last_d, r, p)
+        s = np.where(
+            r == AGAIN,
+            next_forget_stability(d, last_s, retrievability, p),
+            next_recall_stability(d, last_s, retrievability, p),
+        )
+        # Every interval depends on the Good (and Easy) outcome, whatever the rating
+        good_s = next_recall_stability(next_difficulty(last_d, GOOD, p), last_s, retrievability, p)
+        easy_s = next_recall_stability(next_difficulty(last_d, EASY, p), last_s, retrievability, p)
+
+        good_days = next_interval(good_s, p)
+        hard_days = np.minimum(next_interval(last_s * p.hard_factor, p), good_days)
+        good_days = np.maximum(good_days, hard_days + 1)
+        # fsrs 0.1.0 scales the easy interval by hard_factor here, not easy_bonus
+        easy_days = np.maximum(next_interval(easy_s * p.hard_factor, p), good_days + 1)
+
+        again = r == AGAIN
+        graduated = np.select([r == HARD, r == GOOD], [hard_days, good_days], easy_days)
+        new_s[m] = s
+        new_d[m] = d
+        new_state[m] = np.where(again, LEARNING, REVIEW)
+        days[m] = np.where(again, 0, graduated)
+        interval[m] = np.where(again, AGAIN_STEP_SECONDS, graduated * SECONDS_PER_DAY)
+        lapsed[m] = again
+
+    return BatchResult(
+        state=new_state,
+        stability=new_s,
+        difficulty=new_d,
+        interval_seconds=interval,
+        scheduled_days=days,
+        lapsed=lapsed,
+    )
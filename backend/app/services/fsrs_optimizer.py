@@ -0,0 +1,299 @@
+"""
+Fit FSRS weights to our own students' review history (review_log).
+
+Every card's logged reviews are replayed with the fsrs==0.1.0 update rules
+(the formulas of app/services/fsrs_batch.py) and the 13 weights are tuned
+to minimize the log loss of the predicted recall probability on reviews of
+cards in the review state. Each cohort (the question's class level) gets its
+own weights. Everything runs on the CPU with NumPy:
+
+- the log is streamed in chunks and kept as compact per-cohort arrays
+  (`HistoryBuilder`, about 6 bytes a review),
+- cards are sorted by number of reviews and cut into mini-batches, each one
+  a padded [review x card] matrix replayed a review step at a time,
+- gradients are central differences: the weights and their 26 perturbations
+  are replayed together as one [27 x cards] array, then Adam takes a step.
+
+`scripts/optimize_fsrs.py` runs it against the database.
+Needs numpy: pip install "mikir-kids-backend[batch]"
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from app.services.fsrs_batch import (
+    AGAIN,
+    NEW,
+    REVIEW,
+    STATE_CODES,
+    BatchParameters,
+    init_difficulty,
+    init_stability,
+    next_difficulty,
+    next_forget_stability,
+    next_recall_stability,
+)
+
+DEFAULT_WEIGHTS = BatchParameters().w
+
+# Search space per weight, around fsrs 0.1.0's defaults; keeps every formula finite
+WEIGHT_BOUNDS = np.array([
+    (0.1, 10.0),    # w0  initial stability after Again
+    (0.01, 5.0),    # w1  initial stability per rating step
+    (1.0, 10.0),    # w2  initial difficulty after Good
+    (-3.0, -0.01),  # w3  initial difficulty per rating step
+    (-3.0, -0.01),  # w4  difficulty change per rating step
+    (0.0, 0.5),     # w5  mean reversion of difficulty
+    (0.0, 3.0),     # w6  stability growth after a recall (log scale)
+    (-0.8, -0.01),  # w7  ... by current stability
+    (0.01, 3.0),    # w8  ... by how much was forgotten
+    (0.1, 5.0),     # w9  stability after a lapse
+    (-2.0, -0.01),  # w10 ... by difficulty
+    (0.01, 0.9),    # w11 ... by previous stability
+    (0.01, 4.0),    # w12 ... by how much was forgotten
+])
+
+# Central difference step, relative to the weight
+GRADIENT_STEP = 1e-4
+PROBABILITY_FLOOR = 1e-6
+
+# A whole table scan; the card index returns rows already in card order
+STREAM_REVIEW_LOG_SQL = text("""
+SELECT user_id, question_id, class_level, rating, state_before, elapsed_days
+FROM review_log
+ORDER BY user_id, question_id, reviewed_at, id
+""")
+
+@dataclass
+class CohortHistory:
+    """Every logged review of one cohort, card after card"""
+    rating: "np.ndarray"  # int8 fsrs rating codes
+    state: "np.ndarray"  # int8 fsrs state code before the review
+    elapsed_days: "np.ndarray"  # float32, whole days since the previous review
+    card_starts: "np.ndarray"  # int64, first review of each card, plus the end
+
+    @property
+    def cards(self) -> int:
+        return len(self.card_starts) - 1
+
+    @property
+    def reviews(self) -> int:
+        return len(self.rating)
+
+    @property
+    def observations(self) -> int:
+        """Reviews the loss is computed on"""
+        return int(np.count_nonzero(_observed(self.state, self.elapsed_days)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.rating.nbytes + self.state.nbytes + self.elapsed_days.nbytes + self.card_starts.nbytes
+
+def _observed(state, elapsed_days) -> "np.ndarray":
+    # Same-day reviews of review cards say nothing about forgetting
+    return (state == REVIEW) & (elapsed_days >= 1)
+
+class HistoryBuilder:
+    """
+    Collects review_log rows, in card order, chunk by chunk into compact
+    per-cohort arrays; a card may continue in the next chunk.
+    """
+
+    def __init__(self):
+        self._parts: Dict[int, List[Tuple["np.ndarray", ...]]] = defaultdict(list)
+        self._last_card: Optional[Tuple[str, str]] = None
+        self.rows = 0
+
+    def add(self, rows: Sequence) -> None:
+        if not rows:
+            return
+        cards = [(row.user_id, row.question_id) for row in rows]
+        starts = np.fromiter(
+            (card != previous for card, previous in zip(cards, [self._last_card] + cards[:-1])),
+            dtype=bool, count=len(rows),
+        )
+        self._last_card = cards[-1]
+        self.rows += len(rows)
+
+        cohort = np.fromiter((row.class_level for row in rows), dtype=np.int64, count=len(rows))
+        rating = np.fromiter((row.rating for row in rows), dtype=np.int8, count=len(rows))
+        state = np.fromiter((STATE_CODES[row.state_before] for row in rows), dtype=np.int8, count=len(rows))
+        # fsrs 0.1.0 counts whole days since the last review; first reviews have none
+        elapsed = np.fromiter(
+            (row.elapsed_days if row.elapsed_days is not None else 0.0 for row in rows),
+            dtype=np.float64, count=len(rows),
+        )
+        elapsed = np.floor(elapsed).astype(np.float32)
+
+        for level in np.unique(cohort):
+            m = cohort == level
+            self._parts[int(level)].append((rating[m], state[m], elapsed[m], starts[m]))
+
+    def build(self) -> Dict[int, CohortHistory]:
+        """
+        One history per cohort. Cards whose first logged review is not a first
+        review (seen before the log existed) can't be replayed and are left out.
+        """
+        histories = {}
+        for level, parts in sorted(self._parts.items()):
+            rating, state, elapsed, starts = (np.concatenate(column) for column in zip(*parts))
+            first = np.flatnonzero(starts)
+            lengths = np.diff(np.append(first, len(rating)))
+            keep = state[first] == NEW
+            rows = np.repeat(keep, lengths)
+            histories[level] = CohortHistory(
+                rating=rating[rows],
+                state=state[rows],
+                elapsed_days=elapsed[rows],
+                card_starts=np.concatenate(([0], np.cumsum(lengths[keep]))).astype(np.int64),
+            )
+        return histories
+
+def read_review_log(connection, chunk_size: int = 50_000, on_chunk=None) -> Dict[int, CohortHistory]:
+    """Stream review_log through a server-side cursor (sync connection)"""
+    builder = HistoryBuilder()
+    result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(
+        STREAM_REVIEW_LOG_SQL
+    )
+    for rows in result.partitions(chunk_size):
+        builder.add(rows)
+        if on_chunk is not None:
+            on_chunk(builder.rows)
+    return builder.build()
+
+@dataclass
+class Batch:
+    """Padded [review x card] matrices; padding has state -1 and is never replayed"""
+    rating: "np.ndarray"
+    state: "np.ndarray"
+    elapsed_days: "np.ndarray"
+    observations: int
+
+def make_batches(history: CohortHistory, batch_cards: int = 512) -> List[Batch]:
+    """Cards of similar length together, so little of each matrix is padding"""
+    starts = history.card_starts[:-1]
+    lengths = np.diff(history.card_starts)
+    order = np.argsort(lengths, kind="stable")
+    batches = []
+    for i in range(0, len(order), batch_cards):
+        cards = order[i:i + batch_cards]
+        steps = np.arange(lengths[cards].max())[:, None]
+        present = steps < lengths[cards]
+        index = np.where(present, starts[cards] + steps, 0)
+        state = np.where(present, history.state[index], -1).astype(np.int8)
+        elapsed = np.where(present, history.elapsed_days[index], 0).astype(np.float32)
+        batches.append(Batch(
+            rating=np.where(present, history.rating[index], 0).astype(np.int8),
+            state=state,
+            elapsed_days=elapsed,
+            observations=int(np.count_nonzero(_observed(state, elapsed))),
+        ))
+    return batches
+
+def replay_loss(weights: "np.ndarray", batch: Batch) -> "np.ndarray":
+    """
+    Summed log loss of `batch` under each row of `weights` ([sets x 13]).
+    Follows `schedule_batch`: first reviews set stability and difficulty,
+    learning steps leave them alone, reviews update them from the
+    retrievability after the elapsed whole days.
+    """
+    weights = np.atleast_2d(weights)
+    p = BatchParameters(w=tuple(weights.T[:, :, None]))
+    sets, cards = len(weights), batch.rating.shape[1]
+    stability = np.ones((sets, cards))
+    difficulty = np.ones((sets, cards))
+    loss = np.zeros(sets)
+
+    for rating, state, elapsed in zip(batch.rating, batch.state, batch.elapsed_days):
+        review = np.flatnonzero(state == REVIEW)
+        if len(review):
+            r = rating[review]
+            last_s = stability[:, review]
+            retrievability = np.power(0.9, elapsed[review] / last_s)
+
+            observed = elapsed[review] >= 1
+            if observed.any():
+                predicted = np.clip(retrievability[:, observed], PROBABILITY_FLOOR, 1 - PROBABILITY_FLOOR)
+                recalled = r[observed] != AGAIN
+                loss -= np.where(recalled, np.log(predicted), np.log1p(-predicted)).sum(axis=1)
+
+            d = next_difficulty(difficulty[:, review], r, p)
+            stability[:, review] = np.where(
+                r == AGAIN,
+                next_forget_stability(d, last_s, retrievability, p),
+                next_recall_stability(d, last_s, retrievability, p),
+            )
+            difficulty[:, review] = d
+
+        new = np.flatnonzero(state == NEW)
+        if len(new):
+            stability[:, new] = init_stability(rating[new], p)
+            difficulty[:, new] = init_difficulty(rating[new], p)
+
+    return loss
+
+def loss_and_gradient(weights: "np.ndarray", batch: Batch) -> Tuple[float, "np.ndarray"]:
+    """Mean log loss and its central-difference gradient, in one replay"""
+    n = len(weights)
+    step = GRADIENT_STEP * np.maximum(np.abs(weights), 1)
+    probes = np.tile(weights, (2 * n + 1, 1))
+    probes[1:n + 1] += np.diag(step)
+    probes[n + 1:] -= np.diag(step)
+    losses = replay_loss(probes, batch) / max(batch.observations, 1)
+    return float(losses[0]), (losses[1:n + 1] - losses[n + 1:]) / (2 * step)
+
+def log_loss(weights, batches: Iterable[Batch]) -> float:
+    """Mean log loss per observed review"""
+    total = observations = 0
+    for batch in batches:
+        total += replay_loss(np.asarray(weights, dtype=np.float64), batch)[0]
+        observations += batch.observations
+    return total / observations if observations else float("nan")
+
+@dataclass
+class FitResult:
+    weights: Tuple[float, ...]
+    cards: int
+    reviews: int
+    observations: int
+    log_loss_default: float
+    log_loss_fitted: float
+
+def fit_cohort(
+    history: CohortHistory,
+    epochs: int = 5,
+    batch_cards: int = 512,
+    learning_rate: float = 0.05,
+    initial: Sequence[float] = DEFAULT_WEIGHTS,
+    seed: int = 0,
+) -> FitResult:
+    """Adam over shuffled mini-batches, weights clipped to WEIGHT_BOUNDS"""
+    batches = [batch for batch in make_batches(history, batch_cards) if batch.observations]
+    lower, upper = WEIGHT_BOUNDS[:, 0], WEIGHT_BOUNDS[:, 1]
+    weights = np.clip(np.array(initial, dtype=np.float64), lower, upper)
+    moment = np.zeros_like(weights)
+    velocity = np.zeros_like(weights)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    rng = np.random.default_rng(seed)
+
+    t = 0
+    for _ in range(epochs):
+        for i in rng.permutation(len(batches)):
+            _, gradient = loss_and_gradient(weights, batches[i])
+            t += 1
+            moment = beta1 * moment + (1 - beta1) * gradient
+            velocity = beta2 * velocity + (1 - beta2) * gradient ** 2
+            step = (moment / (1 - beta1 ** t)) / (np.sqrt(velocity / (1 - beta2 ** t)) + eps)
+            weights = np.clip(weights - learning_rate * step, lower, upper)
+
+    return FitResult(
+        weights=tuple(float(w) for w in weights),
+        cards=history.cards,
+        reviews=history.reviews,
+        observations=sum(batch.observations for batch in batches),
+        log_loss_default=log_loss(DEFAULT_WEIGHTS, batches),
+        log_loss_fitted=log_loss(weights, batches),
+    )
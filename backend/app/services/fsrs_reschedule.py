@@ -0,0 +1,103 @@
+"""
+Bulk re-scheduling of review cards after an FSRS parameter change.
+
+Each card's last review is replayed with the vectorized scheduler
+(`schedule_batch`, the same update rules as `FSRS.repeat`) from the inputs
+its state row keeps (migration 014): the rating, the state, stability and
+difficulty before the review and the whole days since the one before. The
+interval depends on the rating (Hard, Good and Easy differ), so unchanged
+parameters give every stored due date back. Cards last reviewed before
+migration 014 have no inputs and are left alone.
+
+The write only touches cards that were not reviewed again since they were
+read, and refreshes the affected users' `user_topic_stats`.
+`scripts/reschedule_fsrs.py` runs it over all review cards.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+
+import numpy as np
+from sqlalchemy import text
+
+from app.services.fsrs_batch import STATE_CODES, BatchParameters, schedule_batch
+from app.services.topic_stats import REFRESH_TOPIC_STATS_SQL
+
+SELECT_REVIEW_CARDS_SQL = text("""
+SELECT user_id, question_id, last_reviewed_at, next_due_at,
+       last_rating, last_state_before, last_stability_before, last_difficulty_before, last_elapsed_days
+FROM user_question_state
+WHERE state = 'review' AND last_reviewed_at IS NOT NULL
+""")
+
+# A card reviewed since it was read has a newer last_reviewed_at: its new
+# due date is already right and must not be overwritten
+UPDATE_DUE_SQL = text("""
+UPDATE user_question_state AS s
+SET next_due_at = v.next_due_at, updated_at = NOW()
+FROM unnest(
+    CAST(:user_ids AS text[]),
+    CAST(:question_ids AS text[]),
+    CAST(:last_reviewed_at AS timestamp[]),
+    CAST(:next_due_at AS timestamp[])
+) AS v(user_id, question_id, last_reviewed_at, next_due_at)
+WHERE s.user_id = v.user_id AND s.question_id = v.question_id
+  AND s.last_reviewed_at = v.last_reviewed_at
+""")
+
+@dataclass
+class RescheduledChunk:
+    """Cards of a chunk whose due date moves, and how many could not be replayed"""
+    user_ids: List[str] = field(default_factory=list)
+    question_ids: List[str] = field(default_factory=list)
+    last_reviewed_at: List[datetime] = field(default_factory=list)
+    next_due_at: List[datetime] = field(default_factory=list)
+    skipped: int = 0
+
+def replayed_due_dates(rows, params: BatchParameters) -> "np.ndarray":
+    """Due dates (datetime64[us], UTC) the rows' last reviews give under `params`"""
+    result = schedule_batch(
+        state=[STATE_CODES[row.last_state_before] for row in rows],
+        stability=[float(row.last_stability_before) for row in rows],
+        difficulty=[float(row.last_difficulty_before) for row in rows],
+        elapsed_days=[row.last_elapsed_days for row in rows],
+        rating=[row.last_rating for row in rows],
+        params=params,
+    )
+    last_reviewed = np.array([row.last_reviewed_at for row in rows], dtype="datetime64[us]")
+    return last_reviewed + result.interval_seconds.astype("timedelta64[s]")
+
+def reschedule_chunk(rows, params: BatchParameters) -> RescheduledChunk:
+    """Replay the chunk's cards (SELECT_REVIEW_CARDS_SQL rows) and keep the ones that move"""
+    replayable = [row for row in rows if row.last_rating is not None]
+    chunk = RescheduledChunk(skipped=len(rows) - len(replayable))
+    if not replayable:
+        return chunk
+
+    new_due = replayed_due_dates(replayable, params)
+    current_due = np.array([row.next_due_at for row in replayable], dtype="datetime64[us]")
+    for i in np.flatnonzero(new_due != current_due):
+        row = replayable[i]
+        chunk.user_ids.append(row.user_id)
+        chunk.question_ids.append(row.question_id)
+        chunk.last_reviewed_at.append(row.last_reviewed_at)
+        chunk.next_due_at.append(new_due[i].item())
+    return chunk
+
+def write_chunk(connection, chunk: RescheduledChunk, now: datetime) -> List[str]:
+    """
+    Write the new due dates and refresh the users' dashboard aggregates
+    (they keep a copy of the due dates). The caller commits.
+    Returns the affected user ids.
+    """
+    if not chunk.user_ids:
+        return []
+    connection.execute(UPDATE_DUE_SQL, {
+        "user_ids": chunk.user_ids,
+        "question_ids": chunk.question_ids,
+        "last_reviewed_at": chunk.last_reviewed_at,
+        "next_due_at": chunk.next_due_at,
+    })
+    affected = sorted(set(chunk.user_ids))
+    connection.execute(REFRESH_TOPIC_STATS_SQL, {"user_ids": affected, "now": now})
+    return affected
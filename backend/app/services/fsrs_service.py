@@ -0,0 +1,75 @@
+"""
+FSRS scheduling for answered session items.
+
+Wraps the `fsrs` package: converts `user_question_state` rows to cards,
+picks the rating for an answer and returns the new state to persist.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from fsrs import FSRS, Card, Rating, State
+
+_scheduler = FSRS()
+
+STATE_TO_FSRS = {
+    "new": State.New,
+    "learning": State.Learning,
+    "review": State.Review,
+    "relearning": State.Relearning,
+}
+FSRS_TO_STATE = {value: key for key, value in STATE_TO_FSRS.items()}
+
+# PRD 6.3: confidence only matters for correct answers
+CONFIDENCE_TO_RATING = {
+    "guessed": Rating.Hard,
+    "pretty_sure": Rating.Good,
+    "very_sure": Rating.Easy,
+}
+
+@dataclass
+class ScheduledState:
+    state: str
+    stability: float
+    difficulty: float
+    reps: int
+    lapses: int
+    next_due_at: datetime
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps come back naive from TIMESTAMP columns; they are stored as UTC"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+def rating_for(is_correct: bool, confidence: Optional[str] = None) -> Rating:
+    if not is_correct:
+        return Rating.Again
+    return CONFIDENCE_TO_RATING.get(confidence, Rating.Good)
+
+def schedule_review(
+    previous: Optional[ScheduledState],
+    last_reviewed_at: Optional[datetime],
+    rating: Rating,
+    now: datetime,
+) -> ScheduledState:
+    """Apply one review to a card (`previous` is None for a first review)"""
+    card = Card()
+    if previous is not None and previous.state != "new":
+        card.state = STATE_TO_FSRS.get(previous.state, State.New)
+        card.stability = float(previous.stability)
+        card.difficulty = float(previous.difficulty)
+        card.reps = previous.reps
+        card.lapses = previous.lapses
+        card.due = previous.next_due_at
+        card.last_review = as_utc(last_reviewed_at) or now
+
+    scheduled = _scheduler.repeat(card, now)[rating].card
+    return ScheduledState(
+        state=FSRS_TO_STATE[scheduled.state],
+        stability=float(scheduled.stability),
+        difficulty=float(scheduled.difficulty),
+        reps=scheduled.reps,
+        lapses=scheduled.lapses,
+        next_due_at=as_utc(scheduled.due),
+    )
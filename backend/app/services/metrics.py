@@ -0,0 +1,208 @@
+"""
+Request-level performance metrics.
+
+`MetricsMiddleware` times every HTTP request, and SQLAlchemy cursor events
+(`install_query_hooks`) add each query's count and duration to the request
+that issued it (tracked with a context variable, which SQLAlchemy's asyncio
+layer carries into its greenlets). Per route template (not raw path, so
+`/api/dashboard/{user_id}/stats` is one series) we keep histograms of:
+- request latency
+- DB queries per request
+- DB time per request
+
+GET /metrics renders them, plus connection pool usage, in the Prometheus
+text format. Each response also gets a `Server-Timing` header, e.g.
+`app;dur=12.4, db;dur=3.1;desc="2 queries"`, visible in the browser's
+network panel. A jump in the queries-per-request histogram for a route is
+an N+1 regression.
+
+Queries run outside a request (background flushes, scripts) only count
+towards the unlabeled db_* totals.
+"""
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Server-Timing exposes DB timings to clients; turn off if that matters
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+UNMATCHED_ROUTE = "unmatched"
+
+@dataclass
+class RequestMetrics:
+    """What the current request has spent so far"""
+    started_at: float
+    db_queries: int = 0
+    db_seconds: float = 0.0
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+def current_request_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label tuple"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts, +Inf count is len(buckets)), sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_format(bound)}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {_format(total[0])}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status"), LATENCY_BUCKETS
+)
+request_db_queries = Histogram(
+    "http_request_db_queries", "Database queries per request", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+request_db_seconds = Histogram(
+    "http_request_db_seconds", "Database time per request", ("method", "route"), LATENCY_BUCKETS
+)
+
+class QueryTotals:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+query_totals = QueryTotals()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_times"].pop()
+    query_totals.queries += 1
+    query_totals.seconds += elapsed
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.db_queries += 1
+        metrics.db_seconds += elapsed
+
+def _handle_error(exception_context):
+    # A failed query never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_times"):
+        conn.info["query_start_times"].pop()
+
+def install_query_hooks(engine: Engine):
+    """Count and time every query on `engine` (use `async_engine.sync_engine` for async)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+def server_timing(metrics: RequestMetrics, now: float) -> str:
+    app_ms = (now - metrics.started_at) * 1000
+    db_ms = metrics.db_seconds * 1000
+    return f'app;dur={app_ms:.1f}, db;dur={db_ms:.1f};desc="{metrics.db_queries} queries"'
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no extra task per request, unlike BaseHTTPMiddleware)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics(started_at=time.perf_counter())
+        token = _current.set(metrics)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(metrics, time.perf_counter()).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - metrics.started_at
+            method, route = scope["method"], _route_label(scope)
+            request_latency.observe((method, route, str(status)), elapsed)
+            request_db_queries.observe((method, route), metrics.db_queries)
+            request_db_seconds.observe((method, route), metrics.db_seconds)
+
+def _pool_lines(pool_stats: Dict[str, dict]) -> List[str]:
+    gauges = {
+        "db_pool_size": ("pool_size", "gauge", "Configured pool size"),
+        "db_pool_in_use": ("in_use", "gauge", "Connections checked out"),
+        "db_pool_idle": ("idle", "gauge", "Idle connections in the pool"),
+        "db_pool_overflow": ("overflow", "gauge", "Connections open beyond pool_size"),
+        "db_pool_checkouts_total": ("checkouts", "counter", "Connection checkouts"),
+        "db_pool_checkout_timeouts_total": ("checkout_timeouts", "counter", "Checkouts that timed out"),
+        "db_pool_checkout_wait_seconds_total": ("checkout_wait_seconds_total", "counter", "Time spent waiting for a connection"),
+        "db_pool_connections_opened_total": ("connections_opened", "counter", "Connections opened"),
+    }
+    lines = []
+    for name, (key, kind, help_text) in gauges.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for engine_name, stats in sorted(pool_stats.items()):
+            lines.append(f'{name}{{engine="{engine_name}"}} {stats[key]}')
+    return lines
+
+def render_metrics(pool_stats: Dict[str, dict]) -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for histogram in (request_latency, request_db_queries, request_db_seconds):
+        lines += histogram.render()
+    lines += [
+        "# HELP db_queries_total Database queries, including outside requests",
+        "# TYPE db_queries_total counter",
+        f"db_queries_total {query_totals.queries}",
+        "# HELP db_query_seconds_total Database time, including outside requests",
+        "# TYPE db_query_seconds_total counter",
+        f"db_query_seconds_total {query_totals.seconds!r}",
+    ]
+    lines += _pool_lines(pool_stats)
+    return "\n".join(lines) + "\n"
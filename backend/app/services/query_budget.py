@@ -0,0 +1,206 @@
+"""
+Query budgets and slow-query logging.
+
+Routes declare how many SQL statements one request may run:
+
+    @router.get("/{user_id}/stats")
+    @query_budget(1)
+    async def get_dashboard_stats(...): ...
+
+`track_queries()` records every statement run inside it (including in the
+greenlets of the async engine, via a context variable); `untracked()`
+leaves a block out. Tests use it directly, or run the app with
+QUERY_BUDGET_MODE=raise:
+
+- off (default): nothing is tracked per request
+- log: requests over their route's budget are logged with the statements
+  they ran; the same statement repeated REPEATED_QUERY_THRESHOLD times in
+  one request is logged as a likely N+1
+- raise: the statement that goes over budget raises QueryBudgetExceeded,
+  so the request fails with a 500 (for tests and staging)
+
+Independently, SLOW_QUERY_MS > 0 logs every statement slower than that
+with its EXPLAIN plan. The plan is taken inside a savepoint on the same
+connection and transaction, so it sees the same data and a failing EXPLAIN
+cannot break the caller's transaction.
+"""
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_MODES = ("off", "log", "raise")
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").strip().lower()
+if QUERY_BUDGET_MODE not in QUERY_BUDGET_MODES:
+    raise ValueError(f"QUERY_BUDGET_MODE must be one of {', '.join(QUERY_BUDGET_MODES)}")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))  # 0 disables
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "3"))
+
+_EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+def query_budget(max_queries: int):
+    """Declare the most statements one request to this route may run"""
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+def route_budget(scope) -> Optional[int]:
+    """Budget declared on the endpoint the request was routed to, if any"""
+    route = scope.get("route")
+    return getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+@dataclass
+class QueryLog:
+    """Statements run inside one `track_queries()` block"""
+    label: str
+    limit: Optional[int] = None
+    # Raise as soon as the limit is crossed (otherwise the caller checks)
+    fail_fast: bool = False
+    # Resolves the limit lazily, e.g. once routing has picked the endpoint
+    scope: Optional[dict] = None
+    statements: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def budget(self) -> Optional[int]:
+        if self.limit is None and self.scope is not None:
+            return route_budget(self.scope)
+        return self.limit
+
+    def over_budget(self) -> bool:
+        budget = self.budget
+        return budget is not None and self.count > budget
+
+    def repeated(self, threshold: int = REPEATED_QUERY_THRESHOLD) -> List[str]:
+        return [sql for sql, n in Counter(self.statements).items() if n >= threshold]
+
+    def report(self) -> str:
+        lines = [f"{self.label}: {self.count} queries (budget {self.budget}), {self.seconds * 1000:.1f} ms"]
+        for sql, n in Counter(self.statements).most_common():
+            lines.append(f"  {n}x {_one_line(sql)}")
+        return "\n".join(lines)
+
+_active: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+
+@contextmanager
+def track_queries(limit: Optional[int] = None, label: str = "block") -> Iterator[QueryLog]:
+    """
+    Record the statements run inside the block; raise QueryBudgetExceeded
+    on exit if there were more than `limit`.
+
+        with track_queries(limit=2, label="dashboard stats") as log:
+            await get_user_totals(db, user_id, now)
+        assert log.count == 1
+    """
+    log = QueryLog(label=label, limit=limit)
+    token = _active.set(log)
+    try:
+        yield log
+    finally:
+        _active.reset(token)
+    if log.over_budget():
+        raise QueryBudgetExceeded(log.report())
+
+@contextmanager
+def untracked() -> Iterator[None]:
+    """
+    Run the block outside the current query log: for work done on behalf of
+    other requests, e.g. writing answers the buffer acknowledged earlier.
+    """
+    token = _active.set(None)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+def _one_line(sql: str, limit: int = 200) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= limit else sql[:limit] + "..."
+
+def _explain(conn, statement: str, parameters) -> str:
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT query_budget_explain")
+        try:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except Exception as exc:
+            cursor.execute("ROLLBACK TO SAVEPOINT query_budget_explain")
+            plan = f"(EXPLAIN failed: {exc})"
+        cursor.execute("RELEASE SAVEPOINT query_budget_explain")
+        return plan
+    finally:
+        cursor.close()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = _active.get()
+    if log is not None:
+        log.statements.append(statement)
+        if log.fail_fast and log.over_budget():
+            raise QueryBudgetExceeded(log.report())
+    conn.info.setdefault("query_budget_start_times", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_budget_start_times"].pop()
+    log = _active.get()
+    if log is not None:
+        log.seconds += elapsed
+    if SLOW_QUERY_MS <= 0 or elapsed * 1000 < SLOW_QUERY_MS:
+        return
+    plan = ""
+    if not executemany and statement.lstrip()[:6].lower().startswith(_EXPLAINABLE):
+        plan = "\n" + _explain(conn, statement, parameters)
+    logger.warning("Slow query (%.1f ms): %s%s", elapsed * 1000, _one_line(statement, 1000), plan)
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_budget_start_times"):
+        conn.info["query_budget_start_times"].pop()
+
+def install_query_budget_hooks(engine: Engine):
+    """Track statements on `engine` (use `async_engine.sync_engine` for async)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+class QueryBudgetMiddleware:
+    """Checks each request against its route's budget (QUERY_BUDGET_MODE log/raise)"""
+
+    def __init__(self, app, mode: str = QUERY_BUDGET_MODE):
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        log = QueryLog(label=f"{scope['method']} {scope['path']}", fail_fast=self.mode == "raise", scope=scope)
+        token = _active.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _active.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            if log.over_budget() and self.mode == "log":
+                logger.warning("Query budget exceeded on %s %s\n%s", scope["method"], route, log.report())
+            for sql in log.repeated():
+                logger.warning("Possible N+1 on %s %s: %s", scope["method"], route, _one_line(sql))
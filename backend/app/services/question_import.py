@@ -0,0 +1,288 @@
+"""
+Bulk import of archive questions (UN exam packages) into the question bank.
+
+Records are validated one by one against the topics in the database:
+- MCQ only: two or more options labelled "A) ...", "B) ...", in order, and
+  a correct_option that is one of the labels,
+- the topic exists, the grade matches the topic's and the class level is
+  one of the topic's class levels (SMP 7-9, SMA 10-12),
+- every record has a source identity (source_year, source_package,
+  source_number); the question ID defaults to one built from it.
+
+Valid records are deduplicated on source identity (the first one wins) and
+on ID, and COPYed in chunks into a temporary staging table. `merge` then
+moves them into `questions` in one statement: new sources are inserted,
+known ones updated in place (keeping their ID, migration 013 makes the
+identity unique), and the catalog version is bumped so the API reloads.
+Staging, merge and bump are in the caller's transaction.
+
+`scripts/import_questions.py` runs it from a CSV or JSONL file.
+"""
+import io
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+IMPORT_CHUNK_ROWS = 5000
+
+GRADE_CLASSES = {"SMP": (7, 8, 9), "SMA": (10, 11, 12)}
+
+# Order of the staging table's columns (and of the rows built by validate_record)
+IMPORT_COLUMNS = [
+    "id", "topic_id", "grade_level", "class_level", "prompt_text", "prompt_image_url",
+    "options", "correct_option", "explanation_text", "source_year", "source_package", "source_number",
+]
+
+OPTION_LABEL = re.compile(r"([A-Z])\)\s*\S")
+
+LOAD_TOPICS_SQL = text("SELECT id, grade_level, class_levels FROM topics")
+
+CREATE_STAGING_SQL = text("""
+CREATE TEMP TABLE question_import (
+  id TEXT NOT NULL,
+  topic_id TEXT NOT NULL,
+  grade_level TEXT NOT NULL,
+  class_level INTEGER NOT NULL,
+  prompt_text TEXT NOT NULL,
+  prompt_image_url TEXT,
+  options JSONB NOT NULL,
+  correct_option TEXT NOT NULL,
+  explanation_text TEXT,
+  source_year INTEGER NOT NULL,
+  source_package TEXT NOT NULL,
+  source_number INTEGER NOT NULL
+) ON COMMIT DROP
+""")
+
+# Staged IDs already taken by a question from another source are left out
+# (and reported); everything else is inserted or updated on its source
+# identity. Unchanged questions are not rewritten.
+MERGE_SQL = text("""
+WITH taken AS (
+  SELECT s.id
+  FROM question_import s
+  JOIN questions q ON q.id = s.id
+  WHERE (q.source_year, q.source_package, q.source_number)
+        IS DISTINCT FROM (s.source_year, s.source_package, s.source_number)
+),
+merged AS (
+  INSERT INTO questions (id, topic_id, grade_level, class_level, prompt_text, prompt_image_url, type,
+                         options, correct_option, explanation_text, source_year, source_package, source_number)
+  SELECT s.id, s.topic_id, s.grade_level, s.class_level, s.prompt_text, s.prompt_image_url, 'mcq',
+         s.options, s.correct_option, s.explanation_text, s.source_year, s.source_package, s.source_number
+  FROM question_import s
+  WHERE s.id NOT IN (SELECT id FROM taken)
+  ON CONFLICT (source_year, source_package, source_number) DO UPDATE
+  SET topic_id = EXCLUDED.topic_id,
+      grade_level = EXCLUDED.grade_level,
+      class_level = EXCLUDED.class_level,
+      prompt_text = EXCLUDED.prompt_text,
+      prompt_image_url = EXCLUDED.prompt_image_url,
+      options = EXCLUDED.options,
+      correct_option = EXCLUDED.correct_option,
+      explanation_text = EXCLUDED.explanation_text
+  WHERE (questions.topic_id, questions.grade_level, questions.class_level, questions.prompt_text,
+         questions.prompt_image_url, questions.options, questions.correct_option, questions.explanation_text)
+        IS DISTINCT FROM
+        (EXCLUDED.topic_id, EXCLUDED.grade_level, EXCLUDED.class_level, EXCLUDED.prompt_text,
+         EXCLUDED.prompt_image_url, EXCLUDED.options, EXCLUDED.correct_option, EXCLUDED.explanation_text)
+  RETURNING (xmax = 0) AS inserted
+)
+SELECT
+  (SELECT count(*) FROM merged WHERE inserted) AS inserted,
+  (SELECT count(*) FROM merged WHERE NOT inserted) AS updated,
+  (SELECT coalesce(array_agg(id ORDER BY id), '{}') FROM taken) AS taken_ids
+""")
+
+DROP_STAGING_SQL = text("DROP TABLE question_import")
+
+BUMP_CATALOG_VERSION_SQL = text("SELECT bump_catalog_version()")
+
+def load_topics(connection) -> Dict[str, Tuple[str, FrozenSet[int]]]:
+    """topic ID -> (grade level, class levels)"""
+    topics = {}
+    for row in connection.execute(LOAD_TOPICS_SQL):
+        levels = json.loads(row.class_levels) if isinstance(row.class_levels, str) else row.class_levels
+        topics[row.id] = (row.grade_level, frozenset(int(level) for level in levels or []))
+    return topics
+
+def default_question_id(source_year: int, source_package: str, source_number: int) -> str:
+    package = re.sub(r"[^A-Z0-9]+", "_", source_package.upper()).strip("_")
+    return f"UN_{source_year}_{package}_{source_number:03d}"
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def _optional_text(record: dict, name: str) -> Optional[str]:
+    value = record.get(name)
+    return None if _blank(value) else str(value).strip()
+
+def _required_text(record: dict, name: str) -> str:
+    value = _optional_text(record, name)
+    if value is None:
+        raise ValueError(f"{name} is missing")
+    return value
+
+def _integer(record: dict, name: str) -> int:
+    value = record.get(name)
+    if _blank(value):
+        raise ValueError(f"{name} is missing")
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number, got {value!r}") from None
+
+def _options(record: dict) -> List[str]:
+    options = record.get("options")
+    if isinstance(options, str):
+        # CSV cells hold the options as a JSON array
+        try:
+            options = json.loads(options)
+        except json.JSONDecodeError:
+            raise ValueError("options must be a JSON array of strings") from None
+    if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+        raise ValueError("options must be a list of strings")
+    options = [option.strip() for option in options]
+    if len(options) < 2:
+        raise ValueError("an MCQ needs at least 2 options")
+    for expected, option in zip("ABCDEFGHIJKLMNOPQRSTUVWXYZ", options):
+        match = OPTION_LABEL.match(option)
+        if match is None or match.group(1) != expected:
+            raise ValueError(f"option {option!r} should read \"{expected}) ...\"")
+    return options
+
+def validate_record(record: dict, topics: Dict[str, Tuple[str, FrozenSet[int]]]) -> tuple:
+    """A staging row (IMPORT_COLUMNS order); raises ValueError naming the first problem"""
+    question_type = _optional_text(record, "type") or "mcq"
+    if question_type != "mcq":
+        raise ValueError(f"type must be mcq, got {question_type!r}")
+
+    source_year = _integer(record, "source_year")
+    source_package = _required_text(record, "source_package")
+    source_number = _integer(record, "source_number")
+
+    topic_id = _required_text(record, "topic_id")
+    if topic_id not in topics:
+        raise ValueError(f"unknown topic {topic_id!r}")
+    topic_grade, topic_classes = topics[topic_id]
+    grade_level = _required_text(record, "grade_level").upper()
+    class_level = _integer(record, "class_level")
+    if class_level not in GRADE_CLASSES.get(grade_level, ()):
+        raise ValueError(f"class {class_level} is not a {grade_level} class")
+    if grade_level != topic_grade:
+        raise ValueError(f"topic {topic_id} is {topic_grade}, not {grade_level}")
+    if class_level not in topic_classes:
+        raise ValueError(f"topic {topic_id} is not taught in class {class_level}")
+
+    options = _options(record)
+    correct_option = _required_text(record, "correct_option").upper()
+    labels = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"[:len(options)]
+    if len(correct_option) != 1 or correct_option not in labels:
+        raise ValueError(f"correct_option must be one of {', '.join(labels)}, got {correct_option!r}")
+
+    question_id = _optional_text(record, "id") or default_question_id(source_year, source_package, source_number)
+    return (
+        question_id, topic_id, grade_level, class_level, _required_text(record, "prompt_text"),
+        _optional_text(record, "prompt_image_url"), json.dumps(options, ensure_ascii=False), correct_option,
+        _optional_text(record, "explanation_text"), source_year, source_package, source_number,
+    )
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+@dataclass
+class ImportResult:
+    read: int = 0
+    staged: int = 0
+    invalid: List[Tuple[int, str]] = field(default_factory=list)  # (record number, problem)
+    duplicates: List[Tuple[int, str]] = field(default_factory=list)  # (record number, what it repeats)
+    inserted: int = 0
+    updated: int = 0
+    taken_ids: List[str] = field(default_factory=list)  # IDs used by a question from another source
+    catalog_version: Optional[int] = None
+
+    @property
+    def unchanged(self) -> int:
+        return self.staged - self.inserted - self.updated - len(self.taken_ids)
+
+class QuestionImporter:
+    """
+    Validates, deduplicates and stages records (`add`), then merges them
+    into questions (`merge`), on a SQLAlchemy connection inside a transaction.
+    """
+
+    def __init__(self, connection, chunk_rows: int = IMPORT_CHUNK_ROWS):
+        self._connection = connection
+        self._chunk_rows = chunk_rows
+        self._topics = load_topics(connection)
+        self._sources: Dict[Tuple[int, str, int], int] = {}
+        self._ids: Set[str] = set()
+        self._buffer = io.StringIO()
+        self._pending = 0
+        self.result = ImportResult()
+        connection.execute(CREATE_STAGING_SQL)
+
+    def reject(self, number: int, problem: str):
+        """Count a record that could not even be parsed"""
+        self.result.read += 1
+        self.result.invalid.append((number, problem))
+
+    def add(self, record: dict, number: Optional[int] = None) -> bool:
+        """Stage one record; False if it is invalid or a duplicate (see `result`)"""
+        self.result.read += 1
+        number = self.result.read if number is None else number
+        try:
+            row = validate_record(record, self._topics)
+        except ValueError as exc:
+            self.result.invalid.append((number, str(exc)))
+            return False
+
+        source = (row[9], row[10], row[11])
+        if source in self._sources:
+            self.result.duplicates.append(
+                (number, f"source {source[0]}/{source[1]}/{source[2]} of record {self._sources[source]}")
+            )
+            return False
+        if row[0] in self._ids:
+            self.result.duplicates.append((number, f"id {row[0]}"))
+            return False
+        self._sources[source] = number
+        self._ids.add(row[0])
+
+        self._buffer.write("\t".join(_copy_value(value) for value in row))
+        self._buffer.write("\n")
+        self._pending += 1
+        self.result.staged += 1
+        if self._pending >= self._chunk_rows:
+            self._flush()
+        return True
+
+    def _flush(self):
+        if not self._pending:
+            return
+        self._buffer.seek(0)
+        cursor = self._connection.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY question_import ({', '.join(IMPORT_COLUMNS)}) FROM STDIN", self._buffer)
+        finally:
+            cursor.close()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._pending = 0
+
+    def merge(self) -> ImportResult:
+        """Merge the staged rows into questions; bumps the catalog version if any changed"""
+        self._flush()
+        row = self._connection.execute(MERGE_SQL).one()
+        self._connection.execute(DROP_STAGING_SQL)
+        self.result.inserted = row.inserted
+        self.result.updated = row.updated
+        self.result.taken_ids = list(row.taken_ids)
+        if self.result.inserted or self.result.updated:
+            self.result.catalog_version = self._connection.execute(BUMP_CATALOG_VERSION_SQL).scalar_one()
+        return self.result
@@ -0,0 +1,135 @@
+"""
+Question selection for new practice sessions.
+
+1. Priority 1: Questions due for review (FSRS), oldest due first
+2. Priority 2: New questions never seen, random order
+3. Priority 3: Fallback - already seen but not yet due, random order
+
+The database is asked for one thing only: the user's states in this
+topic/class slice (plus the user's class level), in a single round trip.
+New questions are sampled in memory from the catalog's cached id list, so
+session start does not sort the whole slice with ORDER BY random() and stays
+flat as topics grow.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+PRIORITY_DUE = 1
+PRIORITY_NEW = 2
+PRIORITY_FALLBACK = 3
+
+# Past this many wasted draws, rejection sampling gives up and filters the pool
+MAX_REJECTED_DRAWS = 64
+
+USER_SLICE_STATES_SQL = text("""
+WITH u AS (
+    SELECT class_level FROM users WHERE id = :user_id
+)
+SELECT u.class_level,
+       s.question_id,
+       s.next_due_at,
+       s.next_due_at <= CAST(:now AS timestamptz) AS is_due
+FROM u
+LEFT JOIN user_question_state s
+       ON s.user_id = :user_id
+      AND s.topic_id = :topic_id
+      AND s.class_level = u.class_level
+ORDER BY s.next_due_at
+""")
+
+@dataclass
+class SessionSelection:
+    class_level: Optional[int]  # None when the user does not exist
+    question_ids: List[str]
+    priorities: List[int]
+    # When the first card that is not due yet becomes due (the selection changes)
+    next_due_at: Optional[datetime] = None
+
+def sample_unseen(
+    pool: Sequence[str],
+    seen: Set[str],
+    k: int,
+    rng: random.Random = random,
+) -> List[str]:
+    """
+    Pick up to `k` random ids from `pool` that are not in `seen`.
+
+    Draws random positions and rejects seen/duplicate ids, so the cost depends
+    on `k`, not on the pool size. When most of the pool has been seen the
+    draws keep missing; then it falls back to filtering the pool once.
+    """
+    if k <= 0 or not pool:
+        return []
+
+    picked: List[str] = []
+    picked_set: Set[str] = set()
+    rejected = 0
+    while len(picked) < k and rejected < MAX_REJECTED_DRAWS:
+        candidate = pool[rng.randrange(len(pool))]
+        if candidate in seen or candidate in picked_set:
+            rejected += 1
+            continue
+        picked.append(candidate)
+        picked_set.add(candidate)
+
+    if len(picked) < k:
+        remaining = [qid for qid in pool if qid not in seen and qid not in picked_set]
+        picked.extend(rng.sample(remaining, min(k - len(picked), len(remaining))))
+
+    return picked
+
+async def select_session_questions(
+    db: AsyncSession,
+    user_id: str,
+    topic_id: str,
+    limit: int,
+    now: datetime,
+    pool_for_class: Callable[[int], Sequence[str]],
+    rng: random.Random = random,
+) -> SessionSelection:
+    """
+    Pick up to `limit` questions for a session, in presentation order.
+    `pool_for_class(class_level)` returns the topic's question ids for that
+    class level (normally from the catalog cache).
+    """
+    rows = (await db.execute(
+        USER_SLICE_STATES_SQL,
+        {"user_id": user_id, "topic_id": topic_id, "now": now},
+    )).all()
+
+    if not rows:
+        return SessionSelection(class_level=None, question_ids=[], priorities=[])
+
+    class_level = rows[0].class_level
+    states = [row for row in rows if row.question_id is not None]
+
+    # Priority 1: due, already ordered by next_due_at
+    due_ids = [row.question_id for row in states if row.is_due][:limit]
+    next_due_at = next((row.next_due_at for row in states if not row.is_due), None)
+
+    # Priority 2: never seen, sampled from the cached pool
+    seen = {row.question_id for row in states}
+    new_ids = sample_unseen(pool_for_class(class_level), seen, limit - len(due_ids), rng)
+
+    # Priority 3: seen but not due, so the user can always practice
+    remaining_slots = limit - len(due_ids) - len(new_ids)
+    fallback_ids = []
+    if remaining_slots > 0:
+        not_due = [row.question_id for row in states if not row.is_due]
+        fallback_ids = rng.sample(not_due, min(remaining_slots, len(not_due)))
+
+    return SessionSelection(
+        class_level=class_level,
+        question_ids=due_ids + new_ids + fallback_ids,
+        priorities=(
+            [PRIORITY_DUE] * len(due_ids)
+            + [PRIORITY_NEW] * len(new_ids)
+            + [PRIORITY_FALLBACK] * len(fallback_ids)
+        ),
+        next_due_at=next_due_at,
+    )
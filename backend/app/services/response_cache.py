@@ -0,0 +1,170 @@
+"""
+Per-user response cache for the dashboard endpoints, with ETags.
+
+Every user has a data version token that is replaced whenever their
+progress can change (session created, answer submitted, session completed,
+profile updated). A cached response is served only while the token (and,
+for topics, the catalog version) it was built from is still current and it
+has not expired, so repeat dashboard loads need no database round trip.
+Responses carry a strong ETag (hash of the body); a matching If-None-Match
+gets a 304.
+
+Tokens and responses live in the shared cache (app/services/cache.py), so
+with Redis a write on one replica invalidates the others. Tokens are random
+rather than counters: if a token is evicted, a fresh one is minted and no
+old response can match it.
+
+Expiry covers what changes with time alone: the next card becoming due,
+the streak day ending, and DASHBOARD_CACHE_TTL_SECONDS as an upper bound.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.services.cache import CacheBackend, SingleFlight, cache
+
+DASHBOARD_CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "300"))
+# Idle users' tokens may expire; a new token simply starts a new cache generation
+DATA_VERSION_TTL_SECONDS = 7 * 24 * 3600
+
+# Clients must revalidate every time; the ETag makes that a cheap 304
+CACHE_CONTROL = "private, no-cache"
+
+def _response_key(kind: str, user_id: str) -> str:
+    return f"dashboard:{kind}:{user_id}"
+
+class UserDataVersions:
+    """Opaque per-user token that changes on every write to the user's data"""
+
+    def __init__(self, backend: CacheBackend, name: str = "data-version"):
+        self._cache = backend
+        self.name = name
+
+    def key(self, user_id: str) -> str:
+        return f"user:{user_id}:{self.name}"
+
+    async def ensure(self, user_id: str, current: Optional[bytes]) -> str:
+        """Return the current token, minting one if the user has none yet"""
+        if current is not None:
+            return current.decode()
+        token = uuid.uuid4().hex
+        if await self._cache.add(self.key(user_id), token.encode(), DATA_VERSION_TTL_SECONDS):
+            return token
+        # Another request minted one first
+        existing = await self._cache.get(self.key(user_id))
+        return existing.decode() if existing is not None else token
+
+    async def get(self, user_id: str) -> str:
+        return await self.ensure(user_id, await self._cache.get(self.key(user_id)))
+
+    async def bump(self, user_id: str):
+        await self._cache.set(self.key(user_id), uuid.uuid4().hex.encode(), DATA_VERSION_TTL_SECONDS)
+
+data_versions = UserDataVersions(cache)
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    stamp: Tuple[Hashable, ...]
+    expires_at: float  # time.time()
+
+    def encode(self) -> bytes:
+        header = json.dumps({"etag": self.etag, "stamp": list(self.stamp), "expires_at": self.expires_at})
+        return header.encode() + b"\n" + self.body
+
+    @classmethod
+    def decode(cls, raw: bytes) -> "CachedResponse":
+        header, body = raw.split(b"\n", 1)
+        meta = json.loads(header)
+        return cls(body=body, etag=meta["etag"], stamp=tuple(meta["stamp"]), expires_at=meta["expires_at"])
+
+    def to_response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+# A builder returns the JSON body and, optionally, when it stops being valid
+ResponseBuilder = Callable[[], Awaitable[Tuple[bytes, Optional[datetime]]]]
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, versions: UserDataVersions):
+        self._cache = backend
+        self._versions = versions
+        self._single_flight = SingleFlight()
+
+    async def _lookup(
+        self, kind: str, user_id: str, extra: Tuple[Hashable, ...]
+    ) -> Tuple[Optional[CachedResponse], Tuple[Hashable, ...]]:
+        # Token and cached response in one cache round trip
+        version_raw, entry_raw = await self._cache.get_many([self._versions.key(user_id), _response_key(kind, user_id)])
+        stamp = (await self._versions.ensure(user_id, version_raw),) + tuple(extra)
+        if entry_raw is None:
+            return None, stamp
+        entry = CachedResponse.decode(entry_raw)
+        if entry.stamp != stamp or entry.expires_at <= time.time():
+            return None, stamp
+        return entry, stamp
+
+    async def _store(
+        self, kind: str, user_id: str, stamp: Tuple[Hashable, ...], body: bytes, valid_until: Optional[datetime]
+    ) -> CachedResponse:
+        now = time.time()
+        expires_at = now + DASHBOARD_CACHE_TTL_SECONDS
+        if valid_until is not None:
+            if valid_until.tzinfo is None:
+                valid_until = valid_until.replace(tzinfo=timezone.utc)
+            expires_at = min(expires_at, valid_until.timestamp())
+        entry = CachedResponse(body=body, etag=etag_for(body), stamp=stamp, expires_at=expires_at)
+        if expires_at > now:
+            await self._cache.set(_response_key(kind, user_id), entry.encode(), expires_at - now)
+        return entry
+
+    async def respond(
+        self,
+        request: Request,
+        kind: str,
+        user_id: str,
+        build: ResponseBuilder,
+        extra: Tuple[Hashable, ...] = (),
+    ) -> Response:
+        """
+        Serve `kind` for the user from the cache, or build it once (concurrent
+        requests for the same key share one build) and cache it.
+        """
+        entry, stamp = await self._lookup(kind, user_id, extra)
+        if entry is None:
+            async def build_and_store() -> CachedResponse:
+                body, valid_until = await build()
+                return await self._store(kind, user_id, stamp, body, valid_until)
+
+            flight_key = f"{kind}:{user_id}:{stamp!r}"
+            entry = await self._single_flight.do(flight_key, build_and_store)
+        return entry.to_response(request)
+
+response_cache = ResponseCache(cache, data_versions)
@@ -0,0 +1,287 @@
+"""
+Precomputed next-session queues (SESSION_QUEUE_ENABLED, default true).
+
+For every (user, topic) the shared cache holds the order the next session
+would be served in: due cards, then new ones, then fallback reviews, as
+question_selection.py picks them, up to SESSION_QUEUE_LENGTH ids.
+`POST /api/sessions` takes the first N ids and skips reading the user's
+states; only a missing or stale queue is computed at click time (and stored
+for the next session).
+
+A queue stops being valid when:
+- the user's FSRS state or class level changes: session completion and
+  profile updates replace the user's queue version token, which every queue
+  is stamped with, and completion schedules a background rebuild of the
+  topic's queue;
+- its first card that is not due yet becomes due: queues expire at that
+  moment (until the rebuild, sessions are selected at click time), and this
+  process keeps a timer to rebuild the queues it built, batched on the next
+  due bucket hour (due_buckets.py);
+- the question catalog changes (queues are stamped with its version).
+
+Serving a session consumes its ids: the stored queue keeps only the rest
+(so an abandoned session or a second tab does not get the same questions
+from it), and a queue that was served from is rebuilt in the background.
+
+Queues are built in a background task with its own DB session, so neither
+the rebuilds nor their queries count against a request. Stamps are read
+before the states, so a rebuild that races a completion is stored under the
+old token and never served.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import AsyncSessionLocal
+from app.services.cache import CacheBackend, cache
+from app.services.catalog_cache import catalog_cache
+from app.services.due_buckets import due_hour
+from app.services.question_selection import SessionSelection, select_session_questions
+from app.services.response_cache import UserDataVersions
+
+logger = logging.getLogger(__name__)
+
+SESSION_QUEUE_ENABLED = os.getenv("SESSION_QUEUE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+# Ids kept per queue; longer sessions are computed at click time
+SESSION_QUEUE_LENGTH = int(os.getenv("SESSION_QUEUE_LENGTH", "50"))
+# Queues of users who stop practicing expire; their timers are dropped too
+SESSION_QUEUE_TTL_SECONDS = int(os.getenv("SESSION_QUEUE_TTL_SECONDS", "86400"))
+
+QueueKey = Tuple[str, str]  # (user_id, topic_id)
+
+def _queue_key(user_id: str, topic_id: str) -> str:
+    return f"session-queue:{user_id}:{topic_id}"
+
+def _as_timestamp(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+@dataclass
+class SessionQueue:
+    stamp: str  # queue version token the queue was built under
+    catalog_version: int
+    class_level: int
+    question_ids: List[str]
+    complete: bool  # every question available to the user is in the list
+    valid_until: Optional[float]  # time.time() when a card becomes due
+
+    def encode(self) -> bytes:
+        return json.dumps({
+            "stamp": self.stamp,
+            "catalog_version": self.catalog_version,
+            "class_level": self.class_level,
+            "question_ids": self.question_ids,
+            "complete": self.complete,
+            "valid_until": self.valid_until,
+        }).encode()
+
+    @classmethod
+    def decode(cls, raw: bytes) -> "SessionQueue":
+        return cls(**json.loads(raw))
+
+    def take(self, n: int) -> Optional[List[str]]:
+        """The first `n` ids, or None if the queue is too short to know them"""
+        if n > len(self.question_ids) and not self.complete:
+            return None
+        return self.question_ids[:n]
+
+def _without_prefix(queue: SessionQueue, served: int) -> SessionQueue:
+    # The served questions are still available to the user, so the rest no
+    # longer holds all of them: longer sessions are selected at click time
+    return replace(queue, question_ids=queue.question_ids[served:], complete=False)
+
+class SessionQueues:
+    def __init__(self, backend: CacheBackend, enabled: bool = SESSION_QUEUE_ENABLED):
+        self.enabled = enabled
+        self._cache = backend
+        self._versions = UserDataVersions(backend, "queue-version")
+        # Rebuilds requested by completions, oldest first
+        self._pending: "OrderedDict[QueueKey, None]" = OrderedDict()
+        # Rebuilds due on the bucket hour after a card crosses next_due_at: heap + latest time per key
+        self._timers: List[Tuple[float, str, str]] = []
+        self._timer_at: Dict[QueueKey, float] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def lookup(
+        self, user_id: str, topic_id: str, catalog_version: int, now: datetime
+    ) -> Tuple[Optional[SessionQueue], Optional[str]]:
+        """
+        The user's valid queue for the topic (or None) and the current stamp,
+        to build a new queue under. One cache round trip.
+        """
+        if not self.enabled:
+            return None, None
+        version_raw, queue_raw = await self._cache.get_many(
+            [self._versions.key(user_id), _queue_key(user_id, topic_id)]
+        )
+        stamp = await self._versions.ensure(user_id, version_raw)
+        if queue_raw is None:
+            return None, stamp
+        queue = SessionQueue.decode(queue_raw)
+        if (
+            queue.stamp != stamp
+            or queue.catalog_version != catalog_version
+            or (queue.valid_until is not None and queue.valid_until <= now.timestamp())
+        ):
+            return None, stamp
+        return queue, stamp
+
+    async def build(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        topic_id: str,
+        stamp: Optional[str],
+        catalog_version: int,
+        pool_for_class: Callable[[int], Sequence[str]],
+        now: datetime,
+        limit: int = SESSION_QUEUE_LENGTH,
+        served: int = 0,
+    ) -> SessionSelection:
+        """
+        Select the next session's questions (at least SESSION_QUEUE_LENGTH)
+        and store them as the queue, without the first `served` ids when
+        they go to a session being started. Any prefix of the selection is
+        what a selection of that size would have been.
+        """
+        selection = await select_session_questions(
+            db,
+            user_id=user_id,
+            topic_id=topic_id,
+            limit=max(limit, SESSION_QUEUE_LENGTH),
+            now=now,
+            pool_for_class=pool_for_class,
+        )
+        if not self.enabled or stamp is None or selection.class_level is None:
+            return selection
+
+        valid_until = _as_timestamp(selection.next_due_at) if selection.next_due_at is not None else None
+        queue = SessionQueue(
+            stamp=stamp,
+            catalog_version=catalog_version,
+            class_level=selection.class_level,
+            question_ids=selection.question_ids,
+            complete=len(selection.question_ids) < max(limit, SESSION_QUEUE_LENGTH),
+            valid_until=valid_until,
+        )
+        if served:
+            queue = _without_prefix(queue, served)
+        await self._store(user_id, topic_id, queue)
+        if valid_until is not None and valid_until - time.time() < SESSION_QUEUE_TTL_SECONDS:
+            # Wakeups for cards due within the same hour fire together
+            self._set_timer((user_id, topic_id), _as_timestamp(due_hour(selection.next_due_at)))
+        return selection
+
+    async def consume(self, user_id: str, topic_id: str, queue: SessionQueue, served: int):
+        """
+        The first `served` ids of `queue` went to a session: keep the rest
+        until the queue is rebuilt, and rebuild it in the background.
+        """
+        if not self.enabled:
+            return
+        await self._store(user_id, topic_id, _without_prefix(queue, served))
+        self.schedule(user_id, topic_id)
+
+    async def _store(self, user_id: str, topic_id: str, queue: SessionQueue):
+        ttl = SESSION_QUEUE_TTL_SECONDS
+        if queue.valid_until is not None:
+            ttl = min(ttl, queue.valid_until - time.time())
+        if ttl > 0:
+            await self._cache.set(_queue_key(user_id, topic_id), queue.encode(), ttl)
+
+    async def invalidate(self, user_id: str):
+        """Drop all of the user's queues (FSRS state or class level changed)"""
+        if self.enabled:
+            await self._versions.bump(user_id)
+
+    def schedule(self, user_id: str, topic_id: str):
+        """Rebuild a queue in the background as soon as possible"""
+        if not self.enabled or self._worker is None:
+            return
+        self._pending[(user_id, topic_id)] = None
+        self._wakeup.set()
+
+    def _set_timer(self, key: QueueKey, at: float):
+        if self._worker is None:
+            return
+        self._timer_at[key] = at
+        heapq.heappush(self._timers, (at, key[0], key[1]))
+        self._wakeup.set()
+
+    def _pop_due_timers(self, now: float):
+        while self._timers and self._timers[0][0] <= now:
+            at, user_id, topic_id = heapq.heappop(self._timers)
+            key = (user_id, topic_id)
+            # Skip timers replaced by a later build of the same queue
+            if self._timer_at.get(key) == at:
+                del self._timer_at[key]
+                self._pending[key] = None
+
+    async def rebuild(self, user_id: str, topic_id: str):
+        async with AsyncSessionLocal() as db:
+            catalog = await catalog_cache.get(db)
+            if topic_id not in catalog.topics:
+                return
+            _, stamp = await self.lookup(user_id, topic_id, catalog.version, datetime.now(timezone.utc))
+            await self.build(
+                db,
+                user_id,
+                topic_id,
+                stamp,
+                catalog.version,
+                lambda class_level: catalog.question_ids_for(topic_id, class_level),
+                datetime.now(timezone.utc),
+            )
+
+    async def _run(self):
+        while True:
+            timeout = None
+            if self._timers:
+                timeout = max(0.0, self._timers[0][0] - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._pop_due_timers(time.time())
+            while self._pending:
+                (user_id, topic_id), _ = self._pending.popitem(last=False)
+                try:
+                    await self.rebuild(user_id, topic_id)
+                except Exception:
+                    # The next session start computes it instead
+                    logger.exception("Rebuilding the session queue of %s/%s failed", user_id, topic_id)
+
+    async def start(self):
+        if self.enabled and self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            logger.info("Session queues enabled (%d questions per queue)", SESSION_QUEUE_LENGTH)
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._pending.clear()
+        self._timers.clear()
+        self._timer_at.clear()
+
+session_queues = SessionQueues(cache)
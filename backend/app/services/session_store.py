@@ -0,0 +1,363 @@
+"""
+Write paths for practice sessions.
+
+Session creation inserts the session row and all of its items with one
+statement (a data-modifying CTE over unnest'ed arrays), so a 15-question
+session costs a single write round trip instead of one INSERT per item.
+Completion works the same way: one read for the session, its items and their
+FSRS states, scheduling in memory, then one write for all new states and
+their review_log rows (plus one statement refreshing the dashboard
+aggregates).
+"""
+import secrets
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.fsrs_service import ScheduledState, as_utc, rating_for, schedule_review
+from app.services.topic_stats import STREAK_TIMEZONE, refresh_topic_stats
+
+SECONDS_PER_DAY = 86400
+
+def session_id_at(started_at: datetime, random_bits: Optional[int] = None) -> str:
+    """
+    Time-ordered session ID (UUIDv7): the first 48 bits are `started_at` in
+    ms, so IDs sort by creation time. sessions/session_items are partitioned
+    by month on these IDs (migration 010); `random_bits` (74 bits) makes the
+    ID reproducible, e.g. for generated data.
+    """
+    if random_bits is None:
+        random_bits = secrets.randbits(74)
+    millis = int(as_utc(started_at).timestamp() * 1000)  # naive means UTC, as stored
+    value = (
+        (millis & (1 << 48) - 1) << 80
+        | 0x7 << 76                                  # version 7
+        | (random_bits >> 62 & 0xFFF) << 64
+        | 0b10 << 62                                 # RFC 4122 variant
+        | random_bits & (1 << 62) - 1
+    )
+    return str(uuid.UUID(int=value))
+
+INSERT_SESSION_WITH_ITEMS_SQL = text("""
+WITH new_session AS (
+    INSERT INTO sessions (id, user_id, topic_id, status, started_at)
+    VALUES (:session_id, :user_id, :topic_id, 'in_progress', CAST(:started_at AS timestamptz))
+    RETURNING id
+), practiced AS (
+    INSERT INTO user_topic_stats (user_id, class_level, topic_id, last_practiced_at, updated_at)
+    VALUES (:user_id, :class_level, :topic_id, CAST(:started_at AS timestamptz), CAST(:started_at AS timestamptz))
+    ON CONFLICT (user_id, class_level, topic_id) DO UPDATE SET
+        last_practiced_at = EXCLUDED.last_practiced_at,
+        updated_at = EXCLUDED.updated_at
+)
+, today AS (
+    SELECT (CAST(:started_at AS timestamptz) AT TIME ZONE :tz)::date AS d
+), activity AS (
+    INSERT INTO user_daily_activity (user_id, activity_date, sessions_started)
+    SELECT :user_id, today.d, 1 FROM today
+    ON CONFLICT (user_id, activity_date) DO UPDATE SET
+        sessions_started = user_daily_activity.sessions_started + 1
+), streak AS (
+    -- Same day: unchanged, next day: +1, later: a new run starts
+    INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_active_date, updated_at)
+    SELECT :user_id, 1, 1, today.d, CAST(:started_at AS timestamptz) FROM today
+    ON CONFLICT (user_id) DO UPDATE SET
+        current_streak = CASE
+            WHEN user_streaks.last_active_date >= EXCLUDED.last_active_date THEN user_streaks.current_streak
+            WHEN user_streaks.last_active_date = EXCLUDED.last_active_date - 1 THEN user_streaks.current_streak + 1
+            ELSE 1
+        END,
+        longest_streak = GREATEST(user_streaks.longest_streak, CASE
+            WHEN user_streaks.last_active_date >= EXCLUDED.last_active_date THEN user_streaks.current_streak
+            WHEN user_streaks.last_active_date = EXCLUDED.last_active_date - 1 THEN user_streaks.current_streak + 1
+            ELSE 1
+        END),
+        last_active_date = GREATEST(user_streaks.last_active_date, EXCLUDED.last_active_date),
+        updated_at = EXCLUDED.updated_at
+)
+INSERT INTO session_items (id, session_id, question_id, sequence)
+SELECT item.id, new_session.id, item.question_id, item.sequence
+FROM new_session,
+     unnest(
+         CAST(:item_ids AS text[]),
+         CAST(:question_ids AS text[]),
+         CAST(:sequences AS integer[])
+     ) AS item(id, question_id, sequence)
+""")
+
+async def insert_session_with_items(
+    db: AsyncSession,
+    session_id: str,
+    user_id: str,
+    topic_id: str,
+    class_level: int,
+    started_at: datetime,
+    question_ids: Sequence[str],
+) -> List[str]:
+    """
+    Insert a session and its items (sequence 1..n in the given order), stamp
+    the user's topic stats as practiced and record today's activity/streak.
+    Returns the new item ids. The caller commits.
+    """
+    item_ids = [str(uuid.uuid4()) for _ in question_ids]
+    await db.execute(
+        INSERT_SESSION_WITH_ITEMS_SQL,
+        {
+            "session_id": session_id,
+            "user_id": user_id,
+            "topic_id": topic_id,
+            "class_level": class_level,
+            "started_at": started_at,
+            "tz": STREAK_TIMEZONE,
+            "item_ids": item_ids,
+            "question_ids": list(question_ids),
+            "sequences": list(range(1, len(question_ids) + 1)),
+        },
+    )
+    return item_ids
+
+# Session, its items and the user's current state for each item, in one read
+LOAD_SESSION_FOR_COMPLETION_SQL = text("""
+SELECT s.user_id,
+       s.topic_id,
+       s.status,
+       i.question_id,
+       i.is_correct,
+       i.confidence,
+       st.state,
+       st.stability,
+       st.difficulty,
+       st.reps,
+       st.lapses,
+       st.last_reviewed_at,
+       st.next_due_at
+FROM sessions s
+LEFT JOIN session_items i ON i.session_id = s.id
+LEFT JOIN user_question_state st
+       ON st.user_id = s.user_id AND st.question_id = i.question_id
+WHERE s.id = :session_id
+ORDER BY i.sequence
+""")
+
+# Mark the session completed, append every review to review_log and upsert
+# every new card state in one write. The status guard makes a concurrent
+# second completion a no-op.
+COMPLETE_SESSION_SQL = text("""
+WITH done AS (
+    UPDATE sessions
+    SET status = 'completed', completed_at = CAST(:now AS timestamptz)
+    WHERE id = :session_id AND status = 'in_progress'
+    RETURNING user_id
+),
+logged AS (
+    INSERT INTO review_log (
+        user_id, question_id, session_id, class_level, rating, confidence,
+        state_before, elapsed_days, reviewed_at
+    )
+    SELECT done.user_id, review.question_id, :session_id, q.class_level, review.rating, review.confidence,
+           review.state_before, review.elapsed_days, CAST(:now AS timestamptz)
+    FROM done,
+         unnest(
+             CAST(:review_question_ids AS text[]),
+             CAST(:ratings AS smallint[]),
+             CAST(:confidences AS text[]),
+             CAST(:states_before AS text[]),
+             CAST(:elapsed_days AS double precision[])
+         ) WITH ORDINALITY AS review(question_id, rating, confidence, state_before, elapsed_days, position)
+         JOIN questions q ON q.id = review.question_id
+    ORDER BY review.position
+)
+INSERT INTO user_question_state (
+    user_id, question_id, state, stability, difficulty, reps, lapses,
+    last_result_correct, last_reviewed_at, next_due_at, updated_at,
+    last_rating, last_state_before, last_stability_before, last_difficulty_before, last_elapsed_days
+)
+SELECT done.user_id, card.question_id, card.state, card.stability, card.difficulty,
+       card.reps, card.lapses, card.is_correct,
+       CAST(:now AS timestamptz), card.next_due_at, CAST(:now AS timestamptz),
+       card.last_rating, card.state_before, card.stability_before, card.difficulty_before, card.elapsed_days
+FROM done,
+     unnest(
+         CAST(:question_ids AS text[]),
+         CAST(:states AS text[]),
+         CAST(:stabilities AS double precision[]),
+         CAST(:difficulties AS double precision[]),
+         CAST(:reps AS integer[]),
+         CAST(:lapses AS integer[]),
+         CAST(:is_correct AS boolean[]),
+         CAST(:next_due_at AS timestamptz[]),
+         CAST(:last_ratings AS smallint[]),
+         CAST(:last_states_before AS text[]),
+         CAST(:stabilities_before AS double precision[]),
+         CAST(:difficulties_before AS double precision[]),
+         CAST(:whole_elapsed_days AS integer[])
+     ) AS card(question_id, state, stability, difficulty, reps, lapses, is_correct, next_due_at,
+               last_rating, state_before, stability_before, difficulty_before, elapsed_days)
+ON CONFLICT (user_id, question_id) DO UPDATE SET
+    state = EXCLUDED.state,
+    stability = EXCLUDED.stability,
+    difficulty = EXCLUDED.difficulty,
+    reps = EXCLUDED.reps,
+    lapses = EXCLUDED.lapses,
+    last_result_correct = EXCLUDED.last_result_correct,
+    last_reviewed_at = EXCLUDED.last_reviewed_at,
+    next_due_at = EXCLUDED.next_due_at,
+    updated_at = EXCLUDED.updated_at,
+    last_rating = EXCLUDED.last_rating,
+    last_state_before = EXCLUDED.last_state_before,
+    last_stability_before = EXCLUDED.last_stability_before,
+    last_difficulty_before = EXCLUDED.last_difficulty_before,
+    last_elapsed_days = EXCLUDED.last_elapsed_days
+""")
+
+@dataclass
+class AnsweredItem:
+    question_id: str
+    is_correct: bool
+    confidence: Optional[str]
+    previous: Optional[ScheduledState]  # None if the user never saw the question
+    last_reviewed_at: Optional[datetime]
+
+@dataclass
+class Review:
+    """
+    One review_log row. The card's state row keeps the inputs of its last
+    review (migration 014) so scripts/reschedule_fsrs.py can replay it.
+    """
+    question_id: str
+    rating: int
+    confidence: Optional[str]
+    state_before: str
+    elapsed_days: Optional[float]  # None for a card's first review
+    stability_before: float
+    difficulty_before: float
+    whole_elapsed_days: int  # what fsrs computes the review from
+
+    @classmethod
+    def of(cls, item: AnsweredItem, previous: Optional[ScheduledState],
+           last_reviewed_at: Optional[datetime], rating, now: datetime) -> "Review":
+        # schedule_review treats a card still in the new state as unseen
+        state_before = previous.state if previous is not None else "new"
+        seen = state_before != "new"
+        elapsed_days = None
+        whole_elapsed_days = 0
+        if seen and last_reviewed_at is not None:
+            elapsed = now - as_utc(last_reviewed_at)
+            elapsed_days = elapsed.total_seconds() / SECONDS_PER_DAY
+            whole_elapsed_days = elapsed.days
+        return cls(
+            question_id=item.question_id,
+            rating=int(rating),
+            confidence=item.confidence,
+            state_before=state_before,
+            elapsed_days=elapsed_days,
+            stability_before=float(previous.stability) if seen else 0.0,
+            difficulty_before=float(previous.difficulty) if seen else 0.0,
+            whole_elapsed_days=whole_elapsed_days,
+        )
+
+@dataclass
+class SessionForCompletion:
+    user_id: str
+    topic_id: str
+    status: str
+    answered: List[AnsweredItem]
+    total_items: int
+
+async def load_session_for_completion(db: AsyncSession, session_id: str) -> Optional[SessionForCompletion]:
+    rows = (await db.execute(LOAD_SESSION_FOR_COMPLETION_SQL, {"session_id": session_id})).all()
+    if not rows:
+        return None
+
+    answered = []
+    for row in rows:
+        if row.question_id is None or row.is_correct is None:
+            continue
+        previous = None
+        if row.state is not None:
+            previous = ScheduledState(
+                state=row.state,
+                stability=float(row.stability),
+                difficulty=float(row.difficulty),
+                reps=row.reps,
+                lapses=row.lapses,
+                next_due_at=as_utc(row.next_due_at),
+            )
+        answered.append(AnsweredItem(
+            question_id=row.question_id,
+            is_correct=row.is_correct,
+            confidence=row.confidence,
+            previous=previous,
+            last_reviewed_at=row.last_reviewed_at,
+        ))
+
+    first = rows[0]
+    return SessionForCompletion(
+        user_id=first.user_id,
+        topic_id=first.topic_id,
+        status=first.status,
+        answered=answered,
+        total_items=sum(1 for row in rows if row.question_id is not None),
+    )
+
+async def complete_session(
+    db: AsyncSession,
+    session_id: str,
+    session: SessionForCompletion,
+    now: datetime,
+) -> Dict[str, ScheduledState]:
+    """
+    Schedule every answered item with FSRS in memory (rated from correctness
+    and confidence) and write the session status, the review log and all new
+    states back in one statement, then recompute the user's dashboard stats
+    for the topic. The caller commits.
+    Returns the new state per question id.
+    """
+    scheduled: Dict[str, ScheduledState] = {}
+    correct: Dict[str, bool] = {}
+    reviews: List[Review] = []
+    last_review: Dict[str, Review] = {}
+    for item in session.answered:
+        # A question repeated within a session builds on its earlier review
+        if item.question_id in scheduled:
+            previous, last_reviewed_at = scheduled[item.question_id], now
+        else:
+            previous, last_reviewed_at = item.previous, item.last_reviewed_at
+        rating = rating_for(item.is_correct, item.confidence)
+        scheduled[item.question_id] = schedule_review(previous, last_reviewed_at, rating, now)
+        correct[item.question_id] = item.is_correct
+        reviews.append(Review.of(item, previous, last_reviewed_at, rating, now))
+        last_review[item.question_id] = reviews[-1]
+
+    question_ids = list(scheduled)
+    await db.execute(
+        COMPLETE_SESSION_SQL,
+        {
+            "session_id": session_id,
+            "now": now,
+            "question_ids": question_ids,
+            "states": [scheduled[q].state for q in question_ids],
+            "stabilities": [scheduled[q].stability for q in question_ids],
+            "difficulties": [scheduled[q].difficulty for q in question_ids],
+            "reps": [scheduled[q].reps for q in question_ids],
+            "lapses": [scheduled[q].lapses for q in question_ids],
+            "is_correct": [correct[q] for q in question_ids],
+            "next_due_at": [scheduled[q].next_due_at for q in question_ids],
+            "last_ratings": [last_review[q].rating for q in question_ids],
+            "last_states_before": [last_review[q].state_before for q in question_ids],
+            "stabilities_before": [last_review[q].stability_before for q in question_ids],
+            "difficulties_before": [last_review[q].difficulty_before for q in question_ids],
+            "whole_elapsed_days": [last_review[q].whole_elapsed_days for q in question_ids],
+            "review_question_ids": [review.question_id for review in reviews],
+            "ratings": [review.rating for review in reviews],
+            "confidences": [review.confidence for review in reviews],
+            "states_before": [review.state_before for review in reviews],
+            "elapsed_days": [review.elapsed_days for review in reviews],
+        },
+    )
+    await refresh_topic_stats(db, [session.user_id], session.topic_id, now)
+    return scheduled
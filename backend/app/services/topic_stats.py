@@ -0,0 +1,168 @@
+"""
+Per-user / per-topic dashboard aggregates (`user_topic_stats`).
+
+Rows are keyed by (user_id, class_level, topic_id). Session creation stamps
+`last_practiced_at` (inside the session insert, see session_store.py);
+completion recomputes the user's row for that topic from
+`user_question_state` in the same transaction. The dashboard then reads a
+handful of rows by primary key.
+
+`due_dates` keeps the sorted times at which seen cards become due, with the
+running number of cards due by each in `due_counts` (migration 015), so the
+number of questions due "now" is looked up in the row itself and never goes
+stale. A card counts as due once next_due_at <= now, the same rule session
+selection serves it by.
+
+Streaks live in `user_streaks` (updated when a session starts, days counted
+in STREAK_TIMEZONE). The stored run is only current while its last day is
+today or yesterday, which is checked at read time.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.fsrs_service import as_utc
+
+# Students are in Indonesia (WIB): a practice day runs midnight to midnight here.
+# Not configurable: migration 007 backfilled user_daily_activity in this zone,
+# and days counted in another would split or merge the stored ones.
+STREAK_TIMEZONE = "Asia/Jakarta"
+
+# Recompute rows from user_question_state for some users: cards are counted
+# per due time, then folded into the sorted due times + running totals
+_REFRESH_TOPIC_STATS = """
+INSERT INTO user_topic_stats (
+    user_id, class_level, topic_id, seen_count, due_dates, due_counts, last_practiced_at, updated_at
+)
+SELECT b.user_id,
+       b.class_level,
+       b.topic_id,
+       sum(b.seen),
+       coalesce(array_agg(b.due_at ORDER BY b.due_at) FILTER (WHERE b.cards > 0), '{{}}'),
+       coalesce(array_agg(b.running::integer ORDER BY b.due_at) FILTER (WHERE b.cards > 0), '{{}}'),
+       max(b.last_reviewed_at),
+       CAST(:now AS timestamptz)
+FROM (
+    SELECT s.user_id,
+           s.class_level,
+           s.topic_id,
+           s.next_due_at AS due_at,
+           count(*) AS seen,
+           count(*) FILTER (WHERE s.state <> 'new') AS cards,
+           sum(count(*) FILTER (WHERE s.state <> 'new')) OVER (
+               PARTITION BY s.user_id, s.class_level, s.topic_id ORDER BY s.next_due_at
+           ) AS running,
+           max(s.last_reviewed_at) AS last_reviewed_at
+    FROM user_question_state s
+    WHERE s.user_id = ANY(CAST(:user_ids AS text[])){topic_filter}
+    GROUP BY s.user_id, s.class_level, s.topic_id, s.next_due_at
+) b
+GROUP BY b.user_id, b.class_level, b.topic_id
+ON CONFLICT (user_id, class_level, topic_id) DO UPDATE SET
+    seen_count = EXCLUDED.seen_count,
+    due_dates = EXCLUDED.due_dates,
+    due_counts = EXCLUDED.due_counts,
+    last_practiced_at = GREATEST(user_topic_stats.last_practiced_at, EXCLUDED.last_practiced_at),
+    updated_at = EXCLUDED.updated_at
+"""
+# All topics (bulk scripts)
+REFRESH_TOPIC_STATS_SQL = text(_REFRESH_TOPIC_STATS.format(topic_filter=""))
+# One topic (session completion). A separate statement rather than an
+# optional filter, so a cached generic plan still seeks idx_uqs_slice on
+# (user_id, topic_id) instead of reading all of the user's states.
+REFRESH_ONE_TOPIC_STATS_SQL = text(_REFRESH_TOPIC_STATS.format(topic_filter="\n  AND s.topic_id = :topic_id"))
+
+# Due times up to now, found by binary search in the sorted due_dates
+_BUCKET = "width_bucket(CAST(:now AS timestamptz) AT TIME ZONE 'UTC', t.due_dates)"
+# Cards due now: the running total at the last of them
+_DUE_NOW = f"coalesce(t.due_counts[{_BUCKET}], 0)"
+# Next due time: when the count above next changes
+_NEXT_DUE = f"t.due_dates[{_BUCKET} + 1]"
+
+USER_TOPIC_STATS_SQL = text(f"""
+SELECT t.topic_id, t.seen_count, {_DUE_NOW} AS questions_due, {_NEXT_DUE} AS next_due_at, t.last_practiced_at
+FROM user_topic_stats t
+WHERE t.user_id = :user_id AND t.class_level = :class_level
+""")
+
+# Includes the user row, so a missing user comes back as no rows
+USER_TOTALS_SQL = text(f"""
+SELECT u.id,
+       coalesce(sum({_DUE_NOW}), 0) AS questions_due,
+       count(t.topic_id) FILTER (WHERE t.seen_count > 0) AS topics_active,
+       CASE
+           WHEN max(st.last_active_date) >= (CAST(:now AS timestamptz) AT TIME ZONE :tz)::date - 1
+           THEN max(st.current_streak)
+           ELSE 0
+       END AS current_streak,
+       coalesce(max(st.longest_streak), 0) AS longest_streak,
+       min({_NEXT_DUE}) AS next_due_at,
+       (date_trunc('day', CAST(:now AS timestamptz) AT TIME ZONE :tz) + interval '1 day') AT TIME ZONE :tz AS day_ends_at
+FROM users u
+LEFT JOIN user_streaks st ON st.user_id = u.id
+LEFT JOIN user_topic_stats t ON t.user_id = u.id
+WHERE u.id = :user_id
+GROUP BY u.id
+""")
+
+@dataclass
+class TopicStats:
+    seen_count: int
+    questions_due: int
+    next_due_at: Optional[datetime]  # next time questions_due grows
+    last_practiced_at: Optional[datetime]
+
+@dataclass
+class UserTotals:
+    questions_due: int
+    topics_active: int
+    current_streak: int
+    longest_streak: int
+    next_due_at: Optional[datetime]  # next time questions_due grows
+    day_ends_at: datetime  # end of today in STREAK_TIMEZONE
+
+async def refresh_topic_stats(
+    db: AsyncSession,
+    user_ids: Sequence[str],
+    topic_id: Optional[str],
+    now: datetime,
+):
+    """Recompute aggregates after user_question_state changed. The caller commits."""
+    params = {"user_ids": list(user_ids), "now": now}
+    if topic_id is None:
+        await db.execute(REFRESH_TOPIC_STATS_SQL, params)
+    else:
+        await db.execute(REFRESH_ONE_TOPIC_STATS_SQL, {**params, "topic_id": topic_id})
+
+async def get_topic_stats(db: AsyncSession, user_id: str, class_level: int, now: datetime) -> Dict[str, TopicStats]:
+    rows = (await db.execute(
+        USER_TOPIC_STATS_SQL, {"user_id": user_id, "class_level": class_level, "now": now}
+    )).all()
+    return {
+        row.topic_id: TopicStats(
+            seen_count=row.seen_count,
+            questions_due=row.questions_due,
+            next_due_at=as_utc(row.next_due_at),
+            last_practiced_at=row.last_practiced_at,
+        )
+        for row in rows
+    }
+
+async def get_user_totals(db: AsyncSession, user_id: str, now: datetime) -> Optional[UserTotals]:
+    """Totals across all topics plus streaks, or None if the user does not exist"""
+    row = (await db.execute(
+        USER_TOTALS_SQL, {"user_id": user_id, "now": now, "tz": STREAK_TIMEZONE}
+    )).first()
+    if row is None:
+        return None
+    return UserTotals(
+        questions_due=int(row.questions_due),
+        topics_active=row.topics_active,
+        current_streak=row.current_streak,
+        longest_streak=row.longest_streak,
+        next_due_at=as_utc(row.next_due_at),
+        day_ends_at=row.day_ends_at,
+    )
@@ -1,21 +1,140 @@
-import random
-from sqlalchemy.orm import Session
+"""
+User ID allocation.
+
+User IDs are 8-digit numbers (10000000-99999999) that students type to log
+in, so they should not be sequential. Each ID comes from the Postgres
+sequence `user_id_seq` passed through a keyed permutation of the 90M-ID space:
+distinct sequence values always give distinct IDs, so there is no
+check-then-insert and no retry loop.
+
+- Permutation: 8-round Feistel network over [0, 10^8) (two 4-digit halves,
+  keyed with USER_ID_SECRET), cycle-walked into [0, 9 * 10^7).
+- Sequence values are leased in blocks of USER_ID_BLOCK_SIZE per process,
+  one round trip per block. Values of a block left unused at shutdown are
+  skipped, which only wastes a little of the space.
+
+USER_ID_SECRET must never change once users exist: a new key is a different
+permutation and would start reissuing taken IDs. IDs created before this
+allocator were random, so inserts still use ON CONFLICT DO NOTHING and move
+on to the next value in the rare case of a clash.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from collections import deque
+from typing import Deque, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.models.models import User
 
-def generate_user_id(db: Session) -> str:
+logger = logging.getLogger(__name__)
+
+ID_MIN = 10_000_000
+ID_SPACE = 90_000_000  # 10000000..99999999
+FEISTEL_HALF = 10_000  # the network permutes [0, FEISTEL_HALF ** 2)
+FEISTEL_ROUNDS = 8
+
+USER_ID_BLOCK_SIZE = int(os.getenv("USER_ID_BLOCK_SIZE", "100"))
+# How many legacy (random) IDs a single signup may skip over
+MAX_ID_CLASHES = 20
+
+_DEV_SECRET = "mikir-kids-development-user-id-key"
+
+LEASE_SEQUENCE_BLOCK_SQL = text("SELECT nextval('user_id_seq') AS value FROM generate_series(1, :count)")
+
+def _round_value(key: bytes, round_index: int, half: int) -> int:
+    digest = hashlib.blake2b(
+        round_index.to_bytes(1, "big") + half.to_bytes(2, "big"), key=key, digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big") % FEISTEL_HALF
+
+def _feistel(value: int, key: bytes) -> int:
+    left, right = divmod(value, FEISTEL_HALF)
+    for round_index in range(FEISTEL_ROUNDS):
+        left, right = right, (left + _round_value(key, round_index, right)) % FEISTEL_HALF
+    return left * FEISTEL_HALF + right
+
+def permute(value: int, key: bytes) -> int:
+    """
+    Bijection on [0, ID_SPACE). The Feistel network permutes a slightly
+    larger domain; results outside ID_SPACE are fed back in (cycle walking),
+    ~1.1 rounds of the network on average.
+    """
+    if not 0 <= value < ID_SPACE:
+        raise ValueError(f"value must be in [0, {ID_SPACE})")
+    result = _feistel(value, key)
+    while result >= ID_SPACE:
+        result = _feistel(result, key)
+    return result
+
+def user_id_for(sequence_value: int, key: bytes) -> str:
+    return str(ID_MIN + permute(sequence_value, key))
+
+def _load_secret() -> bytes:
+    secret = os.getenv("USER_ID_SECRET")
+    if not secret:
+        if os.getenv("ENVIRONMENT") == "production":
+            raise ValueError("USER_ID_SECRET environment variable is not set")
+        logger.warning("USER_ID_SECRET is not set, using the development key")
+        secret = _DEV_SECRET
+    # blake2b keys are at most 64 bytes
+    return hashlib.sha256(secret.encode()).digest()
+
+class UserIdAllocator:
+    """Hands out IDs from sequence blocks leased by this process"""
+
+    def __init__(self, key: Optional[bytes] = None, block_size: int = USER_ID_BLOCK_SIZE):
+        self._key = key
+        self.block_size = block_size
+        self._values: Deque[int] = deque()
+        self._lock = asyncio.Lock()
+
+    @property
+    def key(self) -> bytes:
+        if self._key is None:
+            self._key = _load_secret()
+        return self._key
+
+    async def _lease(self, db: AsyncSession):
+        rows = (await db.execute(LEASE_SEQUENCE_BLOCK_SQL, {"count": self.block_size})).all()
+        self._values.extend(row.value for row in rows)
+
+    async def next_id(self, db: AsyncSession) -> str:
+        while not self._values:
+            async with self._lock:
+                # Another request may have refilled while we waited
+                if not self._values:
+                    await self._lease(db)
+        return user_id_for(self._values.popleft(), self.key)
+
+user_id_allocator = UserIdAllocator()
+
+async def generate_user_id(db: AsyncSession) -> str:
     """
-    Generate a unique 8-digit numeric user ID.
+    Allocate a new 8-digit numeric user ID (no database read).
     Returns a string like "12345678"
     """
-    max_attempts = 100
-    for _ in range(max_attempts):
-        # Generate 8-digit number
-        user_id = str(random.randint(10000000, 99999999))
-        
-        # Check if ID already exists
-        existing_user = db.query(User).filter(User.id == user_id).first()
-        if not existing_user:
-            return user_id
-    
-    raise Exception("Failed to generate unique user ID after multiple attempts")
+    return await user_id_allocator.next_id(db)
 
+async def create_user_with_new_id(db: AsyncSession, grade_level: str, class_level: int) -> User:
+    """
+    Insert a user under a freshly allocated ID. The caller commits.
+    Skips IDs already taken by users created before the allocator existed.
+    """
+    for _ in range(MAX_ID_CLASHES):
+        user_id = await generate_user_id(db)
+        user = (await db.execute(
+            insert(User)
+            .values(id=user_id, grade_level=grade_level, class_level=class_level)
+            .on_conflict_do_nothing(index_elements=[User.id])
+            .returning(User)
+        )).scalars().first()
+        if user is not None:
+            return user
+        logger.info("User ID %s already taken by a legacy user, skipping", user_id)
+
+    raise Exception("Failed to generate unique user ID after multiple attempts")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Load test for the practice flow.
+Usage: python benchmarks/load_test.py [--base-url http://localhost:8000] [--flows 500]
+                                      [--concurrency 50] [--session-size 15]
+                                      [--user-ids benchmarks/seeded_user_ids.txt]
+                                      [--output results.json] [--compare baseline.json]
+
+Each flow is what a student does in one sitting:
+create user -> dashboard stats + topics -> create session -> answer every
+question -> complete -> dashboard stats. --concurrency flows run at once.
+With --user-ids, flows reuse existing (seeded) users instead of signing
+up, so dashboards and question selection see real history.
+
+Reports p50/p95/p99 latency per endpoint, errors, and throughput.
+--output saves the numbers; --compare prints the change against a saved
+run, so a release can be compared with the previous one on the same data.
+Needs httpx: pip install -e ".[bench]"
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+try:
+    import httpx
+except ImportError:
+    sys.exit('httpx is not installed: pip install -e ".[bench]"')
+
+ENDPOINTS = [
+    ("POST", "/api/users"),
+    ("GET", "/api/dashboard/{user_id}/stats"),
+    ("GET", "/api/dashboard/{user_id}/topics"),
+    ("POST", "/api/sessions"),
+    ("POST", "/api/sessions/{session_id}/answer"),
+    ("POST", "/api/sessions/{session_id}/complete"),
+]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client, method, template, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[(method, template)] += 1
+            raise
+        self.latencies[(method, template)].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[(method, template)] += 1
+            response.raise_for_status()
+        return response
+
+async def run_flow(client, recorder, rng, user_id, grade_level, session_size):
+    if user_id is None:
+        response = await recorder.call(client, "POST", "/api/users", "/api/users",
+                                       json={"grade_level": grade_level, "class_level": 7 if grade_level == "SMP" else 10})
+        user_id = response.json()["user_id"]
+
+    await recorder.call(client, "GET", "/api/dashboard/{user_id}/stats", f"/api/dashboard/{user_id}/stats")
+    topics = (await recorder.call(client, "GET", "/api/dashboard/{user_id}/topics", f"/api/dashboard/{user_id}/topics")).json()
+    if not topics:
+        return
+
+    topic = rng.choice(topics)
+    session = (await recorder.call(client, "POST", "/api/sessions", "/api/sessions", json={
+        "user_id": user_id, "topic_id": topic["topic_id"], "session_size": session_size,
+    })).json()
+    session_id = session["session_id"]
+
+    for question in session["questions"]:
+        await recorder.call(
+            client, "POST", "/api/sessions/{session_id}/answer", f"/api/sessions/{session_id}/answer",
+            json={"user_id": user_id, "question_id": question["id"], "answer": rng.choice("ABCD")},
+        )
+    await recorder.call(client, "POST", "/api/sessions/{session_id}/complete", f"/api/sessions/{session_id}/complete",
+                        json={"user_id": user_id})
+    await recorder.call(client, "GET", "/api/dashboard/{user_id}/stats", f"/api/dashboard/{user_id}/stats")
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(recorder, elapsed, flows_done, flows_failed):
+    endpoints = {}
+    for method, template in ENDPOINTS:
+        values = sorted(recorder.latencies.get((method, template), []))
+        endpoints[f"{method} {template}"] = {
+            "count": len(values),
+            "errors": recorder.errors.get((method, template), 0),
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000,
+        }
+    requests_done = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "elapsed_seconds": elapsed,
+        "flows": flows_done,
+        "flows_failed": flows_failed,
+        "flows_per_second": flows_done / elapsed if elapsed else 0.0,
+        "requests_per_second": requests_done / elapsed if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+def print_summary(summary, baseline=None):
+    print(f"\n{'endpoint':<42} {'count':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, row in summary["endpoints"].items():
+        line = (f"{name:<42} {row['count']:>7} {row['errors']:>6} {row['p50_ms']:>8.1f} "
+                f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+        previous = (baseline or {}).get("endpoints", {}).get(name)
+        if previous and previous["p95_ms"]:
+            line += f"   p95 {100 * (row['p95_ms'] / previous['p95_ms'] - 1):+.0f}%"
+        print(line)
+    print(f"\n{summary['flows']} flows ({summary['flows_failed']} failed) in {summary['elapsed_seconds']:.1f}s: "
+          f"{summary['flows_per_second']:.1f} flows/s, {summary['requests_per_second']:.0f} requests/s")
+    if baseline:
+        print(f"baseline: {baseline['flows_per_second']:.1f} flows/s, {baseline['requests_per_second']:.0f} requests/s")
+
+async def run(args):
+    rng = random.Random(args.seed)
+    user_ids = []
+    if args.user_ids:
+        user_ids = [line.strip() for line in Path(args.user_ids).read_text().splitlines() if line.strip()]
+
+    recorder = Recorder()
+    queue = asyncio.Queue()
+    for i in range(args.flows):
+        queue.put_nowait(rng.choice(user_ids) if user_ids else None)
+    flows_done = flows_failed = 0
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        try:
+            await client.get("/health")
+        except httpx.HTTPError:
+            sys.exit(f"Cannot connect to {args.base_url}. Is the server running?")
+
+        async def worker(worker_id):
+            nonlocal flows_done, flows_failed
+            worker_rng = random.Random(args.seed * 1000 + worker_id)
+            while True:
+                try:
+                    user_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await run_flow(client, recorder, worker_rng, user_id, worker_rng.choice(["SMP", "SMA"]),
+                                   args.session_size)
+                    flows_done += 1
+                except (httpx.HTTPError, KeyError, ValueError):
+                    flows_failed += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(recorder, elapsed, flows_done, flows_failed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--flows", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--session-size", type=int, default=15)
+    parser.add_argument("--user-ids", help="file with one existing user ID per line (see seed.py)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print(f"Running {args.flows} flows, {args.concurrency} at a time, against {args.base_url}...")
+    summary = asyncio.run(run(args))
+    summary["config"] = {key: getattr(args, key) for key in ("flows", "concurrency", "session_size", "user_ids")}
+    print_summary(summary, baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2) + "\n")
+        print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
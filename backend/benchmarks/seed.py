@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Seed the database with benchmark volumes.
+Usage: python benchmarks/seed.py [--reset] [any scripts/generate_data.py option]
+
+Runs scripts/generate_data.py with the benchmark preset: 100k users, 50k
+questions and ~20M FSRS states, topic and question IDs prefixed BENCH_.
+Options given here override the preset (e.g. `--states 2000000 --no-sessions`
+for a quicker seed). Writes a sample of seeded user IDs to
+benchmarks/seeded_user_ids.txt for `load_test.py --user-ids`.
+
+Only point this at a local database, never at Supabase.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import generate_data
+
+USER_ID_SAMPLE_FILE = Path(__file__).parent / "seeded_user_ids.txt"
+
+PRESET = [
+    "--prefix", "BENCH_",
+    "--users", "100000",
+    "--questions", "50000",
+    "--states", "20000000",
+    "--topics", "60",
+    "--user-ids-out", str(USER_ID_SAMPLE_FILE),
+]
+
+if __name__ == "__main__":
+    # argparse keeps the last value, so command-line options win over the preset
+    generate_data.main(PRESET + sys.argv[1:])
@@ -9,7 +9,7 @@ CREATE TABLE IF NOT EXISTS users (
   created_at TIMESTAMP DEFAULT NOW()
 );
 
-CREATE INDEX IF NOT EXISTS idx_users_id ON users(id);
+-- No separate index on users(id): the primary key already is one
 
 -- Topics table
 CREATE TABLE IF NOT EXISTS topics (
@@ -43,7 +43,7 @@ CREATE TABLE IF NOT EXISTS questions (
   created_at TIMESTAMP DEFAULT NOW()
 );
 
-CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions(topic_id);
+-- Lookups by topic use idx_questions_slice (migration 009)
 
 -- User Question State (FSRS) table
 CREATE TABLE IF NOT EXISTS user_question_state (
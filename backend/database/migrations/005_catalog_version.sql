@@ -0,0 +1,36 @@
+-- Migration: Catalog version stamp
+-- The API caches topics and questions in memory. It reloads them when this
+-- version changes, so bump it whenever content (topics/questions) is modified.
+-- run_migrations.py bumps it automatically after every run.
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),  -- single-row table
+  version BIGINT NOT NULL DEFAULT 1,
+  updated_at TIMESTAMP DEFAULT NOW()
+);
+
+INSERT INTO catalog_version (id, version) VALUES (TRUE, 1)
+ON CONFLICT (id) DO NOTHING;
+
+-- Call after editing content by hand: SELECT bump_catalog_version();
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS BIGINT AS $$
+  UPDATE catalog_version
+  SET version = version + 1, updated_at = NOW()
+  WHERE id
+  RETURNING version;
+$$ LANGUAGE sql;
+
+-- RLS: internal bookkeeping, deny all access to anon/authenticated
+REVOKE ALL ON catalog_version FROM PUBLIC;
+REVOKE ALL ON catalog_version FROM anon;
+
+ALTER TABLE catalog_version ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "catalog_version_no_access" ON catalog_version;
+
+CREATE POLICY "catalog_version_no_access"
+  ON catalog_version
+  FOR ALL
+  TO anon, authenticated
+  USING (false)
+  WITH CHECK (false);
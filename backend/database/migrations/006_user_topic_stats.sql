@@ -0,0 +1,51 @@
+-- Migration: Per-user / per-topic dashboard aggregates
+-- Maintained by the API: session creation stamps last_practiced_at, session
+-- completion recomputes the row for that user/topic from user_question_state.
+-- The dashboard reads these rows by primary key instead of aggregating the
+-- student's full history.
+--
+-- due_dates holds the next due time of every seen card in the topic, sorted,
+-- so "questions due now" stays exact as time passes without any write.
+
+CREATE TABLE IF NOT EXISTS user_topic_stats (
+  user_id TEXT NOT NULL REFERENCES users(id),
+  class_level INTEGER NOT NULL,
+  topic_id TEXT NOT NULL REFERENCES topics(id),
+
+  seen_count INTEGER NOT NULL DEFAULT 0,
+  due_dates TIMESTAMP[] NOT NULL DEFAULT '{}',
+  last_practiced_at TIMESTAMP,
+
+  updated_at TIMESTAMP DEFAULT NOW(),
+
+  PRIMARY KEY (user_id, class_level, topic_id)
+);
+
+-- Backfill from existing progress
+INSERT INTO user_topic_stats (user_id, class_level, topic_id, seen_count, due_dates, last_practiced_at)
+SELECT s.user_id,
+       q.class_level,
+       q.topic_id,
+       count(*),
+       coalesce(array_agg(s.next_due_at ORDER BY s.next_due_at) FILTER (WHERE s.state <> 'new'), '{}'),
+       (SELECT max(se.started_at) FROM sessions se
+        WHERE se.user_id = s.user_id AND se.topic_id = q.topic_id)
+FROM user_question_state s
+JOIN questions q ON q.id = s.question_id
+GROUP BY s.user_id, q.class_level, q.topic_id
+ON CONFLICT (user_id, class_level, topic_id) DO NOTHING;
+
+-- RLS: per-student data, same rules as user_question_state
+REVOKE ALL ON user_topic_stats FROM PUBLIC;
+REVOKE ALL ON user_topic_stats FROM anon;
+
+ALTER TABLE user_topic_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "user_topic_stats_no_access" ON user_topic_stats;
+
+CREATE POLICY "user_topic_stats_no_access"
+  ON user_topic_stats
+  FOR ALL
+  TO anon, authenticated
+  USING (false)
+  WITH CHECK (false);
@@ -0,0 +1,81 @@
+-- Migration: Daily activity and streak counters
+-- One row per user per day with practice (days in Asia/Jakarta), plus a
+-- per-user counter row updated when a session starts. The dashboard reads
+-- the counter instead of scanning sessions.
+-- Timestamps are stored as UTC; day boundaries are converted with AT TIME ZONE.
+-- The zone is fixed: app/services/topic_stats.py STREAK_TIMEZONE counts new
+-- days in the same one.
+
+CREATE TABLE IF NOT EXISTS user_daily_activity (
+  user_id TEXT NOT NULL REFERENCES users(id),
+  activity_date DATE NOT NULL,  -- local date in Asia/Jakarta
+  sessions_started INTEGER NOT NULL DEFAULT 0,
+
+  PRIMARY KEY (user_id, activity_date)
+);
+
+CREATE TABLE IF NOT EXISTS user_streaks (
+  user_id TEXT PRIMARY KEY REFERENCES users(id),
+  current_streak INTEGER NOT NULL DEFAULT 0,  -- run of days ending at last_active_date
+  longest_streak INTEGER NOT NULL DEFAULT 0,
+  last_active_date DATE,
+  updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Backfill daily activity from existing sessions
+INSERT INTO user_daily_activity (user_id, activity_date, sessions_started)
+SELECT user_id,
+       (started_at AT TIME ZONE 'UTC' AT TIME ZONE 'Asia/Jakarta')::date,
+       count(*)
+FROM sessions
+WHERE started_at IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT (user_id, activity_date) DO NOTHING;
+
+-- Backfill streaks (gaps and islands): consecutive dates minus their row
+-- number share a constant, which identifies each run of days
+WITH days AS (
+  SELECT user_id,
+         activity_date,
+         activity_date - CAST(row_number() OVER (PARTITION BY user_id ORDER BY activity_date) AS INTEGER) AS island
+  FROM user_daily_activity
+),
+islands AS (
+  SELECT user_id, island, count(*) AS length, max(activity_date) AS last_day
+  FROM days
+  GROUP BY user_id, island
+)
+INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_active_date)
+SELECT user_id,
+       (array_agg(length ORDER BY last_day DESC))[1],
+       max(length),
+       max(last_day)
+FROM islands
+GROUP BY user_id
+ON CONFLICT (user_id) DO NOTHING;
+
+-- RLS: per-student data, deny all access to anon/authenticated
+REVOKE ALL ON user_daily_activity FROM PUBLIC;
+REVOKE ALL ON user_daily_activity FROM anon;
+REVOKE ALL ON user_streaks FROM PUBLIC;
+REVOKE ALL ON user_streaks FROM anon;
+
+ALTER TABLE user_daily_activity ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_streaks ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "user_daily_activity_no_access" ON user_daily_activity;
+DROP POLICY IF EXISTS "user_streaks_no_access" ON user_streaks;
+
+CREATE POLICY "user_daily_activity_no_access"
+  ON user_daily_activity
+  FOR ALL
+  TO anon, authenticated
+  USING (false)
+  WITH CHECK (false);
+
+CREATE POLICY "user_streaks_no_access"
+  ON user_streaks
+  FOR ALL
+  TO anon, authenticated
+  USING (false)
+  WITH CHECK (false);
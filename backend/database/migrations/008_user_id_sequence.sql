@@ -0,0 +1,15 @@
+-- Migration: User ID sequence
+-- The API maps each value through a keyed permutation of the 8-digit ID
+-- space (app/services/user_id_service.py), so IDs look random but never
+-- collide. One value per possible ID; the sequence must never be reset.
+
+CREATE SEQUENCE IF NOT EXISTS user_id_seq
+  AS BIGINT
+  MINVALUE 0
+  MAXVALUE 89999999
+  START WITH 0
+  NO CYCLE;
+
+-- Only the backend (service role) allocates IDs
+REVOKE ALL ON SEQUENCE user_id_seq FROM PUBLIC;
+REVOKE ALL ON SEQUENCE user_id_seq FROM anon;
@@ -0,0 +1,74 @@
+-- Migration: Indexes for the hot access paths
+-- Session creation reads the user's states in one topic/class slice
+-- (question_selection.py) and completion recomputes that slice's dashboard
+-- row (topic_stats.py). Both used to reach the slice by joining every state
+-- of the user to questions. user_question_state now carries the question's
+-- topic_id and class_level, so the slice is a single index range.
+--
+-- Check the plans at scale with test_indexes.py after benchmarks/seed.py.
+
+ALTER TABLE user_question_state ADD COLUMN IF NOT EXISTS topic_id TEXT;
+ALTER TABLE user_question_state ADD COLUMN IF NOT EXISTS class_level INTEGER;
+
+UPDATE user_question_state s
+SET topic_id = q.topic_id, class_level = q.class_level
+FROM questions q
+WHERE q.id = s.question_id
+  AND (s.topic_id IS NULL OR s.class_level IS NULL);
+
+ALTER TABLE user_question_state ALTER COLUMN topic_id SET NOT NULL;
+ALTER TABLE user_question_state ALTER COLUMN class_level SET NOT NULL;
+
+-- Writers only give (user_id, question_id): copy the slice from the question
+CREATE OR REPLACE FUNCTION set_state_slice() RETURNS TRIGGER AS $$
+BEGIN
+  SELECT q.topic_id, q.class_level INTO NEW.topic_id, NEW.class_level
+  FROM questions q
+  WHERE q.id = NEW.question_id;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_question_state_slice ON user_question_state;
+CREATE TRIGGER user_question_state_slice
+  BEFORE INSERT ON user_question_state
+  FOR EACH ROW
+  WHEN (NEW.topic_id IS NULL OR NEW.class_level IS NULL)
+  EXECUTE FUNCTION set_state_slice();
+
+-- ...and keep it in step if a question is moved to another topic/class
+CREATE OR REPLACE FUNCTION move_state_slice() RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE user_question_state
+  SET topic_id = NEW.topic_id, class_level = NEW.class_level
+  WHERE question_id = NEW.id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS questions_move_state_slice ON questions;
+CREATE TRIGGER questions_move_state_slice
+  AFTER UPDATE OF topic_id, class_level ON questions
+  FOR EACH ROW
+  WHEN (OLD.topic_id IS DISTINCT FROM NEW.topic_id OR OLD.class_level IS DISTINCT FROM NEW.class_level)
+  EXECUTE FUNCTION move_state_slice();
+
+-- Session creation: the user's cards in one slice with their due times,
+-- answered from the index alone (question_id/next_due_at are included)
+CREATE INDEX IF NOT EXISTS idx_uqs_slice
+  ON user_question_state(user_id, topic_id, class_level)
+  INCLUDE (question_id, next_due_at);
+
+-- Catalog loads and content queries filter questions by topic and class;
+-- replaces idx_questions_topic (its leading column), which 001 no longer
+-- creates; the DROP only cleans up databases created before that
+CREATE INDEX IF NOT EXISTS idx_questions_slice ON questions(topic_id, class_level, id);
+DROP INDEX IF EXISTS idx_questions_topic;
+
+-- Foreign key checks when questions are deleted or replaced (otherwise a
+-- sequential scan of session_items per deleted question)
+CREATE INDEX IF NOT EXISTS idx_session_items_question ON session_items(question_id);
+
+-- Duplicate of the primary key index: only cost writes (001 no longer
+-- creates it; dropped here on databases created before that)
+DROP INDEX IF EXISTS idx_users_id;
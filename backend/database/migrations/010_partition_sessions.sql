@@ -0,0 +1,177 @@
+-- Migration: Monthly partitions for sessions and session_items
+-- Session IDs are time-ordered (UUIDv7: the first 12 hex digits are the
+-- creation time in ms, see session_store.session_id_at), so both tables are
+-- range-partitioned on the session ID: one partition per UTC month, the same
+-- bounds for a session and its items. Every lookup by session ID then reads
+-- one partition (pruned at plan or execution time), and old months can be
+-- archived and dropped whole (scripts/maintain_partitions.py), which keeps
+-- vacuum and index sizes bounded by the months kept.
+--
+-- Rows outside every monthly partition (e.g. before the month was created)
+-- go to the default partitions; creating the month moves them over.
+-- Completed sessions from before this migration get a time-ordered ID
+-- derived from their start time, in-progress ones keep theirs so running
+-- clients are not affected.
+
+-- Lowest session ID created at or after `at`: the partition bound for it
+CREATE OR REPLACE FUNCTION session_id_floor(at TIMESTAMPTZ) RETURNS TEXT AS $$
+  SELECT substr(h, 1, 8) || '-' || substr(h, 9, 4) || '-0000-0000-000000000000'
+  FROM (SELECT lpad(to_hex(floor(extract(epoch FROM at) * 1000)::BIGINT), 12, '0') AS h) AS t
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Time-ordered ID for a session started at `at`, random part taken from `seed`
+CREATE OR REPLACE FUNCTION session_id_at(at TIMESTAMPTZ, seed TEXT) RETURNS TEXT AS $$
+  SELECT substr(h, 1, 8) || '-' || substr(h, 9, 4) || '-7' || substr(r, 1, 3)
+         || '-8' || substr(r, 4, 3) || '-' || substr(r, 7, 12)
+  FROM (SELECT lpad(to_hex(floor(extract(epoch FROM at) * 1000)::BIGINT), 12, '0') AS h, md5(seed) AS r) AS t
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Create the partitions of `month` (UTC) for both tables; false if they exist.
+-- Run ahead of time by scripts/maintain_partitions.py.
+CREATE OR REPLACE FUNCTION create_session_partitions(month DATE) RETURNS BOOLEAN AS $$
+DECLARE
+  first_day TIMESTAMP := date_trunc('month', month::TIMESTAMP);
+  lo TEXT := session_id_floor(first_day AT TIME ZONE 'UTC');
+  hi TEXT := session_id_floor((first_day + INTERVAL '1 month') AT TIME ZONE 'UTC');
+  sessions_part TEXT := 'sessions_' || to_char(month, '"p"YYYY_MM');
+  items_part TEXT := 'session_items_' || to_char(month, '"p"YYYY_MM');
+BEGIN
+  IF to_regclass(sessions_part) IS NOT NULL THEN
+    RETURN FALSE;
+  END IF;
+
+  EXECUTE format('CREATE TABLE %I (LIKE sessions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', sessions_part);
+  EXECUTE format('CREATE TABLE %I (LIKE session_items INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', items_part);
+
+  -- Rows that landed in the default partitions before this month existed
+  EXECUTE format('INSERT INTO %I SELECT * FROM sessions_default WHERE id >= %L AND id < %L', sessions_part, lo, hi);
+  EXECUTE format('INSERT INTO %I SELECT * FROM session_items_default WHERE session_id >= %L AND session_id < %L',
+                 items_part, lo, hi);
+  DELETE FROM session_items_default WHERE session_id >= lo AND session_id < hi;
+  DELETE FROM sessions_default WHERE id >= lo AND id < hi;
+
+  EXECUTE format('ALTER TABLE sessions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', sessions_part, lo, hi);
+  EXECUTE format('ALTER TABLE session_items ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', items_part, lo, hi);
+
+  -- Partitions are tables of their own to PostgREST: lock them down like the parents
+  EXECUTE format('REVOKE ALL ON %I FROM PUBLIC, anon', sessions_part);
+  EXECUTE format('REVOKE ALL ON %I FROM PUBLIC, anon', items_part);
+  EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', sessions_part);
+  EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', items_part);
+  RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+  month DATE;
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'sessions'::regclass) = 'p' THEN
+    RETURN;  -- already partitioned
+  END IF;
+
+  -- Keep the old tables aside (index names are schema-wide) until copied
+  ALTER TABLE session_items RENAME TO session_items_unpartitioned;
+  ALTER TABLE sessions RENAME TO sessions_unpartitioned;
+  ALTER INDEX sessions_pkey RENAME TO sessions_unpartitioned_pkey;
+  ALTER INDEX session_items_pkey RENAME TO session_items_unpartitioned_pkey;
+  ALTER INDEX idx_sessions_user RENAME TO idx_sessions_unpartitioned_user;
+  ALTER INDEX idx_session_items_session RENAME TO idx_session_items_unpartitioned_session;
+  ALTER INDEX IF EXISTS idx_session_items_question RENAME TO idx_session_items_unpartitioned_question;
+
+  CREATE TABLE sessions (
+    id TEXT NOT NULL,
+    user_id TEXT NOT NULL REFERENCES users(id),
+    topic_id TEXT NOT NULL REFERENCES topics(id),
+
+    status TEXT NOT NULL DEFAULT 'in_progress'
+      CHECK (status IN ('in_progress', 'completed', 'abandoned')),
+
+    started_at TIMESTAMP DEFAULT NOW(),
+    completed_at TIMESTAMP,
+
+    PRIMARY KEY (id)
+  ) PARTITION BY RANGE (id);
+
+  CREATE TABLE session_items (
+    id TEXT NOT NULL,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    question_id TEXT NOT NULL REFERENCES questions(id),
+
+    sequence INTEGER NOT NULL,
+    user_answer TEXT,
+    is_correct BOOLEAN,
+    answered_at TIMESTAMP,
+
+    -- The partition key must be part of the key; item IDs stay unique on their own
+    PRIMARY KEY (id, session_id)
+  ) PARTITION BY RANGE (session_id);
+
+  CREATE INDEX idx_sessions_user ON sessions(user_id, started_at DESC);
+  CREATE INDEX idx_session_items_session ON session_items(session_id, sequence);
+  CREATE INDEX idx_session_items_question ON session_items(question_id);
+
+  CREATE TABLE sessions_default PARTITION OF sessions DEFAULT;
+  CREATE TABLE session_items_default PARTITION OF session_items DEFAULT;
+  REVOKE ALL ON sessions_default, session_items_default FROM PUBLIC, anon;
+  ALTER TABLE sessions_default ENABLE ROW LEVEL SECURITY;
+  ALTER TABLE session_items_default ENABLE ROW LEVEL SECURITY;
+
+  -- Every month with sessions, and the next three
+  FOR month IN
+    SELECT generate_series(
+      date_trunc('month', coalesce((SELECT min(started_at) FROM sessions_unpartitioned), NOW() AT TIME ZONE 'UTC')),
+      date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '3 months',
+      INTERVAL '1 month'
+    )::DATE
+  LOOP
+    PERFORM create_session_partitions(month);
+  END LOOP;
+
+  CREATE TEMPORARY TABLE session_id_map ON COMMIT DROP AS
+  SELECT id AS old_id,
+         CASE
+           WHEN status = 'in_progress' OR substr(id, 15, 1) = '7' THEN id
+           ELSE session_id_at(coalesce(started_at, NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', id)
+         END AS new_id
+  FROM sessions_unpartitioned;
+
+  INSERT INTO sessions (id, user_id, topic_id, status, started_at, completed_at)
+  SELECT m.new_id, s.user_id, s.topic_id, s.status, s.started_at, s.completed_at
+  FROM sessions_unpartitioned s
+  JOIN session_id_map m ON m.old_id = s.id;
+
+  INSERT INTO session_items (id, session_id, question_id, sequence, user_answer, is_correct, answered_at)
+  SELECT i.id, m.new_id, i.question_id, i.sequence, i.user_answer, i.is_correct, i.answered_at
+  FROM session_items_unpartitioned i
+  JOIN session_id_map m ON m.old_id = i.session_id;
+
+  DROP TABLE session_items_unpartitioned;
+  DROP TABLE sessions_unpartitioned;
+END;
+$$;
+
+-- RLS: same rules as before (003_enable_rls.sql re-applies them on later runs)
+REVOKE ALL ON sessions FROM PUBLIC;
+REVOKE ALL ON sessions FROM anon;
+REVOKE ALL ON session_items FROM PUBLIC;
+REVOKE ALL ON session_items FROM anon;
+
+ALTER TABLE sessions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE session_items ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "sessions_no_access" ON sessions;
+CREATE POLICY "sessions_no_access"
+  ON sessions
+  FOR ALL
+  TO anon, authenticated
+  USING (false)
+  WITH CHECK (false);
+
+DROP POLICY IF EXISTS "session_items_no_access" ON session_items;
+CREATE POLICY "session_items_no_access"
+  ON session_items
+  FOR ALL
+  TO anon, authenticated
+  USING (false)
+  WITH CHECK (false);
@@ -0,0 +1,41 @@
+-- Migration: Hourly due buckets in user_topic_stats
+-- `due_dates` used to hold the due time of every seen card, and every
+-- dashboard read counted the entries up to now. Cards are now bucketed by
+-- the hour they become due in: the next full hour (UTC) at or after their
+-- FSRS due time, so a card due at 10:20 counts as due from 11:00.
+-- `due_dates` holds the bucket hours, sorted, and `due_counts` the number of
+-- cards due by each of them (a running total). "How many are due now" is a
+-- binary search (width_bucket) plus one array lookup, and due counts, cached
+-- dashboards and session queues change at most once an hour.
+
+-- Bucket hour of a due time: rounded up to the full hour, as UTC timestamp
+CREATE OR REPLACE FUNCTION due_hour(due TIMESTAMPTZ) RETURNS TIMESTAMP AS $$
+  SELECT to_timestamp(ceil(extract(epoch FROM due) / 3600) * 3600) AT TIME ZONE 'UTC'
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE user_topic_stats ADD COLUMN IF NOT EXISTS due_counts INTEGER[] NOT NULL DEFAULT '{}';
+
+-- Convert rows still in the per-card layout (also anything 006 backfills on a re-run)
+UPDATE user_topic_stats t
+SET due_dates = b.hours, due_counts = b.counts
+FROM (
+  SELECT user_id, class_level, topic_id,
+         array_agg(hour ORDER BY hour) AS hours,
+         array_agg(running::INTEGER ORDER BY hour) AS counts
+  FROM (
+    SELECT t.user_id, t.class_level, t.topic_id,
+           due_hour(d.due AT TIME ZONE 'UTC') AS hour,
+           sum(count(*)) OVER (
+             PARTITION BY t.user_id, t.class_level, t.topic_id
+             ORDER BY due_hour(d.due AT TIME ZONE 'UTC')
+           ) AS running
+    FROM user_topic_stats t
+    CROSS JOIN LATERAL unnest(t.due_dates) AS d(due)
+    WHERE cardinality(t.due_dates) <> cardinality(t.due_counts)
+    GROUP BY t.user_id, t.class_level, t.topic_id, due_hour(d.due AT TIME ZONE 'UTC')
+  ) per_hour
+  GROUP BY user_id, class_level, topic_id
+) b
+WHERE t.user_id = b.user_id
+  AND t.class_level = b.class_level
+  AND t.topic_id = b.topic_id;
@@ -0,0 +1,60 @@
+-- Migration: Append-only review log, answer confidence
+-- user_question_state only keeps each card's latest FSRS state, and
+-- session_items only the latest answer, so the scheduler's weights could
+-- never be fitted to our own students. Session completion now appends one
+-- row per scheduled review (in the same statement as the state upsert);
+-- scripts/optimize_fsrs.py fits FSRS parameters per class level from it.
+--
+-- Rows are never updated. session_id has no foreign key: session
+-- partitions are archived and dropped (scripts/maintain_partitions.py),
+-- the review history is kept.
+
+CREATE TABLE IF NOT EXISTS review_log (
+  id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id),
+  question_id TEXT NOT NULL REFERENCES questions(id),
+  session_id TEXT NOT NULL,
+  class_level INTEGER NOT NULL,  -- the question's, the cohort weights are fitted for
+
+  rating SMALLINT NOT NULL CHECK (rating BETWEEN 0 AND 3),  -- fsrs Rating: again, hard, good, easy
+  confidence TEXT CHECK (confidence IN ('guessed', 'pretty_sure', 'very_sure')),
+  state_before TEXT NOT NULL
+    CHECK (state_before IN ('new', 'learning', 'review', 'relearning')),
+  elapsed_days DOUBLE PRECISION,  -- since the card's previous review, NULL for the first
+
+  reviewed_at TIMESTAMPTZ NOT NULL
+);
+
+-- The optimizer reads each card's reviews in order
+CREATE INDEX IF NOT EXISTS idx_review_log_card ON review_log(user_id, question_id, reviewed_at);
+
+CREATE OR REPLACE FUNCTION review_log_append_only() RETURNS TRIGGER AS $$
+BEGIN
+  RAISE EXCEPTION 'review_log is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS review_log_append_only ON review_log;
+CREATE TRIGGER review_log_append_only
+  BEFORE UPDATE ON review_log
+  FOR EACH ROW
+  EXECUTE FUNCTION review_log_append_only();
+
+-- How sure the student was (PRD 6.3); picks the rating of a right answer
+ALTER TABLE session_items ADD COLUMN IF NOT EXISTS confidence TEXT
+  CHECK (confidence IN ('guessed', 'pretty_sure', 'very_sure'));
+
+-- RLS: per-student data, same rules as user_question_state
+REVOKE ALL ON review_log FROM PUBLIC;
+REVOKE ALL ON review_log FROM anon;
+
+ALTER TABLE review_log ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "review_log_no_access" ON review_log;
+
+CREATE POLICY "review_log_no_access"
+  ON review_log
+  FOR ALL
+  TO anon, authenticated
+  USING (false)
+  WITH CHECK (false);
@@ -0,0 +1,30 @@
+-- Migration: One question per archive source
+-- UN archive questions are identified by their exam year, package and
+-- number. scripts/import_questions.py merges on that identity, so a
+-- re-import updates the question instead of adding a copy. NULLs are
+-- distinct in a unique index: hand-written questions without a source are
+-- not affected.
+
+DO $$
+DECLARE
+  clashes BIGINT;
+BEGIN
+  IF to_regclass('idx_questions_source') IS NULL THEN
+    SELECT count(*) INTO clashes
+    FROM (
+      SELECT 1
+      FROM questions
+      WHERE source_year IS NOT NULL AND source_package IS NOT NULL AND source_number IS NOT NULL
+      GROUP BY source_year, source_package, source_number
+      HAVING count(*) > 1
+    ) shared;
+    IF clashes > 0 THEN
+      RAISE EXCEPTION '% source identities (year, package, number) are used by more than one question; '
+                      'give each question its own source before running this migration', clashes;
+    END IF;
+  END IF;
+END
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_source
+  ON questions(source_year, source_package, source_number);
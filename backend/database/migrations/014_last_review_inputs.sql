@@ -0,0 +1,17 @@
+-- Migration: Inputs of each card's last review
+-- A card's due date depends on the rating it was last given (Hard, Good and
+-- Easy get different intervals) and on the memory state before that review,
+-- neither of which user_question_state kept. scripts/reschedule_fsrs.py
+-- replays the last review with the vectorized scheduler to move due dates
+-- after a parameter change; with unchanged parameters the replay gives the
+-- stored due date back.
+-- Set by session completion; NULL for cards last reviewed before this
+-- migration, which the re-scheduler leaves alone.
+
+ALTER TABLE user_question_state
+  ADD COLUMN IF NOT EXISTS last_rating SMALLINT CHECK (last_rating BETWEEN 0 AND 3),  -- fsrs Rating
+  ADD COLUMN IF NOT EXISTS last_state_before TEXT
+    CHECK (last_state_before IN ('new', 'learning', 'review', 'relearning')),
+  ADD COLUMN IF NOT EXISTS last_stability_before NUMERIC,
+  ADD COLUMN IF NOT EXISTS last_difficulty_before NUMERIC,
+  ADD COLUMN IF NOT EXISTS last_elapsed_days INTEGER;  -- whole days, as fsrs counts them
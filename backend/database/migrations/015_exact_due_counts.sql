@@ -0,0 +1,42 @@
+-- Migration: Exact due counts on the dashboard
+-- 011 counted a card as due from the next full hour after its due time, but
+-- sessions serve a card as soon as its due time has passed, so the
+-- dashboard could say "0 due" for up to an hour while a session served due
+-- cards. `due_dates` now holds the distinct due times themselves (sorted,
+-- with the running totals in `due_counts`): the dashboard counts a card as
+-- due when next_due_at <= now, the same rule as session selection, and
+-- cached dashboards expire when the next card becomes due. Hourly buckets
+-- only batch background session queue rebuilds (app/services/due_buckets.py).
+
+-- Recompute rows still in the hourly layout (every due time on the full
+-- hour). A row whose exact due times all happen to be on the hour is
+-- recomputed again on a re-run, with the same result.
+UPDATE user_topic_stats t
+SET due_dates = b.dates, due_counts = b.counts
+FROM (
+  SELECT user_id, class_level, topic_id,
+         array_agg(due ORDER BY due) AS dates,
+         array_agg(running::INTEGER ORDER BY due) AS counts
+  FROM (
+    SELECT s.user_id, s.class_level, s.topic_id,
+           s.next_due_at AS due,
+           sum(count(*)) OVER (
+             PARTITION BY s.user_id, s.class_level, s.topic_id
+             ORDER BY s.next_due_at
+           ) AS running
+    FROM user_question_state s
+    JOIN user_topic_stats h
+      ON h.user_id = s.user_id AND h.class_level = s.class_level AND h.topic_id = s.topic_id
+    WHERE s.state <> 'new'
+      AND cardinality(h.due_dates) > 0
+      AND cardinality(h.due_dates) = cardinality(h.due_counts)
+      AND NOT EXISTS (
+        SELECT 1 FROM unnest(h.due_dates) AS d(due) WHERE d.due <> date_trunc('hour', d.due)
+      )
+    GROUP BY s.user_id, s.class_level, s.topic_id, s.next_due_at
+  ) per_due
+  GROUP BY user_id, class_level, topic_id
+) b
+WHERE t.user_id = b.user_id
+  AND t.class_level = b.class_level
+  AND t.topic_id = b.topic_id;
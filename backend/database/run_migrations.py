@@ -65,6 +65,11 @@ try:
                 print(f"❌ Error in {migration_file.name}: {e}")
                 raise
     
+    # Content may have changed: bump the catalog version so running API
+    # replicas reload their in-memory question catalog
+    cursor.execute("SELECT bump_catalog_version();")
+    print(f"\n✅ Catalog version bumped to {cursor.fetchone()[0]}")
+    
     cursor.close()
     conn.close()
     
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark new-question sampling as a topic grows.
+Usage: python scripts/benchmark_question_sampling.py [--db]
+
+Times `sample_unseen` (what POST /api/sessions uses) for topics of 50 to
+50,000 questions. With --db it also times the old
+`ORDER BY random() LIMIT n` query against a temporary table in the
+database from DATABASE_URL, for comparison.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.question_selection import sample_unseen
+
+SIZES = [50, 500, 5_000, 50_000]
+SESSION_SIZE = 15
+SEEN_FRACTION = 0.3  # share of the topic the student has already practiced
+REPEATS = 200
+
+def time_call(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+def bench_memory():
+    print(f"In-memory sampling ({SESSION_SIZE} new questions, {int(SEEN_FRACTION * 100)}% of topic seen)")
+    print(f"{'questions':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    rng = random.Random(42)
+    for size in SIZES:
+        pool = tuple(f"Q_{i:06d}" for i in range(size))
+        seen = set(rng.sample(pool, int(size * SEEN_FRACTION)))
+        p50, p95 = time_call(lambda: sample_unseen(pool, seen, SESSION_SIZE, rng), REPEATS)
+        print(f"{size:>10} {p50:>10.4f} {p95:>10.4f}")
+
+def bench_order_by_random():
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("ERROR: DATABASE_URL not found in .env file")
+        sys.exit(1)
+
+    conn = psycopg2.connect(database_url)
+    cursor = conn.cursor()
+    print(f"\nORDER BY random() LIMIT {SESSION_SIZE} (temporary table)")
+    print(f"{'questions':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    try:
+        for size in SIZES:
+            cursor.execute("DROP TABLE IF EXISTS bench_questions")
+            cursor.execute("""
+                CREATE TEMP TABLE bench_questions AS
+                SELECT 'Q_' || lpad(i::text, 6, '0') AS id, 'BENCH' AS topic_id, 8 AS class_level
+                FROM generate_series(1, %s) AS i
+            """, (size,))
+            cursor.execute("ANALYZE bench_questions")
+
+            def query():
+                cursor.execute(
+                    "SELECT id FROM bench_questions WHERE topic_id = 'BENCH' AND class_level = 8 "
+                    "ORDER BY random() LIMIT %s",
+                    (SESSION_SIZE,),
+                )
+                cursor.fetchall()
+
+            p50, p95 = time_call(query, max(REPEATS // 10, 10))
+            print(f"{size:>10} {p50:>10.4f} {p95:>10.4f}")
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark new-question sampling")
+    parser.add_argument("--db", action="store_true", help="also time ORDER BY random() in Postgres")
+    args = parser.parse_args()
+
+    bench_memory()
+    if args.db:
+        bench_order_by_random()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Export practice data as CSV or Parquet, in constant memory.
+Usage: python scripts/export_data.py TABLE [--format csv|parquet] [--output FILE]
+                                     [--user-id ID] [--topic-id ID] [--since 2025-01-01] [--until 2025-02-01]
+                                     [--chunk-size 5000]
+
+TABLE is sessions, session_items, user_question_state or review_log.
+Streams the rows through a server-side cursor and writes them chunk by chunk
+(app/services/export.py, the same encoding as GET /api/export/{table}) to
+--output or stdout; progress and throughput go to stderr. --since/--until
+filter on the table's time column (session start for sessions and their
+items, last review for user_question_state, review time for review_log).
+Parquet needs pyarrow: pip install -e ".[export]"
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.database import engine
+from app.services.export import EXPORT_FORMATS, EXPORT_TABLES, ExportFilters, encoder_for, export_query
+
+def parse_time(value: str) -> datetime:
+    """ISO date or date-time; naive means UTC"""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export practice data as CSV or Parquet")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--output", type=Path, help="file to write (default: stdout)")
+    parser.add_argument("--user-id")
+    parser.add_argument("--topic-id")
+    parser.add_argument("--since", type=parse_time, help="from this date/time (inclusive)")
+    parser.add_argument("--until", type=parse_time, help="up to this date/time (exclusive)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per fetch")
+    args = parser.parse_args()
+
+    table = EXPORT_TABLES[args.table]
+    try:
+        encoder = encoder_for(table, args.format)
+    except ImportError as exc:
+        sys.exit(str(exc))
+    query, params = export_query(table, ExportFilters(args.user_id, args.topic_id, args.since, args.until))
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    rows = 0
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=args.chunk_size).execute(query, params)
+            out.write(encoder.begin())
+            for chunk in result.partitions(args.chunk_size):
+                out.write(encoder.encode(chunk))
+                rows += len(chunk)
+                print(f"  {rows} rows", file=sys.stderr)
+            out.write(encoder.finish())
+    finally:
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed > 0 else 0
+    target = args.output or "stdout"
+    print(f"✅ Exported {rows} {args.table} rows to {target} in {elapsed:.1f}s ({rate:,.0f} rows/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic data for scale testing.
+Usage: python scripts/generate_data.py [--users 10000] [--topics 60] [--questions 20000]
+                                       [--states 2000000] [--history-days 365] [--churn 0.5]
+                                       [--session-size 15] [--no-sessions] [--prefix SYN_]
+                                       [--seed 42] [--reset] [--user-ids-out FILE]
+
+Bulk-loads (COPY) topics, questions for every grade/class, users, their
+practice history (sessions, items, review_log) and FSRS states into the
+database from DATABASE_URL, so query plans and indexes can be checked at
+production-like volumes.
+
+Practice is simulated per student: a calendar of practice days (streaks
+and breaks), one topic per sitting, and sessions of --session-size items
+filled like the API does (due cards first, then new ones), started in the
+afternoon/evening in Jakarta. A card's interval grows while it is answered
+right and resets after a lapse. `user_question_state` is derived from each
+card's last review, so due dates follow the spacing: active students
+have most cards due in the future, students who stopped (--churn) have
+overdue cards. Daily activity, streaks and user_topic_stats are then filled
+from the loaded rows.
+
+Runs are reproducible for a given --seed. Topic and question IDs start with
+--prefix; --reset first deletes data from an earlier run with that prefix
+(and the users that practiced it). Refuses to run against Supabase.
+"""
+import argparse
+import io
+import json
+import random
+import sys
+import time
+import heapq
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fsrs import Rating
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app.models.database import DATABASE_URL, engine
+from app.services.session_store import session_id_at
+from app.services.topic_stats import REFRESH_TOPIC_STATS_SQL, STREAK_TIMEZONE
+from app.services.user_id_service import user_id_allocator, user_id_for
+
+CLASSES = [("SMP", 7), ("SMP", 8), ("SMP", 9), ("SMA", 10), ("SMA", 11), ("SMA", 12)]
+USERS_PER_BATCH = 2000
+COPY_BATCH_ROWS = 200_000
+# Practice starts 14:00-21:00 WIB (07:00-14:00 UTC)
+SESSION_START_UTC_HOURS = (7, 14)
+SECONDS_PER_ITEM = (10, 90)
+LEARNING_STEP = timedelta(minutes=10)
+
+USER_COLUMNS = ["id", "grade_level", "class_level", "created_at"]
+SESSION_COLUMNS = ["id", "user_id", "topic_id", "status", "started_at", "completed_at"]
+ITEM_COLUMNS = ["id", "session_id", "question_id", "sequence", "user_answer", "is_correct", "answered_at"]
+STATE_COLUMNS = [
+    "user_id", "question_id", "state", "stability", "difficulty", "reps", "lapses",
+    "last_result_correct", "last_reviewed_at", "next_due_at", "updated_at", "topic_id", "class_level",
+]
+REVIEW_COLUMNS = [
+    "user_id", "question_id", "session_id", "class_level", "rating", "state_before", "elapsed_days", "reviewed_at",
+]
+
+def reset_sql(prefix):
+    pattern = prefix.replace("_", "\\_") + "%"
+    return [
+        f"""CREATE TEMP TABLE generated_users ON COMMIT DROP AS
+            SELECT DISTINCT user_id FROM user_question_state WHERE question_id LIKE '{pattern}'
+            UNION SELECT user_id FROM sessions WHERE topic_id LIKE '{pattern}'""",
+        "DELETE FROM session_items WHERE session_id IN "
+        "(SELECT id FROM sessions WHERE user_id IN (SELECT user_id FROM generated_users))",
+        f"DELETE FROM session_items WHERE question_id LIKE '{pattern}'",
+        "DELETE FROM review_log WHERE user_id IN (SELECT user_id FROM generated_users)",
+        f"DELETE FROM review_log WHERE question_id LIKE '{pattern}'",
+        "DELETE FROM sessions WHERE user_id IN (SELECT user_id FROM generated_users)",
+        "DELETE FROM user_question_state WHERE user_id IN (SELECT user_id FROM generated_users)",
+        "DELETE FROM user_topic_stats WHERE user_id IN (SELECT user_id FROM generated_users)",
+        "DELETE FROM user_daily_activity WHERE user_id IN (SELECT user_id FROM generated_users)",
+        "DELETE FROM user_streaks WHERE user_id IN (SELECT user_id FROM generated_users)",
+        "DELETE FROM users WHERE id IN (SELECT user_id FROM generated_users)",
+        f"DELETE FROM questions WHERE id LIKE '{pattern}'",
+        f"DELETE FROM topics WHERE id LIKE '{pattern}'",
+    ]
+
+CREATE_SESSION_PARTITIONS_SQL = text("""
+SELECT create_session_partitions(month::date)
+FROM generate_series(date_trunc('month', CAST(:since AS timestamp)), CAST(:now AS timestamp), interval '1 month') AS month
+""")
+
+BUMP_CATALOG_VERSION_SQL = text("UPDATE catalog_version SET version = version + 1, updated_at = NOW()")
+
+DAILY_ACTIVITY_SQL = text("""
+INSERT INTO user_daily_activity (user_id, activity_date, sessions_started)
+SELECT user_id, (started_at AT TIME ZONE 'UTC' AT TIME ZONE :tz)::date, count(*)
+FROM sessions
+WHERE user_id = ANY(CAST(:user_ids AS text[]))
+GROUP BY 1, 2
+ON CONFLICT (user_id, activity_date) DO UPDATE SET sessions_started = EXCLUDED.sessions_started
+""")
+
+# Gaps and islands, as in migration 007
+STREAKS_SQL = text("""
+WITH days AS (
+  SELECT user_id,
+         activity_date,
+         activity_date - CAST(row_number() OVER (PARTITION BY user_id ORDER BY activity_date) AS INTEGER) AS island
+  FROM user_daily_activity
+  WHERE user_id = ANY(CAST(:user_ids AS text[]))
+),
+islands AS (
+  SELECT user_id, island, count(*) AS length, max(activity_date) AS last_day
+  FROM days
+  GROUP BY user_id, island
+)
+INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_active_date)
+SELECT user_id, (array_agg(length ORDER BY last_day DESC))[1], max(length), max(last_day)
+FROM islands
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET
+    current_streak = EXCLUDED.current_streak,
+    longest_streak = EXCLUDED.longest_streak,
+    last_active_date = EXCLUDED.last_active_date
+""")
+
+DUE_DISTRIBUTION_SQL = text("""
+SELECT count(*) FILTER (WHERE s.next_due_at <= :now) AS overdue,
+       count(*) FILTER (WHERE s.next_due_at > :now AND s.next_due_at <= :now + interval '1 day') AS due_1d,
+       count(*) FILTER (WHERE s.next_due_at > :now + interval '1 day' AND s.next_due_at <= :now + interval '7 days') AS due_7d,
+       count(*) FILTER (WHERE s.next_due_at > :now + interval '7 days' AND s.next_due_at <= :now + interval '30 days') AS due_30d,
+       count(*) FILTER (WHERE s.next_due_at > :now + interval '30 days') AS later
+FROM user_question_state s
+WHERE s.question_id LIKE :pattern
+""")
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    text_value = str(value)
+    return text_value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY rows (an iterable of tuples) into `table` in batches; returns the count"""
+    total = 0
+    buffer = io.StringIO()
+    pending = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+        pending += 1
+        total += 1
+        if pending >= COPY_BATCH_ROWS:
+            flush()
+            pending = 0
+    if pending:
+        flush()
+    return total
+
+def _uuid(rng) -> str:
+    # Reproducible for a given --seed, unlike uuid4()
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def generate_topics(count, prefix):
+    topics = []
+    for i in range(count):
+        grade, class_level = CLASSES[i % len(CLASSES)]
+        topics.append((f"{prefix}T{i:04d}", f"Topik {i} (kelas {class_level})", f"T{i:04d}", grade, json.dumps([class_level])))
+    return topics
+
+def generate_questions(count, topics, prefix, rng):
+    # Uneven topic sizes, like the real catalog
+    weights = [rng.uniform(0.3, 3.0) for _ in topics]
+    for i in range(count):
+        topic = rng.choices(topics, weights)[0]
+        topic_id, grade, class_level = topic[0], topic[3], json.loads(topic[4])[0]
+        options = json.dumps([f"{letter}) {rng.randint(1, 99)}" for letter in "ABCD"])
+        yield (
+            f"{prefix}Q{i:07d}", topic_id, grade, class_level,
+            f"Soal {i}: berapakah nilai x?", None, "mcq", options,
+            # Source identity is unique (migration 013): the run's prefix is the package
+            rng.choice("ABCD"), "Pembahasan singkat.", rng.choice([2022, 2023, 2024]), f"{prefix}SYNTHETIC", i,
+        )
+
+def practice_calendar(last_day, rng):
+    """
+    Days (offsets from signup) the student practices: runs of consecutive
+    days (streaks) separated by breaks, a two-state Markov chain per student.
+    """
+    keep_going = rng.uniform(0.5, 0.85)
+    come_back = rng.uniform(0.05, 0.35)
+    days, practiced = [], True
+    for day in range(last_day + 1):
+        if practiced or rng.random() < come_back:
+            days.append(day)
+            practiced = rng.random() < keep_going
+    return days
+
+def simulate_topic(days, question_ids, session_size, rng):
+    """
+    Sessions of one topic on the days it is practiced, filled the way
+    POST /api/sessions does: cards due by then first, then new ones.
+    Spacing grows on right answers and resets on lapses.
+    Returns [(day, [(question_id, correct), ...])] and each card's last interval (days).
+    """
+    new_cards = list(question_ids)
+    rng.shuffle(new_cards)
+    due = []  # heap of (due day, tie-break, question_id)
+    cards = {}  # question_id -> [interval, chance of a right answer]
+    sessions = []
+    for day in days:
+        for _ in range(1 if rng.random() < 0.7 else 2):
+            picked = []
+            while due and due[0][0] <= day and len(picked) < session_size:
+                picked.append(heapq.heappop(due)[2])
+            while new_cards and len(picked) < session_size:
+                question_id = new_cards.pop()
+                cards[question_id] = [1.0, rng.uniform(0.6, 0.9)]
+                picked.append(question_id)
+            if not picked:
+                break
+            answers = []
+            for question_id in picked:
+                interval, p_correct = cards[question_id]
+                correct = rng.random() < p_correct
+                if correct:
+                    cards[question_id] = [interval * rng.uniform(2.0, 3.5), min(0.97, p_correct + 0.03)]
+                else:
+                    cards[question_id] = [rng.uniform(0.5, 1.5), p_correct]
+                heapq.heappush(due, (day + max(1, round(cards[question_id][0])), rng.random(), question_id))
+                answers.append((question_id, correct))
+            sessions.append((day, answers))
+    return sessions, {question_id: card[0] for question_id, card in cards.items()}
+
+def next_fsrs_state(state, correct):
+    """State after an answer rated Good (right) or Again (wrong), as fsrs 0.1.0 moves it"""
+    if state == "new":
+        return "learning"
+    if not correct:
+        return "learning" if state == "review" else state
+    return "review"
+
+def simulate_user(user, cards, now, args, rng):
+    """
+    Sessions, items, review_log rows and FSRS states of one student.
+    `cards` maps question_id -> (topic_id, correct_option): the questions
+    they may meet; fewer are seen if they practice little.
+    """
+    user_id, _grade, class_level, created_at = user
+    today = (now - created_at).days
+    active_days = max(1, today)
+    # Students who stopped practicing leave overdue cards behind
+    last_day = today if rng.random() >= args.churn else rng.randint(0, active_days)
+
+    # A sitting practices one topic: each practice day gets a focus topic
+    # (favourites come up more often)
+    questions_by_topic = defaultdict(list)
+    for question_id, (topic_id, _) in cards.items():
+        questions_by_topic[topic_id].append(question_id)
+    topics = sorted(questions_by_topic)
+    preference = [rng.paretovariate(1.2) for _ in topics]
+    days_by_topic = defaultdict(list)
+    for day in practice_calendar(last_day, rng):
+        days_by_topic[rng.choices(topics, preference)[0]].append(day)
+
+    topic_sessions = []
+    last_interval = {}
+    for topic_id in topics:
+        sessions_of_topic, intervals = simulate_topic(
+            days_by_topic[topic_id], questions_by_topic[topic_id], args.session_size, rng
+        )
+        topic_sessions += [(day, topic_id, answers) for day, answers in sessions_of_topic]
+        last_interval.update(intervals)
+
+    sessions, items, review_rows, history = [], [], [], defaultdict(list)
+    fsrs_states = {}  # question_id -> state before the next review
+    midnight = created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    busy_until = midnight
+    for day, topic_id, answers in sorted(topic_sessions, key=lambda session: session[0]):
+        started_at = midnight + timedelta(days=day, hours=rng.uniform(*SESSION_START_UTC_HOURS))
+        # A second sitting the same day starts after the first one
+        started_at = max(started_at, busy_until + timedelta(minutes=rng.uniform(5, 120)))
+        if started_at > now:
+            started_at = now - timedelta(minutes=rng.uniform(1, 60))
+        session_id = session_id_at(started_at, rng.getrandbits(74))
+        answered_at = started_at
+        for sequence, (question_id, correct) in enumerate(answers, 1):
+            answered_at += timedelta(seconds=rng.uniform(*SECONDS_PER_ITEM))
+            correct_option = cards[question_id][1]
+            answer = correct_option if correct else rng.choice([o for o in "ABCD" if o != correct_option])
+            items.append((_uuid(rng), session_id, question_id, sequence, answer, correct, answered_at))
+            state_before = fsrs_states.get(question_id, "new")
+            elapsed = None
+            if history[question_id]:
+                elapsed = (answered_at - history[question_id][-1][0]).total_seconds() / 86400
+            rating = int(Rating.Good if correct else Rating.Again)
+            review_rows.append((user_id, question_id, session_id, class_level, rating, state_before, elapsed, answered_at))
+            fsrs_states[question_id] = next_fsrs_state(state_before, correct)
+            history[question_id].append((answered_at, correct))
+        busy_until = answered_at + timedelta(seconds=20)
+        sessions.append((session_id, user_id, topic_id, "completed", started_at, busy_until))
+
+    states = []
+    for question_id, reviews in history.items():
+        reps = len(reviews)
+        lapses = sum(1 for _, correct in reviews[1:] if not correct)
+        last_reviewed, last_correct = reviews[-1]
+        if last_correct:
+            state = "review"
+            stability = last_interval[question_id]
+            next_due = last_reviewed + timedelta(days=stability)
+        else:
+            state = "relearning" if reps > 1 else "learning"
+            stability = rng.uniform(0.2, 2.0)
+            next_due = last_reviewed + LEARNING_STEP
+        difficulty = min(10.0, rng.uniform(3.0, 7.0) + 0.6 * lapses)
+        states.append((
+            user_id, question_id, state, round(stability, 4), round(difficulty, 4), reps, lapses,
+            last_correct, last_reviewed, next_due, last_reviewed, cards[question_id][0], class_level,
+        ))
+    return sessions, items, review_rows, states
+
+def allocate_user_ids(conn, count):
+    """IDs from user_id_seq, as real signups get them"""
+    values = [row[0] for row in conn.execute(
+        text("SELECT nextval('user_id_seq') FROM generate_series(1, :count)"), {"count": count}
+    )]
+    key = user_id_allocator.key
+    return [user_id_for(value, key) for value in values]
+
+def check_target():
+    host = make_url(DATABASE_URL).host or ""
+    if "supabase" in host:
+        sys.exit(f"Refusing to generate data on {host}: point DATABASE_URL at a local database")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--topics", type=int, default=60)
+    parser.add_argument("--questions", type=int, default=20_000)
+    parser.add_argument("--states", type=int, default=2_000_000,
+                        help="questions available to practice across all users; light users see fewer, "
+                             "so user_question_state ends up smaller")
+    parser.add_argument("--history-days", type=int, default=365, help="how far back signups go")
+    parser.add_argument("--churn", type=float, default=0.5, help="share of students who stopped practicing")
+    parser.add_argument("--session-size", type=int, default=15)
+    parser.add_argument("--no-sessions", action="store_true",
+                        help="only load FSRS states, not the sessions, items and review_log rows they came from")
+    parser.add_argument("--prefix", default="SYN_", help="prefix for generated topic and question IDs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="delete data from an earlier run with this prefix")
+    parser.add_argument("--user-ids-out", help="write a sample of generated user IDs to this file")
+    parser.add_argument("--user-ids-sample", type=int, default=5000)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    check_target()
+    # Runs with another prefix get other session/item UUIDs for the same seed
+    rng = random.Random(f"{args.prefix}{args.seed}")
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    started = time.perf_counter()
+
+    if args.reset:
+        with engine.begin() as conn:
+            for statement in reset_sql(args.prefix):
+                conn.execute(text(statement))
+        print(f"Removed earlier {args.prefix}* data")
+    else:
+        with engine.connect() as conn:
+            earlier = conn.execute(text("SELECT count(*) FROM topics WHERE id LIKE :pattern"), {
+                "pattern": args.prefix.replace("_", "\\_") + "%",
+            }).scalar()
+        if earlier:
+            sys.exit(f"{args.prefix}* data from an earlier run exists: use --reset or another --prefix")
+
+    topics = generate_topics(args.topics, args.prefix)
+    questions = list(generate_questions(args.questions, topics, args.prefix, rng))
+    questions_by_class = defaultdict(list)
+    for question in questions:
+        questions_by_class[(question[2], question[3])].append((question[0], question[1], question[8]))
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        copy_rows(cursor, "topics", ["id", "name", "short_code", "grade_level", "class_levels"], topics)
+        copy_rows(cursor, "questions", [
+            "id", "topic_id", "grade_level", "class_level", "prompt_text", "prompt_image_url", "type", "options",
+            "correct_option", "explanation_text", "source_year", "source_package", "source_number",
+        ], questions)
+        raw.commit()
+        print(f"Loaded {len(topics)} topics, {len(questions)} questions")
+
+        with engine.begin() as conn:
+            user_ids = allocate_user_ids(conn, args.users)
+            # Monthly session partitions for the whole history (migration 010)
+            conn.execute(CREATE_SESSION_PARTITIONS_SQL, {"since": now - timedelta(days=args.history_days), "now": now})
+        classes = [key for key in CLASSES if questions_by_class[key]]
+        # Practice volume has a long tail: a few students do most of the reviews
+        weights = [rng.paretovariate(1.5) for _ in user_ids]
+        scale = args.states / sum(weights)
+
+        totals = defaultdict(int)
+        for batch_start in range(0, len(user_ids), USERS_PER_BATCH):
+            users, sessions, items, reviews, states = [], [], [], [], []
+            for user_id, weight in zip(user_ids[batch_start:batch_start + USERS_PER_BATCH],
+                                       weights[batch_start:batch_start + USERS_PER_BATCH]):
+                grade, class_level = rng.choice(classes)
+                created_at = now - timedelta(days=rng.uniform(0, args.history_days))
+                user = (user_id, grade, class_level, created_at)
+                users.append(user)
+                pool = questions_by_class[(grade, class_level)]
+                picked = rng.sample(pool, min(len(pool), max(1, int(weight * scale))))
+                cards = {question_id: (topic_id, correct) for question_id, topic_id, correct in picked}
+                user_sessions, user_items, user_reviews, user_states = simulate_user(user, cards, now, args, rng)
+                sessions += user_sessions
+                items += user_items
+                reviews += user_reviews
+                states += user_states
+
+            totals["users"] += copy_rows(cursor, "users", USER_COLUMNS, users)
+            if not args.no_sessions:
+                totals["sessions"] += copy_rows(cursor, "sessions", SESSION_COLUMNS, sessions)
+                totals["session_items"] += copy_rows(cursor, "session_items", ITEM_COLUMNS, items)
+                totals["reviews"] += copy_rows(cursor, "review_log", REVIEW_COLUMNS, reviews)
+            totals["states"] += copy_rows(cursor, "user_question_state", STATE_COLUMNS, states)
+            raw.commit()
+            elapsed = time.perf_counter() - started
+            print(f"  {totals['users']}/{len(user_ids)} users, {totals['sessions']} sessions, "
+                  f"{totals['session_items']} items, {totals['reviews']} reviews, {totals['states']} states "
+                  f"({elapsed:.0f}s)")
+        cursor.execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+
+    # Aggregates the API maintains incrementally, computed from the loaded rows
+    for batch_start in range(0, len(user_ids), USERS_PER_BATCH):
+        batch = user_ids[batch_start:batch_start + USERS_PER_BATCH]
+        with engine.begin() as conn:
+            conn.execute(REFRESH_TOPIC_STATS_SQL, {"user_ids": batch, "now": now})
+            if not args.no_sessions:
+                conn.execute(DAILY_ACTIVITY_SQL, {"user_ids": batch, "tz": STREAK_TIMEZONE})
+                conn.execute(STREAKS_SQL, {"user_ids": batch})
+    with engine.begin() as conn:
+        conn.execute(BUMP_CATALOG_VERSION_SQL)
+        due = conn.execute(DUE_DISTRIBUTION_SQL, {
+            "now": now, "pattern": args.prefix.replace("_", "\\_") + "%",
+        }).one()
+    print("Filled user_topic_stats" + ("" if args.no_sessions else ", user_daily_activity and user_streaks"))
+
+    total_due = sum(due) or 1
+    print("Due dates: " + ", ".join(
+        f"{label} {100 * count / total_due:.0f}%"
+        for label, count in zip(["overdue", "<1d", "1-7d", "7-30d", ">30d"], due)
+    ))
+
+    if args.user_ids_out:
+        sample = rng.sample(user_ids, min(args.user_ids_sample, len(user_ids)))
+        Path(args.user_ids_out).write_text("\n".join(sample) + "\n")
+        print(f"Wrote {len(sample)} user IDs to {args.user_ids_out}")
+    print(f"Done in {time.perf_counter() - started:.0f}s")
+    return user_ids
+
+if __name__ == "__main__":
+    main()
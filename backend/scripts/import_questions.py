@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Bulk-import archive questions into the question bank.
+Usage: python scripts/import_questions.py FILE [--format csv|jsonl] [--chunk-size 5000]
+                                          [--dry-run] [--strict] [--show-errors 20]
+
+FILE holds one question per JSONL line or CSV row, with the columns of the
+questions table: topic_id, grade_level, class_level, prompt_text, options
+(a list, or a JSON array in a CSV cell), correct_option, source_year,
+source_package, source_number, and optionally id, prompt_image_url and
+explanation_text. The format follows the file extension unless --format
+is given.
+
+Records are validated and deduplicated on source identity
+(app/services/question_import.py), COPYed into a staging table and merged
+into questions in one statement; known sources are updated in place. The
+catalog version is bumped in the same transaction, so running API
+instances reload. Invalid and duplicate records are reported and skipped;
+--strict loads nothing if there are any, --dry-run rolls everything back.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.database import engine
+from app.services.question_import import IMPORT_CHUNK_ROWS, QuestionImporter
+
+def read_records(path: Path, file_format: str):
+    """
+    (record number, record) for every record: line numbers for JSONL, row
+    numbers for CSV. A line that is not JSON comes back as the parse error.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            for number, record in enumerate(csv.DictReader(f), start=1):
+                yield number, record
+            return
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                record = f"not JSON ({exc.msg})"
+            yield number, record
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import archive questions")
+    parser.add_argument("file", type=Path)
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_ROWS, help="rows per COPY")
+    parser.add_argument("--dry-run", action="store_true", help="validate and merge, then roll back")
+    parser.add_argument("--strict", action="store_true", help="load nothing if any record is rejected")
+    parser.add_argument("--show-errors", type=int, default=20, help="rejected records to list")
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.file.suffix.lower() == ".csv" else "jsonl")
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            importer = QuestionImporter(conn, chunk_rows=args.chunk_size)
+            for number, record in read_records(args.file, file_format):
+                if isinstance(record, dict):
+                    importer.add(record, number)
+                else:
+                    importer.reject(number, record if isinstance(record, str) else "not a JSON object")
+            staged = time.perf_counter()
+            result = importer.merge()
+            merged = time.perf_counter()
+            rejected = sorted(result.invalid + result.duplicates)
+            if args.dry_run or (args.strict and rejected):
+                transaction.rollback()
+            else:
+                transaction.commit()
+        except BaseException:
+            transaction.rollback()
+            raise
+
+    elapsed = time.perf_counter() - started
+    print(f"Read {result.read} records: {result.staged} staged, {len(result.invalid)} invalid, "
+          f"{len(result.duplicates)} duplicates (validated and copied in {staged - started:.1f}s)")
+    for number, problem in sorted(result.invalid)[:args.show_errors]:
+        print(f"  ❌ record {number}: {problem}")
+    for number, repeated in sorted(result.duplicates)[:args.show_errors]:
+        print(f"  ⚠️  record {number}: repeats {repeated}")
+    for question_id in result.taken_ids[:args.show_errors]:
+        print(f"  ❌ id {question_id} belongs to a question from another source")
+    print(f"Merged: {result.inserted} inserted, {result.updated} updated, {result.unchanged} unchanged, "
+          f"{len(result.taken_ids)} skipped (id taken) in {merged - staged:.1f}s")
+
+    if args.dry_run:
+        print("Dry run: rolled back")
+        return
+    if args.strict and rejected:
+        sys.exit(f"❌ {len(rejected)} records rejected; nothing imported (--strict)")
+    if result.catalog_version is not None:
+        print(f"Catalog version bumped to {result.catalog_version}")
+    rate = result.staged / elapsed if elapsed > 0 else 0
+    print(f"✅ Done: {result.staged} rows in {elapsed:.1f}s ({rate:,.0f} rows/s), "
+          f"{result.inserted + result.updated} questions added or changed")
+
+if __name__ == "__main__":
+    main()
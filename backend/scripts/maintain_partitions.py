@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Maintain the monthly partitions of sessions and session_items (migration 010).
+Usage: python scripts/maintain_partitions.py [--ahead 3] [--keep-months 12]
+                                             [--archive-dir archive] [--dry-run]
+       python scripts/maintain_partitions.py --restore 2025-03 [--archive-dir archive]
+
+Meant to run from cron once a month (at least). It:
+1. creates the partitions for this month and the next --ahead months (rows
+   that already landed in the default partitions move over);
+2. with --keep-months N, archives every month before the last N: both of its
+   partitions are written to gzipped CSV files in --archive-dir
+   (sessions_p2025_03.csv.gz, session_items_p2025_03.csv.gz), row counts are
+   checked, then the partitions are detached and dropped;
+3. ANALYZEs the parent tables (autovacuum never analyzes partitioned tables)
+   and reports rows sitting in the default partitions.
+
+--restore YYYY-MM re-creates a month's partitions and loads its archive back.
+"""
+import argparse
+import csv
+import gzip
+import os
+import re
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from app.models.database import engine
+
+PARTITION_NAME = re.compile(r"^sessions_p(\d{4})_(\d{2})$")
+
+LIST_PARTITIONS_SQL = text("""
+SELECT c.relname
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'sessions'::regclass
+""")
+
+CREATE_PARTITIONS_SQL = text("SELECT create_session_partitions(CAST(:month AS date))")
+
+# Items reference sessions: archive and restore sessions first, drop items first
+TABLES = ("sessions", "session_items")
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+def parse_month(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {value!r}")
+
+def partition_months(conn):
+    months = []
+    for name in conn.execute(LIST_PARTITIONS_SQL).scalars():
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+def partition(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+def archive_month(month: date, archive_dir: Path):
+    """Write both partitions of `month` to archive_dir, then detach and drop them"""
+    counts = {}
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # Nobody writes to an old month; the lock makes sure of it while copying
+        cursor.execute(f"LOCK TABLE {', '.join(partition(t, month) for t in TABLES)} IN SHARE MODE")
+        for table in TABLES:
+            name = partition(table, month)
+            path = archive_dir / f"{name}.csv.gz"
+            part = path.with_name(path.name + ".part")
+            with gzip.open(part, "wt", encoding="utf-8") as f:
+                cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+                copied = cursor.rowcount
+            with open(part, "rb") as f:
+                os.fsync(f.fileno())
+            cursor.execute(f"SELECT count(*) FROM {name}")
+            counts[name] = cursor.fetchone()[0]
+            if copied != counts[name]:
+                raise RuntimeError(f"{part}: {copied} rows written, {name} has {counts[name]}")
+            part.rename(path)
+        raw.commit()
+
+        # Short transaction: detaching takes an exclusive lock on the parents
+        cursor.execute("SET LOCAL lock_timeout = '5s'")
+        for table in reversed(TABLES):
+            name = partition(table, month)
+            cursor.execute(f"SELECT count(*) FROM {name}")
+            if cursor.fetchone()[0] != counts[name]:
+                raise RuntimeError(f"{name} changed while it was archived; nothing dropped")
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+        raw.commit()
+    finally:
+        raw.close()
+    return counts
+
+def restore_month(month: date, archive_dir: Path):
+    paths = {table: archive_dir / f"{partition(table, month)}.csv.gz" for table in TABLES}
+    missing = [str(path) for path in paths.values() if not path.exists()]
+    if missing:
+        sys.exit(f"Archive not found: {', '.join(missing)}")
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SELECT create_session_partitions(%s)", (month,))
+        if not cursor.fetchone()[0]:
+            sys.exit(f"Partitions for {month:%Y-%m} already exist")
+        for table in TABLES:
+            with gzip.open(paths[table], "rt", encoding="utf-8") as f:
+                # Columns added since the month was archived are left NULL
+                columns = next(csv.reader([f.readline()]))
+                cursor.copy_expert(
+                    f"COPY {partition(table, month)} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", f
+                )
+            print(f"  {partition(table, month)}: {cursor.rowcount} rows restored")
+        raw.commit()
+    finally:
+        raw.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ahead", type=int, default=3, help="months to create partitions for in advance")
+    parser.add_argument("--keep-months", type=int,
+                        help="archive and drop months before the last N (including this one); off by default")
+    parser.add_argument("--archive-dir", type=Path, default=Path("archive"))
+    parser.add_argument("--restore", type=parse_month, metavar="YYYY-MM", help="load an archived month back")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would be done")
+    args = parser.parse_args()
+
+    if args.restore:
+        print(f"Restoring {args.restore:%Y-%m} from {args.archive_dir}...")
+        restore_month(args.restore, args.archive_dir)
+        print("✅ Restored")
+        return
+
+    start = time.perf_counter()
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    with engine.connect() as conn:
+        existing = set(partition_months(conn))
+    wanted = [add_months(this_month, n) for n in range(args.ahead + 1)]
+    for month in wanted:
+        if month in existing:
+            continue
+        print(f"Creating partitions for {month:%Y-%m}")
+        if not args.dry_run:
+            with engine.begin() as conn:
+                conn.execute(CREATE_PARTITIONS_SQL, {"month": month})
+
+    if args.keep_months is not None:
+        if args.keep_months < 1:
+            sys.exit("--keep-months must be at least 1 (the current month)")
+        cutoff = add_months(this_month, 1 - args.keep_months)
+        old = [month for month in sorted(existing) if month < cutoff]
+        if old and not args.dry_run:
+            args.archive_dir.mkdir(parents=True, exist_ok=True)
+        for month in old:
+            print(f"Archiving {month:%Y-%m} to {args.archive_dir}")
+            if not args.dry_run:
+                counts = archive_month(month, args.archive_dir)
+                print("  " + ", ".join(f"{name}: {count} rows" for name, count in counts.items()))
+
+    if not args.dry_run:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE sessions, session_items"))
+    with engine.connect() as conn:
+        in_default = conn.execute(text("SELECT count(*) FROM sessions_default")).scalar()
+    if in_default:
+        # Sessions whose month has no partition (or from before migration 010)
+        print(f"⚠️  {in_default} session(s) in the default partition")
+    print(f"\n✅ Done in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Fit FSRS weights per class level from the review log.
+Usage: python scripts/optimize_fsrs.py [--chunk-size 50000] [--epochs 5] [--batch-cards 512]
+                                       [--min-reviews 1000] [--output fsrs_weights.json]
+
+Streams `review_log` (migration 012) through a server-side cursor into
+compact per-cohort arrays, then fits the 13 FSRS weights of each class level
+with vectorized gradient steps on the CPU (app/services/fsrs_optimizer.py)
+and reports the log loss of the default and the fitted weights, the run time
+and the peak memory. Cohorts with fewer observed reviews than --min-reviews
+keep the defaults. Writes nothing to the database.
+Needs numpy: pip install -e ".[batch]"
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.database import engine
+from app.services.fsrs_optimizer import DEFAULT_WEIGHTS, fit_cohort, read_review_log
+
+def peak_memory_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit FSRS weights per class level from review_log")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="review_log rows per read")
+    parser.add_argument("--epochs", type=int, default=5, help="passes over each cohort's cards")
+    parser.add_argument("--batch-cards", type=int, default=512, help="cards per gradient step")
+    parser.add_argument("--learning-rate", type=float, default=0.05, help="Adam step size")
+    parser.add_argument("--min-reviews", type=int, default=1000,
+                        help="observed reviews a cohort needs to be fitted")
+    parser.add_argument("--output", type=Path, help="write the weights per class level as JSON")
+    args = parser.parse_args()
+
+    print("Fitting FSRS weights from review_log")
+    start = time.perf_counter()
+
+    def progress(rows):
+        print(f"  {rows} reviews read")
+
+    with engine.connect() as connection:
+        histories = read_review_log(connection, args.chunk_size, on_chunk=progress)
+    read_seconds = time.perf_counter() - start
+    stored = sum(history.nbytes for history in histories.values())
+    print(f"  read in {read_seconds:.1f}s, {len(histories)} cohort(s) in {stored / 1024 / 1024:.1f} MB of arrays")
+
+    cohorts = {}
+    for class_level, history in histories.items():
+        observations = history.observations
+        if observations < args.min_reviews:
+            print(f"\nClass {class_level}: {history.cards} cards, {observations} observed reviews, "
+                  f"below --min-reviews, keeping the defaults")
+            cohorts[str(class_level)] = {"w": list(DEFAULT_WEIGHTS), "fitted": False, "cards": history.cards,
+                                         "reviews": history.reviews, "observations": observations}
+            continue
+
+        began = time.perf_counter()
+        fit = fit_cohort(history, epochs=args.epochs, batch_cards=args.batch_cards,
+                         learning_rate=args.learning_rate)
+        seconds = time.perf_counter() - began
+        print(f"\nClass {class_level}: {fit.cards} cards, {fit.reviews} reviews, {fit.observations} observed")
+        print(f"  log loss {fit.log_loss_default:.4f} (defaults) -> {fit.log_loss_fitted:.4f} (fitted) "
+              f"in {seconds:.1f}s")
+        print(f"  w = {[round(w, 4) for w in fit.weights]}")
+        cohorts[str(class_level)] = {
+            "w": list(fit.weights),
+            "fitted": True,
+            "cards": fit.cards,
+            "reviews": fit.reviews,
+            "observations": fit.observations,
+            "log_loss_default": fit.log_loss_default,
+            "log_loss_fitted": fit.log_loss_fitted,
+        }
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "fsrs_version": "0.1.0",
+            "fitted_at": datetime.now(timezone.utc).isoformat(),
+            "class_levels": cohorts,
+        }, indent=2) + "\n")
+        print(f"\nWrote {args.output}")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Done in {elapsed:.1f}s, peak memory {peak_memory_mb():.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Re-schedule review cards in bulk after changing FSRS parameters.
+Usage: python scripts/reschedule_fsrs.py [--retention 0.85] [--max-interval 365]
+                                         [--chunk-size 10000] [--dry-run]
+
+Streams `user_question_state` rows in the review state through a server-side
+cursor, replays each card's last review with the vectorized scheduler
+(app/services/fsrs_reschedule.py) and writes each changed chunk back with one
+UPDATE (and refreshes the affected users' `user_topic_stats`). The interval
+follows the card's last rating, so a run with unchanged parameters moves
+nothing. Cards last reviewed before migration 014 are skipped; learning
+cards keep their minute steps. A card answered while the script runs keeps
+the due date its review gave it.
+
+After each chunk the affected users' data version and session queue tokens
+are replaced in the shared cache, so cached dashboards (ETags) and
+precomputed session queues stop being served. With CACHE_URL=memory:// the
+API's caches live in its own process: restart the API after a run.
+
+Stability and difficulty stay as they are: the weights are not changed here.
+Needs numpy: pip install -e ".[batch]"
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.database import engine
+from app.services.cache import MemoryCache, cache
+from app.services.fsrs_batch import BatchParameters
+from app.services.fsrs_reschedule import SELECT_REVIEW_CARDS_SQL, reschedule_chunk, write_chunk
+from app.services.response_cache import data_versions
+from app.services.session_queue import session_queues
+
+async def invalidate_caches(user_ids):
+    """Stop serving the users' cached dashboards and session queues"""
+    for user_id in user_ids:
+        await data_versions.bump(user_id)
+        await session_queues.invalidate(user_id)
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-schedule FSRS review cards in bulk")
+    parser.add_argument("--retention", type=float, default=0.9, help="requested retention (default 0.9)")
+    parser.add_argument("--max-interval", type=int, default=36500, help="maximum interval in days")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="rows per read/write batch")
+    parser.add_argument("--dry-run", action="store_true", help="compute only, do not write")
+    args = parser.parse_args()
+
+    params = BatchParameters(request_retention=args.retention, maximum_interval=args.max_interval)
+    print(f"Re-scheduling review cards (retention={params.request_retention}, "
+          f"max interval={params.maximum_interval}d){' [dry run]' if args.dry_run else ''}")
+
+    # One loop for the whole run: the Redis client stays bound to it
+    loop = asyncio.new_event_loop()
+    shared_cache = not isinstance(cache, MemoryCache)
+    scanned = changed = skipped = 0
+    start = time.perf_counter()
+    with engine.connect() as reader, engine.connect() as writer:
+        result = reader.execution_options(stream_results=True, yield_per=args.chunk_size).execute(
+            SELECT_REVIEW_CARDS_SQL
+        )
+        for rows in result.partitions(args.chunk_size):
+            chunk = reschedule_chunk(rows, params)
+            scanned += len(rows)
+            changed += len(chunk.user_ids)
+            skipped += chunk.skipped
+            if chunk.user_ids and not args.dry_run:
+                affected = write_chunk(writer, chunk, datetime.now(timezone.utc))
+                writer.commit()
+                if shared_cache:
+                    loop.run_until_complete(invalidate_caches(affected))
+            print(f"  {scanned} scanned, {changed} re-scheduled, {skipped} skipped")
+    loop.run_until_complete(cache.close())
+    loop.close()
+
+    elapsed = time.perf_counter() - start
+    rate = scanned / elapsed if elapsed > 0 else 0
+    print(f"\n✅ Done: {scanned} cards scanned, {changed} re-scheduled in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    if skipped:
+        print(f"⚠️  {skipped} cards were last reviewed before migration 014 and keep their due dates")
+    if changed and not args.dry_run and not shared_cache:
+        print("⚠️  CACHE_URL is memory://: restart the API so it drops cached dashboards and session queues")
+
+if __name__ == "__main__":
+    main()
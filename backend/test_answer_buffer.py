@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Check that the answer write-behind buffer (app/services/answer_buffer.py)
+loses no answers when a flush is interrupted: another connection locks the
+fixture session's items so the buffer's UPDATE blocks, then
+1. the flush is cancelled mid-write: its answers must go back to pending
+   and be written by the shutdown flush,
+2. the buffer is stopped while the background flusher is mid-write: stop()
+   must wait for that write and leave nothing behind.
+The buffer writes through its own connections, so the fixture rows are
+committed and deleted at the end.
+
+Usage: python test_answer_buffer.py   (needs DATABASE_URL in .env)
+"""
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from app.models.database import AsyncSessionLocal
+from app.services.answer_buffer import AnswerBuffer
+from app.services.session_store import session_id_at
+
+USER_ID = "00000004"
+TOPIC_ID = "TEST_ANSWER_BUFFER"
+QUESTIONS = 6
+# How long the lock is held after the interruption
+LOCK_HOLD_SECONDS = 0.5
+
+def question_id(i):
+    return f"{TOPIC_ID}_{i}"
+
+async def seed(session_id, now):
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("INSERT INTO users (id, grade_level, class_level) VALUES (:id, 'SMP', 8)"),
+                         {"id": USER_ID})
+        await db.execute(text("""
+            INSERT INTO topics (id, name, short_code, grade_level, class_levels)
+            VALUES (:id, 'Test', 'TEST', 'SMP', '[8]')
+        """), {"id": TOPIC_ID})
+        await db.execute(text("""
+            INSERT INTO sessions (id, user_id, topic_id, status, started_at)
+            VALUES (:id, :user_id, :topic_id, 'in_progress', :now)
+        """), {"id": session_id, "user_id": USER_ID, "topic_id": TOPIC_ID, "now": now.replace(tzinfo=None)})
+        for i in range(QUESTIONS):
+            await db.execute(text("""
+                INSERT INTO questions (id, topic_id, grade_level, class_level, prompt_text, type, options, correct_option)
+                VALUES (:id, :topic_id, 'SMP', 8, '?', 'mcq', '["A) 1", "B) 2"]', 'A')
+            """), {"id": question_id(i), "topic_id": TOPIC_ID})
+            await db.execute(text("""
+                INSERT INTO session_items (id, session_id, question_id, sequence)
+                VALUES (gen_random_uuid(), :session_id, :question_id, :sequence)
+            """), {"session_id": session_id, "question_id": question_id(i), "sequence": i + 1})
+        await db.commit()
+
+async def cleanup(session_id):
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("DELETE FROM session_items WHERE session_id = :id"), {"id": session_id})
+        await db.execute(text("DELETE FROM sessions WHERE id = :id"), {"id": session_id})
+        await db.execute(text("DELETE FROM questions WHERE topic_id = :id"), {"id": TOPIC_ID})
+        await db.execute(text("DELETE FROM topics WHERE id = :id"), {"id": TOPIC_ID})
+        await db.execute(text("DELETE FROM users WHERE id = :id"), {"id": USER_ID})
+        await db.commit()
+
+async def answered(session_id):
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(text("""
+            SELECT question_id FROM session_items WHERE session_id = :id AND user_answer IS NOT NULL
+        """), {"id": session_id})
+        return {row.question_id for row in rows}
+
+async def lock_items(session_id):
+    """An open transaction holding the items' row locks; roll it back to release them"""
+    db = AsyncSessionLocal()
+    await db.execute(text("SELECT 1 FROM session_items WHERE session_id = :id FOR UPDATE"), {"id": session_id})
+    return db
+
+async def release_later(db):
+    await asyncio.sleep(LOCK_HOLD_SECONDS)
+    await db.rollback()
+    await db.close()
+
+async def wait_for_write(buffer):
+    """Until a flush holds its lock with the answers taken out of pending"""
+    for _ in range(200):
+        if buffer._flush_lock.locked() and buffer.pending_count == 0:
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+async def run_test():
+    print("Testing the answer buffer on interrupted flushes...")
+    now = datetime.now(timezone.utc)
+    session_id = session_id_at(now)
+    failures = 0
+
+    def check(ok, message):
+        nonlocal failures
+        print(f"{'✅' if ok else '❌'} {message}")
+        failures += not ok
+
+    await seed(session_id, now)
+    try:
+        # 1. Cancelled in the middle of a flush
+        buffer = AnswerBuffer(enabled=True)
+        for i in range(3):
+            buffer.add(session_id, question_id(i), "A", True, None, now)
+        lock = await lock_items(session_id)
+        flush = asyncio.create_task(buffer.flush())
+        check(await wait_for_write(buffer), "flush blocked on the locked rows")
+        flush.cancel()
+        try:
+            await flush
+        except asyncio.CancelledError:
+            pass
+        check(buffer.pending_count == 3, f"cancelled flush put its answers back ({buffer.pending_count} pending)")
+        await release_later(lock)
+        await buffer.stop()
+        written = await answered(session_id)
+        check(written == {question_id(i) for i in range(3)} and buffer.pending_count == 0,
+              f"shutdown flush wrote them: {sorted(written)}")
+
+        # 2. Stopped while the background flusher is writing
+        buffer = AnswerBuffer(enabled=True)
+        await buffer.start()
+        lock = await lock_items(session_id)
+        for i in range(3, QUESTIONS):
+            buffer.add(session_id, question_id(i), "B", False, "guessed", now)
+        check(await wait_for_write(buffer), "background flush blocked on the locked rows")
+        release = asyncio.create_task(release_later(lock))
+        await buffer.stop()
+        await release
+        written = await answered(session_id)
+        check(written == {question_id(i) for i in range(QUESTIONS)} and buffer.pending_count == 0,
+              f"stop() waited for the write: {len(written)}/{QUESTIONS} answered, {buffer.pending_count} pending")
+    finally:
+        await cleanup(session_id)
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Contract test for the shared cache backends (app/services/cache.py).
+
+Runs the same checks against MemoryCache and against RedisCache talking to
+a small in-process stand-in that speaks the Redis protocol (GET, MGET, SET
+with PX/EX/NX, DEL), so no Redis server is needed, and that RedisCache
+degrades to misses once that server is gone. Also checks that SingleFlight
+runs one build for many concurrent callers.
+
+Usage: python test_cache_backends.py   (RedisCache needs the `cache` extra)
+"""
+import asyncio
+import time
+
+from app.services.cache import MemoryCache, RedisCache, SingleFlight
+
+class FakeRedisServer:
+    """Just enough of RESP2 for RedisCache, with an in-memory keyspace"""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}/0"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    @staticmethod
+    def _bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _execute(self, args):
+        name = args[0].upper()
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name in (b"CLIENT", b"SELECT"):
+            return b"+OK\r\n"
+        if name == b"GET":
+            return self._bulk(self._get(args[1]))
+        if name == b"MGET":
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(self._bulk(self._get(key)) for key in args[1:])
+        if name == b"SET":
+            key, value, options = args[1], args[2], [a.upper() for a in args[3:]]
+            expires_at = None
+            if b"PX" in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b"PX") + 1]) / 1000
+            if b"EX" in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b"EX") + 1])
+            if b"NX" in options and self._get(key) is not None:
+                return b"$-1\r\n"
+            self.data[key] = (value, expires_at)
+            return b"+OK\r\n"
+        if name == b"DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args[1:])
+        return b"-ERR unknown command '%s'\r\n" % name
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                count = int(line[1:])
+                args = []
+                for _ in range(count):
+                    size = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                self.commands += 1
+                writer.write(self._execute(args))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+async def check_backend(name, backend):
+    checks = []
+
+    await backend.set("a", b"1")
+    await backend.set("b", b"2", ttl=60)
+    checks.append(("get", await backend.get("a") == b"1"))
+    checks.append(("get_many", await backend.get_many(["a", "missing", "b"]) == [b"1", None, b"2"]))
+    checks.append(("get_many empty", await backend.get_many([]) == []))
+
+    checks.append(("add existing", await backend.add("a", b"x") is False and await backend.get("a") == b"1"))
+    checks.append(("add new", await backend.add("c", b"3", ttl=60) is True and await backend.get("c") == b"3"))
+
+    await backend.set("a", b"overwritten")
+    checks.append(("overwrite", await backend.get("a") == b"overwritten"))
+
+    await backend.delete("a")
+    checks.append(("delete", await backend.get("a") is None))
+
+    await backend.set("short", b"x", ttl=0.05)
+    await asyncio.sleep(0.1)
+    checks.append(("ttl expiry", await backend.get("short") is None))
+    checks.append(("add after expiry", await backend.add("short", b"y") is True))
+
+    binary = bytes(range(256)) + b"\r\n\n"
+    await backend.set("binary", binary)
+    checks.append(("binary values", await backend.get("binary") == binary))
+
+    await backend.close()
+    failed = [check for check, ok in checks if not ok]
+    if failed:
+        print(f"❌ {name}: {', '.join(failed)}")
+    else:
+        print(f"✅ {name}: {len(checks)} checks")
+    return not failed
+
+async def check_redis_unreachable(url):
+    """With the server gone, reads are misses and writes are dropped, without raising"""
+    backend = RedisCache(url, prefix="test:")
+    try:
+        await backend.set("a", b"1", ttl=60)
+        await backend.delete("a")
+        ok = (
+            await backend.get_many(["a", "b"]) == [None, None]
+            and await backend.add("a", b"1") is False
+        )
+    except Exception as exc:
+        ok = False
+        print(f"❌ RedisCache unreachable: raised {exc!r}")
+    else:
+        print(f"{'✅' if ok else '❌'} RedisCache unreachable: reads miss, writes are dropped")
+    await backend.close()
+    return ok
+
+async def check_memory_lru():
+    backend = MemoryCache(max_entries=3)
+    for key in "abc":
+        await backend.set(key, key.encode())
+    await backend.get("a")          # a is now most recently used
+    await backend.set("d", b"d")    # evicts b
+    ok = await backend.get_many(["a", "b", "c", "d"]) == [b"a", None, b"c", b"d"]
+    print("✅ MemoryCache: LRU eviction" if ok else "❌ MemoryCache: LRU eviction")
+    return ok
+
+async def check_single_flight():
+    single_flight = SingleFlight()
+    builds = 0
+
+    async def build():
+        nonlocal builds
+        builds += 1
+        await asyncio.sleep(0.05)
+        return builds
+
+    results = await asyncio.gather(*(single_flight.do("topics:SMP", build) for _ in range(50)))
+    shared = builds == 1 and set(results) == {1}
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    errors = await asyncio.gather(*(single_flight.do("stats", failing) for _ in range(5)), return_exceptions=True)
+    propagated = all(isinstance(error, ValueError) for error in errors)
+
+    # After the flight lands, the next call builds again
+    again = await single_flight.do("topics:SMP", build) == 2
+
+    ok = shared and propagated and again
+    if ok:
+        print("✅ SingleFlight: 50 concurrent callers, 1 build; errors reach every caller")
+    else:
+        print(f"❌ SingleFlight: builds={builds}, errors propagated={propagated}, rebuilds={again}")
+    return ok
+
+async def run_test():
+    print("Testing cache backends...")
+    failures = 0
+
+    failures += not await check_backend("MemoryCache", MemoryCache())
+    failures += not await check_memory_lru()
+
+    server = FakeRedisServer()
+    url = await server.start()
+    try:
+        failures += not await check_backend("RedisCache (protocol stand-in)", RedisCache(url, prefix="test:"))
+        prefixed = all(key.startswith(b"test:") for key in server.data)
+        if not prefixed:
+            failures += 1
+            print("❌ RedisCache: keys are not prefixed")
+    finally:
+        await server.stop()
+    failures += not await check_redis_unreachable(url)
+
+    failures += not await check_single_flight()
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Check the dashboard's due counts in user_topic_stats (migration 015).
+Gives a fixture user cards due at chosen times, refreshes the aggregates and
+compares, at several moments, the dashboard's due counts and next due times
+with the cards counted one by one in Python (due once next_due_at <= now),
+and with the due cards session selection serves at the same moment.
+Everything runs in one transaction that is rolled back at the end.
+
+Usage: python test_due_counts.py   (needs DATABASE_URL in .env)
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.models.database import AsyncSessionLocal
+from app.models.models import Question, Topic, User, UserQuestionState
+from app.services.fsrs_service import as_utc
+from app.services.question_selection import PRIORITY_DUE, select_session_questions
+from app.services.topic_stats import get_topic_stats, get_user_totals, refresh_topic_stats
+
+USER_ID = "00000002"
+TOPIC_ID = "TEST_DUE_COUNTS"
+CLASS_LEVEL = 8
+T0 = datetime(2025, 3, 1, 10, 0, tzinfo=timezone.utc)
+
+# Two cards in the same hour, one exactly on an hour, one far out
+DUE = [
+    T0 + timedelta(minutes=20),
+    T0 + timedelta(minutes=50),
+    T0 + timedelta(hours=2),
+    T0 + timedelta(days=30, minutes=1),
+]
+MOMENTS = [
+    T0 - timedelta(minutes=1),
+    T0 + timedelta(minutes=30),     # the 10:20 card is due, the 10:50 one is not
+    T0 + timedelta(minutes=50),     # due at its exact due time
+    T0 + timedelta(hours=1),
+    T0 + timedelta(hours=2),
+    T0 + timedelta(days=31),
+]
+
+def expected(now):
+    due_now = sum(1 for due in DUE if due <= now)
+    upcoming = sorted(due for due in DUE if due > now)
+    return due_now, upcoming[0] if upcoming else None
+
+def pool_for_class(class_level):
+    """Stands in for the catalog cache: no unseen questions"""
+    return []
+
+async def run_test():
+    print("Testing dashboard due counts...")
+    failures = 0
+
+    async with AsyncSessionLocal() as db:
+        try:
+            db.add(User(id=USER_ID, grade_level="SMP", class_level=CLASS_LEVEL))
+            db.add(Topic(id=TOPIC_ID, name="Test", short_code="TEST", grade_level="SMP", class_levels=[CLASS_LEVEL]))
+            await db.flush()
+            for i in range(len(DUE)):
+                db.add(Question(
+                    id=f"{TOPIC_ID}_{i}", topic_id=TOPIC_ID, grade_level="SMP",
+                    class_level=CLASS_LEVEL, prompt_text="?", type="mcq",
+                    options=["A) 1", "B) 2"], correct_option="A",
+                ))
+            await db.flush()
+            for i, due in enumerate(DUE):
+                db.add(UserQuestionState(
+                    user_id=USER_ID, question_id=f"{TOPIC_ID}_{i}",
+                    state="review", stability=1, difficulty=5, next_due_at=due,
+                ))
+            await db.flush()
+            await refresh_topic_stats(db, [USER_ID], TOPIC_ID, T0)
+
+            for now in MOMENTS:
+                due_now, next_due = expected(now)
+                stats = (await get_topic_stats(db, USER_ID, CLASS_LEVEL, now))[TOPIC_ID]
+                totals = await get_user_totals(db, USER_ID, now)
+                got = (stats.questions_due, stats.next_due_at, totals.questions_due, totals.next_due_at)
+                if got == (due_now, next_due, due_now, next_due) and stats.seen_count == len(DUE):
+                    print(f"✅ {now:%Y-%m-%d %H:%M}: {due_now} due, next at {next_due}")
+                else:
+                    failures += 1
+                    print(f"❌ {now:%Y-%m-%d %H:%M}: expected {due_now} due, next at {next_due}; "
+                          f"got topic {stats.questions_due}/{stats.next_due_at}, "
+                          f"totals {totals.questions_due}/{totals.next_due_at}, seen {stats.seen_count}")
+
+                # A session started now serves exactly the cards the dashboard counts
+                selection = await select_session_questions(
+                    db, USER_ID, TOPIC_ID, len(DUE), now, pool_for_class=pool_for_class
+                )
+                served = selection.priorities.count(PRIORITY_DUE)
+                if served == stats.questions_due and as_utc(selection.next_due_at) == stats.next_due_at:
+                    print(f"✅ {now:%Y-%m-%d %H:%M}: session serves {served} due, like the dashboard")
+                else:
+                    failures += 1
+                    print(f"❌ {now:%Y-%m-%d %H:%M}: session serves {served} due "
+                          f"(next {selection.next_due_at}), dashboard counts {stats.questions_due} "
+                          f"(next {stats.next_due_at})")
+        finally:
+            await db.rollback()
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
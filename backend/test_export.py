@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Check the streaming exports (app/services/export.py) on fixture data.
+Seeds a user with sessions, answers, card states and review log rows at
+chosen times, exports them with user/topic/date filters in small chunks,
+and checks that the CSV and the Parquet output (if pyarrow is installed)
+hold exactly the rows the filters select.
+Everything runs in one transaction that is rolled back at the end.
+
+Usage: python test_export.py   (needs DATABASE_URL in .env)
+"""
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.models.database import engine
+from app.services.export import EXPORT_TABLES, ExportFilters, encoder_for, export_query
+from app.services.session_store import session_id_at
+
+USER_ID = "00000003"
+TOPIC_ID = "TEST_EXPORT"
+OTHER_TOPIC_ID = "TEST_EXPORT_B"
+CLASS_LEVEL = 8
+CHUNK = 2
+# Columns that identify an exported row
+KEYS = {
+    "sessions": ["id"],
+    "session_items": ["session_id", "sequence"],
+    "user_question_state": ["user_id", "question_id"],
+    "review_log": ["id"],
+}
+T0 = datetime(2025, 3, 1, 10, 0, tzinfo=timezone.utc)
+
+# (topic, start): one session a day, the last one in another topic
+SESSIONS = [(TOPIC_ID, T0 + timedelta(days=d)) for d in range(4)] + [(OTHER_TOPIC_ID, T0 + timedelta(days=4))]
+QUESTIONS_PER_SESSION = 3
+
+def seed(conn):
+    conn.execute(text("INSERT INTO users (id, grade_level, class_level) VALUES (:id, 'SMP', :c)"),
+                 {"id": USER_ID, "c": CLASS_LEVEL})
+    for topic_id in (TOPIC_ID, OTHER_TOPIC_ID):
+        conn.execute(text("""
+            INSERT INTO topics (id, name, short_code, grade_level, class_levels)
+            VALUES (:id, 'Test', 'TEST', 'SMP', CAST(:levels AS jsonb))
+        """), {"id": topic_id, "levels": f"[{CLASS_LEVEL}]"})
+        for q in range(QUESTIONS_PER_SESSION):
+            conn.execute(text("""
+                INSERT INTO questions (id, topic_id, grade_level, class_level, prompt_text, type, options, correct_option)
+                VALUES (:id, :topic_id, 'SMP', :c, '?', 'mcq', '["A) 1", "B) 2"]', 'A')
+            """), {"id": f"{topic_id}_{q}", "topic_id": topic_id, "c": CLASS_LEVEL})
+
+    expected = {"sessions": [], "session_items": [], "user_question_state": [], "review_log": []}
+    for topic_id, started_at in SESSIONS:
+        session_id = session_id_at(started_at)
+        conn.execute(text("""
+            INSERT INTO sessions (id, user_id, topic_id, status, started_at, completed_at)
+            VALUES (:id, :user_id, :topic_id, 'completed', :started_at, :started_at)
+        """), {"id": session_id, "user_id": USER_ID, "topic_id": topic_id, "started_at": started_at})
+        expected["sessions"].append(((session_id,), topic_id, started_at))
+        for q in range(QUESTIONS_PER_SESSION):
+            question_id = f"{topic_id}_{q}"
+            conn.execute(text("""
+                INSERT INTO session_items (id, session_id, question_id, sequence, user_answer, is_correct, answered_at)
+                VALUES (gen_random_uuid(), :session_id, :question_id, :sequence, 'A', true, :at)
+            """), {"session_id": session_id, "question_id": question_id, "sequence": q + 1, "at": started_at})
+            expected["session_items"].append(((session_id, str(q + 1)), topic_id, started_at))
+            row = conn.execute(text("""
+                INSERT INTO review_log (user_id, question_id, session_id, class_level, rating, state_before, reviewed_at)
+                VALUES (:user_id, :question_id, :session_id, :c, 2, 'new', :at)
+                RETURNING id
+            """), {"user_id": USER_ID, "question_id": question_id, "session_id": session_id,
+                   "c": CLASS_LEVEL, "at": started_at}).one()
+            expected["review_log"].append(((str(row.id),), topic_id, started_at))
+    for topic_id, started_at in SESSIONS[-2:]:
+        for q in range(QUESTIONS_PER_SESSION):
+            conn.execute(text("""
+                INSERT INTO user_question_state (user_id, question_id, state, stability, difficulty, reps,
+                                                 last_reviewed_at, next_due_at)
+                VALUES (:user_id, :question_id, 'review', 1, 5, 1, :at, :at)
+                ON CONFLICT (user_id, question_id) DO UPDATE SET last_reviewed_at = EXCLUDED.last_reviewed_at
+            """), {"user_id": USER_ID, "question_id": f"{topic_id}_{q}", "at": started_at})
+            expected["user_question_state"].append(((USER_ID, f"{topic_id}_{q}"), topic_id, started_at))
+    return expected
+
+def export(conn, table_name, filters, export_format):
+    """Keys of the exported rows, read back from the encoded output (None if malformed)"""
+    table = EXPORT_TABLES[table_name]
+    encoder = encoder_for(table, export_format)
+    query, params = export_query(table, filters)
+    result = conn.execution_options(stream_results=True, yield_per=CHUNK).execute(query, params)
+    data = encoder.begin()
+    for rows in result.partitions(CHUNK):
+        data += encoder.encode(rows)
+    data += encoder.finish()
+
+    if export_format == "csv":
+        reader = csv.DictReader(io.StringIO(data.decode()))
+        rows = list(reader)
+        if reader.fieldnames != [name for name, _ in table.columns]:
+            return None
+    else:
+        import pyarrow.parquet as pq
+        rows = pq.read_table(io.BytesIO(data)).to_pylist()
+    return sorted(tuple(str(row[name]) for name in KEYS[table_name]) for row in rows)
+
+def expected_keys(expected, table_name, filters):
+    return sorted(
+        key for key, topic_id, at in expected[table_name]
+        if (filters.topic_id is None or topic_id == filters.topic_id)
+        and (filters.since is None or at >= filters.since)
+        and (filters.until is None or at < filters.until)
+    )
+
+def run_test():
+    print("Testing streaming exports...")
+    try:
+        import pyarrow  # noqa: F401
+        formats = ["csv", "parquet"]
+    except ImportError:
+        formats = ["csv"]
+        print("   pyarrow not installed, checking CSV only")
+
+    day = timedelta(days=1)
+    cases = [
+        ("sessions", ExportFilters(USER_ID)),
+        ("sessions", ExportFilters(USER_ID, since=T0 + day, until=T0 + 3 * day)),
+        ("session_items", ExportFilters(USER_ID, TOPIC_ID, since=T0 + 2 * day)),
+        ("session_items", ExportFilters(USER_ID, until=T0 + day + timedelta(hours=1))),
+        ("user_question_state", ExportFilters(USER_ID, since=T0 + 4 * day)),
+        ("review_log", ExportFilters(USER_ID, OTHER_TOPIC_ID)),
+        ("review_log", ExportFilters(USER_ID, since=T0 + day, until=T0 + day)),
+    ]
+    failures = 0
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            expected = seed(conn)
+            for table_name, filters in cases:
+                want = expected_keys(expected, table_name, filters)
+                described = ", ".join(f"{k}={v:%m-%d %H:%M}" if isinstance(v, datetime) else f"{k}={v}"
+                                      for k, v in vars(filters).items() if v is not None)
+                for export_format in formats:
+                    got = export(conn, table_name, filters, export_format)
+                    if got == want:
+                        print(f"✅ {table_name} {export_format} ({described}): {len(want)} rows")
+                    else:
+                        failures += 1
+                        print(f"❌ {table_name} {export_format} ({described}): expected {want}, got {got}")
+        finally:
+            transaction.rollback()
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Check the FSRS weight optimizer on simulated review histories.
+Students review cards with the scalar `fsrs` scheduler and recall them with
+the probability FSRS predicts under a different set of weights; the test
+checks the replay against the scalar scheduler, that chunked reading keeps
+cards and cohorts apart, and that fitting lowers the log loss towards the
+one of the weights the answers were drawn from.
+No database needed.
+
+Usage: python test_fsrs_optimizer.py   (needs numpy: pip install -e ".[batch]")
+"""
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fsrs import FSRS, Card, Rating, State
+
+from app.services.fsrs_batch import STATE_NAMES
+from app.services.fsrs_optimizer import DEFAULT_WEIGHTS, HistoryBuilder, fit_cohort, log_loss, make_batches
+
+CARDS = 1_500
+REVIEWS_PER_CARD = 8
+CHUNK = 1_000
+TOLERANCE = 1e-9
+
+# Students forget faster than the defaults assume
+TRUE_WEIGHTS = (0.6, 0.8, 5.5, -0.8, -0.3, 0.1, 0.9, -0.2, 1.2, 1.2, -0.3, 0.3, 1.5)
+
+Row = namedtuple("Row", "user_id question_id class_level rating state_before elapsed_days")
+
+def simulate(rng, cards, class_level, start):
+    """review_log rows of `cards` cards, plus the loss the scalar scheduler's cards give"""
+    truth = FSRS()
+    truth.p.w = TRUE_WEIGHTS
+    default = FSRS()
+    rows = []
+    loss = observations = 0
+    for c in range(cards):
+        card = Card()
+        tracked = Card()  # same reviews, default weights: what the replay should see
+        now = start + timedelta(hours=rng.uniform(0, 48))
+        last = None
+        for _ in range(rng.randint(1, REVIEWS_PER_CARD)):
+            if card.state == State.Review:
+                elapsed = (now - last).days
+                recalled = rng.random() < 0.9 ** (elapsed / card.stability)
+                if elapsed >= 1:
+                    predicted = min(max(0.9 ** (elapsed / tracked.stability), 1e-6), 1 - 1e-6)
+                    loss -= np.log(predicted) if recalled else np.log1p(-predicted)
+                    observations += 1
+            else:
+                recalled = rng.random() < 0.8
+            rating = rng.choice([Rating.Hard, Rating.Good, Rating.Good, Rating.Easy]) if recalled else Rating.Again
+            rows.append(Row(
+                user_id=f"{c // 50:08d}", question_id=f"Q{class_level}_{c % 50}", class_level=class_level,
+                rating=int(rating), state_before=STATE_NAMES[int(card.state)],
+                elapsed_days=(now - last).total_seconds() / 86400 if last else None,
+            ))
+            card = truth.repeat(card, now)[rating].card
+            tracked = default.repeat(tracked, now)[rating].card
+            last = now
+            now = card.due + timedelta(hours=rng.uniform(0, 24 * min(card.scheduled_days + 1, 20)))
+    return rows, loss / observations
+
+def run_test():
+    print("Testing FSRS weight optimizer...")
+    rng = random.Random(11)
+    start = datetime(2025, 1, 6, 7, 0, tzinfo=timezone.utc)
+    results = []
+
+    rows7, scalar_loss = simulate(rng, CARDS, 7, start)
+    rows8, _ = simulate(rng, 20, 8, start)
+    # A card seen before the log existed: its history can't be replayed
+    seen_before = [Row("99999999", "Q7_0", 7, int(Rating.Good), "review", 3.2)]
+    rows = sorted(rows7 + rows8 + seen_before, key=lambda row: (row.user_id, row.question_id))
+
+    builder = HistoryBuilder()
+    for i in range(0, len(rows), CHUNK):
+        builder.add(rows[i:i + CHUNK])
+    histories = builder.build()
+    history = histories[7]
+    results.append(("cohorts kept apart", sorted(histories) == [7, 8] and histories[8].cards == 20))
+    results.append(("every card read once, across chunks", history.cards == CARDS))
+    results.append(("cards seen before the log left out", history.reviews == len(rows7)))
+
+    batches = make_batches(history, batch_cards=256)
+    replayed = log_loss(DEFAULT_WEIGHTS, batches)
+    results.append(("replay matches the scalar scheduler", abs(replayed - scalar_loss) < TOLERANCE))
+    if abs(replayed - scalar_loss) >= TOLERANCE:
+        print(f"   replay {replayed:.12f}, scalar {scalar_loss:.12f}")
+
+    began = time.perf_counter()
+    fit = fit_cohort(history, epochs=4, batch_cards=256)
+    seconds = time.perf_counter() - began
+    true_loss = log_loss(TRUE_WEIGHTS, batches)
+    print(f"   {fit.observations} observed reviews, log loss: default {fit.log_loss_default:.4f}, "
+          f"fitted {fit.log_loss_fitted:.4f}, true weights {true_loss:.4f} ({seconds:.2f}s)")
+    results.append(("fitting lowers the log loss", fit.log_loss_fitted < fit.log_loss_default))
+    gap_closed = (fit.log_loss_default - fit.log_loss_fitted) / (fit.log_loss_default - true_loss)
+    results.append((f"fitted loss close to the true weights' ({gap_closed:.0%} of the gap)", gap_closed > 0.8))
+
+    failures = 0
+    for name, ok in results:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failures += not ok
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    run_test()
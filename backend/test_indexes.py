@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Check that the hot queries use the indexes built for them (migration 009).
+Runs EXPLAIN on the statements the API executes, for the student with the
+most cards in one topic, and looks for the expected index in each plan and
+for sequential scans of the large tables. Lookups by session ID must also
+read a single monthly partition of sessions/session_items (migration 010). Every check runs twice: with the
+plan for the actual values, and with the generic plan Postgres may switch
+to for the API's prepared statements (asyncpg) once they run often. The
+lookups by session ID are the one exception: without partition pruning at
+plan time their generic plan costs far more than the custom one, so
+Postgres never switches to it. The generic plans need Postgres 16+
+(EXPLAIN (GENERIC_PLAN)).
+
+Meant for a database seeded at scale (python benchmarks/seed.py or
+scripts/generate_data.py); on a nearly empty database Postgres rightly
+prefers sequential scans and the checks would say nothing.
+Runs read-only: inserts are explained, not executed, and the transaction
+is rolled back.
+
+Usage: python test_indexes.py   (needs DATABASE_URL in .env)
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app.models.database import engine
+from app.services.answer_buffer import LOAD_ACTIVE_SESSION_SQL
+from app.services.question_selection import USER_SLICE_STATES_SQL
+from app.services.session_store import LOAD_SESSION_FOR_COMPLETION_SQL
+from app.services.topic_stats import REFRESH_ONE_TOPIC_STATS_SQL, USER_TOPIC_STATS_SQL, USER_TOTALS_SQL
+
+# Below this many states the planner's choices are not representative
+MIN_STATES = 100_000
+LARGE_TABLES = {"user_question_state", "questions", "sessions", "session_items", "user_topic_stats"}
+# Scanning a (nearly) empty partition, e.g. next month's or the default one, is fine
+SMALL_TABLE_ROWS = 1000
+# A generic plan this many times costlier than the custom plan is never chosen
+GENERIC_COST_FACTOR = 10
+# Lookups by session ID: their partition is only known once the ID is, so
+# their generic plan reads every partition and may be that much costlier.
+# Every other statement's generic plan is always checked.
+SESSION_ID_STATEMENTS = (LOAD_SESSION_FOR_COMPLETION_SQL, LOAD_ACTIVE_SESSION_SQL)
+
+BUSIEST_SLICE_SQL = text("""
+SELECT user_id, topic_id, class_level
+FROM user_question_state
+GROUP BY user_id, topic_id, class_level
+ORDER BY count(*) DESC
+LIMIT 1
+""")
+
+# Newest session with a time-ordered ID (older in-progress ones sit in the default partition)
+LATEST_SESSION_SQL = text("""
+SELECT id, user_id FROM sessions WHERE id < session_id_floor(NOW()) ORDER BY id DESC LIMIT 1
+""")
+
+SMALL_TABLES_SQL = text("""
+SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples < :rows
+""")
+
+# Partition (and partition index) -> partitioned parent
+PARTITION_PARENTS_SQL = text("""
+SELECT c.relname, p.relname
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_class p ON p.oid = i.inhparent
+""")
+
+QUESTION_FOREIGN_KEY_SQL = text("""
+SELECT 1 FROM session_items WHERE question_id = :question_id LIMIT 1
+""")
+
+def plan_nodes(node):
+    """Every node of an EXPLAIN (FORMAT JSON) plan, depth first"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+def explain(conn, statement, params, generic=False):
+    if generic:
+        # Placeholders left as $1, $2... as the API sends them
+        sql = str(statement.compile(dialect=asyncpg.dialect()))
+        plan = conn.exec_driver_sql("EXPLAIN (GENERIC_PLAN, FORMAT JSON) " + sql).scalar()
+    else:
+        plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + statement.text), params).scalar()
+    return list(plan_nodes(plan[0]["Plan"]))
+
+def check_plan(name, nodes, index, seek_column=None, parents=None, small=frozenset()):
+    """`index` must be used (seeking on `seek_column`, if given) and no large table scanned"""
+    parents = parents or {}
+    nodes = [node for node in nodes if not (node["Node Type"] == "Seq Scan" and node.get("Relation Name") in small)]
+    for node in nodes:
+        # Report partitions and their indexes under the parent's name
+        for key in ("Relation Name", "Index Name"):
+            if key in node:
+                node[key] = parents.get(node[key], node[key])
+    used = {node["Index Name"] for node in nodes if "Index Name" in node}
+    seq_scans = sorted({
+        node["Relation Name"] for node in nodes
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in LARGE_TABLES
+    })
+    index_nodes = [node for node in nodes if node.get("Index Name") == index]
+    if seq_scans:
+        problem = f"sequential scan of {', '.join(seq_scans)}"
+    elif not index_nodes:
+        problem = f"{index} not used"
+    elif seek_column and not any(seek_column in node.get("Index Cond", "") for node in index_nodes):
+        problem = f"{index} used without {seek_column} in the index condition"
+    else:
+        print(f"✅ {name}: {index_nodes[0]['Node Type']} using {index}")
+        return 0
+    print(f"❌ {name}: {problem} (indexes used: {', '.join(sorted(used)) or 'none'})")
+    return 1
+
+def check_pruning(name, nodes, parents):
+    """At most one partition of each partitioned table may be read"""
+    partitions = {}
+    for node in nodes:
+        relation = node.get("Relation Name")
+        if relation in parents:
+            partitions.setdefault(parents[relation], set()).add(relation)
+    too_many = {table: sorted(names) for table, names in partitions.items() if len(names) > 1}
+    if too_many:
+        print(f"❌ {name}: reads " + "; ".join(f"{len(n)} partitions of {t}" for t, n in too_many.items()))
+        return 1
+    read = sorted(partition for names in partitions.values() for partition in names)
+    print(f"✅ {name}: reads {', '.join(read)}")
+    return 0
+
+def run_test():
+    print("Testing index usage of the hot queries...")
+    now = datetime.now(timezone.utc)
+    failures = 0
+
+    with engine.connect() as conn:
+        try:
+            states = conn.execute(text(
+                "SELECT reltuples FROM pg_class WHERE relname = 'user_question_state'"
+            )).scalar() or 0
+            if states < MIN_STATES:
+                print(f"❌ only ~{int(max(states, 0))} user_question_state rows: "
+                      "seed the database first (python benchmarks/seed.py)")
+                return
+            user_id, topic_id, class_level = conn.execute(BUSIEST_SLICE_SQL).one()
+            session_id, session_user_id = conn.execute(LATEST_SESSION_SQL).one()
+            parents = dict(conn.execute(PARTITION_PARENTS_SQL).all())
+            small = set(conn.execute(SMALL_TABLES_SQL, {"rows": SMALL_TABLE_ROWS}).scalars())
+            question_id = conn.execute(text(
+                "SELECT question_id FROM user_question_state WHERE user_id = :user_id LIMIT 1"
+            ), {"user_id": user_id}).scalar()
+
+            checks = [
+                ("session creation: user's cards in the slice", USER_SLICE_STATES_SQL,
+                 {"user_id": user_id, "topic_id": topic_id, "now": now}, "idx_uqs_slice", "topic_id"),
+                ("session completion: topic stats refresh", REFRESH_ONE_TOPIC_STATS_SQL,
+                 {"user_ids": [user_id], "topic_id": topic_id, "now": now}, "idx_uqs_slice", "topic_id"),
+                ("session completion: load session", LOAD_SESSION_FOR_COMPLETION_SQL,
+                 {"session_id": session_id}, "idx_session_items_session", None),
+                ("answers: load active session", LOAD_ACTIVE_SESSION_SQL,
+                 {"session_id": session_id}, "idx_session_items_session", None),
+                ("dashboard: topic stats", USER_TOPIC_STATS_SQL,
+                 {"user_id": user_id, "class_level": class_level, "now": now}, "user_topic_stats_pkey", None),
+                ("dashboard: totals", USER_TOTALS_SQL,
+                 {"user_id": session_user_id, "now": now, "tz": "Asia/Jakarta"}, "user_topic_stats_pkey", None),
+                ("question delete: foreign key check", QUESTION_FOREIGN_KEY_SQL,
+                 {"question_id": question_id}, "idx_session_items_question", None),
+            ]
+            print("\nPlans for the busiest user/topic:")
+            for name, statement, params, index, seek_column in checks:
+                failures += check_plan(name, explain(conn, statement, params), index, seek_column, parents, small)
+
+            print("\nPartition pruning for the latest session:")
+            for name, statement, params, _, _ in checks[2:4]:
+                failures += check_pruning(name, explain(conn, statement, params), parents)
+
+            if conn.dialect.server_version_info < (16,):
+                print("\n⚠️  Generic plans not checked: EXPLAIN (GENERIC_PLAN) needs Postgres 16+")
+            else:
+                print("\nGeneric plans (prepared statements):")
+                for name, statement, params, index, seek_column in checks:
+                    plan = explain(conn, statement, params, generic=True)
+                    custom_cost = explain(conn, statement, params)[0]["Total Cost"]
+                    if statement in SESSION_ID_STATEMENTS and plan[0]["Total Cost"] > custom_cost * GENERIC_COST_FACTOR:
+                        # Postgres only switches to a generic plan that is about as cheap as the
+                        # custom ones; without partition pruning at plan time this one never is
+                        print(f"✅ {name}: custom plans kept (generic plan costs "
+                              f"{plan[0]['Total Cost']:.0f}, custom {custom_cost:.0f})")
+                        continue
+                    failures += check_plan(name, plan, index, seek_column, parents, small)
+        finally:
+            conn.rollback()
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Check request instrumentation against a running server: every response
+carries a Server-Timing header, and GET /metrics reports per-route latency,
+DB queries per request and pool usage in the Prometheus text format.
+Usage: python test_metrics.py   (server running on localhost:8000)
+"""
+import re
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+SERVER_TIMING = re.compile(r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) queries"$')
+
+def metric_value(metrics_text, name, labels):
+    """Value of the sample `name{labels}`, or None"""
+    for line in metrics_text.splitlines():
+        if line.startswith(f"{name}{{") and all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+def run_test():
+    print("Testing request metrics...")
+    failures = 0
+
+    try:
+        response = requests.post(f"{BASE_URL}/api/users", json={"grade_level": "SMP", "class_level": 8})
+    except requests.exceptions.ConnectionError:
+        print("❌ Cannot connect to API. Is the server running?")
+        print("   Start server with: uvicorn app.main:app --reload")
+        return
+    user_id = response.json()["user_id"]
+
+    match = SERVER_TIMING.match(response.headers.get("server-timing", ""))
+    if match and int(match.group(1)) > 0:
+        print(f"✅ Server-Timing: {response.headers['server-timing']}")
+    else:
+        failures += 1
+        print(f"❌ Server-Timing missing or without DB queries: {response.headers.get('server-timing')!r}")
+
+    route = "/api/dashboard/{user_id}/stats"
+    before = requests.get(f"{BASE_URL}/metrics").text
+    count_before = metric_value(before, "http_request_duration_seconds_count", {"route": route, "status": "200"}) or 0
+    for _ in range(3):
+        requests.get(f"{BASE_URL}/api/dashboard/{user_id}/stats")
+    response = requests.get(f"{BASE_URL}/metrics")
+    after = response.text
+
+    checks = [
+        ("content type", response.headers.get("content-type", "").startswith("text/plain")),
+        ("route template label", metric_value(
+            after, "http_request_duration_seconds_count", {"route": route, "status": "200"}
+        ) == count_before + 3),
+        ("queries per request", metric_value(after, "http_request_db_queries_count", {"route": route}) is not None),
+        ("DB time per request", metric_value(after, "http_request_db_seconds_sum", {"route": route}) is not None),
+        ("pool stats", metric_value(after, "db_pool_checkouts_total", {"engine": "async"}) is not None),
+        ("no raw user IDs", user_id not in after),
+    ]
+    for name, ok in checks:
+        if not ok:
+            failures += 1
+        print(f"{'✅' if ok else '❌'} /metrics: {name}")
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Check query budgets.
+
+1. Directly against the database: track_queries() counts statements, raises
+   QueryBudgetExceeded over its limit, reports repeated statements (N+1),
+   slow queries are logged with their EXPLAIN plan, and the answer
+   write-behind flush at session completion is not counted.
+2. Against a running server: walks the user -> dashboard -> session flow and
+   checks every request stayed within the budget declared on its route
+   (query counts come from the Server-Timing header). Start the server with
+   QUERY_BUDGET_MODE=raise so an over-budget request also fails with a 500.
+   With EXPORT_TOKEN set (same value as the server's) the export is checked too.
+
+Usage: python test_query_budgets.py   (needs DATABASE_URL in .env and the server on localhost:8000)
+"""
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime, timezone
+
+import requests
+from sqlalchemy import text
+
+BASE_URL = "http://localhost:8000"
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+async def check_tracking():
+    import app.services.query_budget as query_budget
+    from app.main import app  # noqa: F401  (installs the query hooks)
+    from app.models.database import AsyncSessionLocal
+    from app.services.answer_buffer import AnswerBuffer
+    from app.services.query_budget import QueryBudgetExceeded, track_queries
+
+    failures = 0
+    async with AsyncSessionLocal() as db:
+        with track_queries(label="count") as log:
+            for i in range(4):
+                await db.execute(text("SELECT CAST(:i AS integer)"), {"i": i})
+        if log.count == 4 and len(log.repeated()) == 1:
+            print(f"✅ track_queries: counted {log.count} statements, flagged the repeated one")
+        else:
+            failures += 1
+            print(f"❌ track_queries: count={log.count}, repeated={log.repeated()}")
+
+        try:
+            with track_queries(limit=1, label="over budget"):
+                await db.execute(text("SELECT 1"))
+                await db.execute(text("SELECT 2"))
+            failures += 1
+            print("❌ track_queries: no QueryBudgetExceeded over the limit")
+        except QueryBudgetExceeded as exc:
+            print(f"✅ track_queries: over budget raises ({str(exc).splitlines()[0]})")
+
+        # Log every statement as slow and capture the warning
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        query_budget.logger.addHandler(handler)
+        query_budget.SLOW_QUERY_MS, previous = 0.000001, query_budget.SLOW_QUERY_MS
+        try:
+            await db.execute(text("SELECT count(*) FROM topics WHERE grade_level = :grade"), {"grade": "SMP"})
+            await db.execute(text("SELECT 1"))  # the transaction is still usable after EXPLAIN
+        finally:
+            query_budget.SLOW_QUERY_MS = previous
+            query_budget.logger.removeHandler(handler)
+        messages = [record.getMessage() for record in records]
+        if any("Slow query" in m and "topics" in m and "cost=" in m for m in messages):
+            print("✅ slow query log includes the EXPLAIN plan")
+        else:
+            failures += 1
+            print(f"❌ slow query log: {messages[:1]}")
+        await db.rollback()
+
+    # With ANSWER_WRITE_BEHIND, completing a session flushes the buffered
+    # answers first; that write belongs to the earlier answer requests
+    buffer = AnswerBuffer(enabled=True)
+    buffer.add("test-query-budget-session", "test-query-budget-question", "A", True, None,
+               datetime.now(timezone.utc))
+    try:
+        with track_queries(limit=0, label="complete with write-behind") as log:
+            written = await buffer.flush_session("test-query-budget-session")
+        print(f"✅ answer buffer flush is not counted against the request ({written} written, {log.count} counted)")
+    except QueryBudgetExceeded as exc:
+        failures += 1
+        print(f"❌ answer buffer flush counted against the request: {str(exc).splitlines()[0]}")
+    return failures
+
+def route_budgets():
+    from app.main import app
+
+    budgets = {}
+    for route in app.routes:
+        budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+        if budget is not None:
+            for method in route.methods:
+                budgets[(method, route.path)] = budget
+    return budgets
+
+def check_routes():
+    budgets = route_budgets()
+    failures = 0
+    calls = []
+
+    def call(method, path, template, **kwargs):
+        response = requests.request(method, f"{BASE_URL}{path}", **kwargs)
+        match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+        calls.append((method, template, response.status_code, int(match.group(1)) if match else None))
+        return response
+
+    try:
+        response = call("POST", "/api/users", "/api/users", json={"grade_level": "SMP", "class_level": 8})
+    except requests.exceptions.ConnectionError:
+        print("❌ Cannot connect to API. Is the server running?")
+        print("   Start server with: QUERY_BUDGET_MODE=raise uvicorn app.main:app")
+        return 1
+    user_id = response.json()["user_id"]
+
+    call("GET", f"/api/users/{user_id}", "/api/users/{user_id}")
+    call("PATCH", f"/api/users/{user_id}", "/api/users/{user_id}", json={"class_level": 8})
+    call("GET", f"/api/users/{user_id}/validate", "/api/users/{user_id}/validate")
+    call("GET", f"/api/dashboard/{user_id}/stats", "/api/dashboard/{user_id}/stats")
+    call("GET", f"/api/dashboard/{user_id}/topics", "/api/dashboard/{user_id}/topics")
+    topics = requests.get(f"{BASE_URL}/api/dashboard/{user_id}/topics").json()
+    session = call(
+        "POST", "/api/sessions", "/api/sessions",
+        json={"user_id": user_id, "topic_id": topics[0]["topic_id"], "session_size": 15},
+    ).json()
+    for question in session.get("questions", []):
+        call(
+            "POST", f"/api/sessions/{session['session_id']}/answer", "/api/sessions/{session_id}/answer",
+            json={"user_id": user_id, "question_id": question["id"], "answer": "A"},
+        )
+    call(
+        "POST", f"/api/sessions/{session['session_id']}/complete", "/api/sessions/{session_id}/complete",
+        json={"user_id": user_id},
+    )
+    if os.getenv("EXPORT_TOKEN"):
+        call(
+            "GET", f"/api/export/session_items?user_id={user_id}", "/api/export/{table}",
+            headers={"Authorization": f"Bearer {os.getenv('EXPORT_TOKEN')}"},
+        )
+
+    worst = {}
+    for method, template, status, queries in calls:
+        key = (method, template)
+        if status >= 500 or queries is None:
+            worst[key] = (status, queries, "failed")
+        elif key not in worst or worst[key][1] < queries:
+            worst[key] = (status, queries, "ok")
+    for (method, template), (status, queries, state) in sorted(worst.items()):
+        budget = budgets.get((method, template))
+        if budget is None:
+            failures += 1
+            print(f"❌ {method} {template}: no query budget declared")
+        elif state == "failed" or queries > budget:
+            failures += 1
+            print(f"❌ {method} {template}: status {status}, {queries} queries (budget {budget})")
+        else:
+            print(f"✅ {method} {template}: {queries} queries (budget {budget})")
+    return failures
+
+def run_test():
+    print("Testing query budgets...")
+    failures = asyncio.run(check_tracking())
+    failures += check_routes()
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Check the bulk question importer (app/services/question_import.py) on
+fixture topics: invalid records are rejected with the right reason,
+duplicate sources are skipped, new sources are inserted and known ones
+updated in place on a second import, a question ID that belongs to another
+source is not overwritten, and the catalog version is bumped.
+Everything runs in one transaction that is rolled back at the end.
+
+Usage: python test_question_import.py   (needs DATABASE_URL in .env)
+"""
+import json
+
+from sqlalchemy import text
+
+from app.models.database import engine
+from app.services.question_import import QuestionImporter, default_question_id
+
+TOPIC_ID = "TEST_IMPORT"
+SMA_TOPIC_ID = "TEST_IMPORT_SMA"
+PACKAGE = "TEST-PAKET 01"
+MULTILINE_PROMPT = "Perhatikan tabel:\nx\t1\ny\t2\r\nNilai \\frac{x}{y} = ..."
+
+def question(number, **changes):
+    record = {
+        "topic_id": TOPIC_ID, "grade_level": "SMP", "class_level": 8,
+        "prompt_text": f"Soal {number}", "options": ["A) 1", "B) 2", "C) 3", "D) 4"], "correct_option": "b",
+        "source_year": 2019, "source_package": PACKAGE, "source_number": number,
+    }
+    record.update(changes)
+    return record
+
+# (record, part of the expected problem)
+INVALID = [
+    (question(90, type="numeric"), "type must be mcq"),
+    (question(91, options=["A) 1"]), "at least 2 options"),
+    (question(92, options=["A) 1", "C) 2"]), "should read \"B) ...\""),
+    (question(93, options="A) 1, B) 2"), "JSON array"),
+    (question(94, correct_option="E"), "correct_option must be one of A, B, C, D"),
+    (question(95, topic_id="TEST_IMPORT_MISSING"), "unknown topic"),
+    (question(96, topic_id=SMA_TOPIC_ID), "is SMA, not SMP"),
+    (question(97, class_level=7), "not taught in class 7"),
+    (question(98, class_level=10), "class 10 is not a SMP class"),
+    (question(99, source_number=None), "source_number is missing"),
+    (question(100, source_year="2019a"), "source_year must be a whole number"),
+]
+
+def seed(conn):
+    for topic_id, grade, levels in ((TOPIC_ID, "SMP", [8, 9]), (SMA_TOPIC_ID, "SMA", [10])):
+        conn.execute(text("""
+            INSERT INTO topics (id, name, short_code, grade_level, class_levels)
+            VALUES (:id, 'Test', 'TEST', :grade, CAST(:levels AS jsonb))
+        """), {"id": topic_id, "grade": grade, "levels": json.dumps(levels)})
+    # A hand-written question (no source) whose ID an import must not take over
+    conn.execute(text("""
+        INSERT INTO questions (id, topic_id, grade_level, class_level, prompt_text, type, options, correct_option)
+        VALUES ('TEST_IMPORT_HAND', :topic_id, 'SMP', 8, 'Hand-written', 'mcq', '["A) 1", "B) 2"]', 'A')
+    """), {"topic_id": TOPIC_ID})
+
+def catalog_version(conn):
+    return conn.execute(text("SELECT version FROM catalog_version")).scalar_one()
+
+def imported(conn):
+    rows = conn.execute(text("""
+        SELECT id, source_number, prompt_text, correct_option, options
+        FROM questions
+        WHERE source_package = :package
+        ORDER BY source_number
+    """), {"package": PACKAGE}).all()
+    return {row.source_number: row for row in rows}
+
+def run_test():
+    print("Testing the question importer...")
+    failures = 0
+
+    def check(ok, message):
+        nonlocal failures
+        print(f"{'✅' if ok else '❌'} {message}")
+        failures += not ok
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            seed(conn)
+            version = catalog_version(conn)
+
+            importer = QuestionImporter(conn, chunk_rows=2)
+            records = [question(n) for n in range(1, 5)] + [question(5, prompt_text=MULTILINE_PROMPT)]
+            records.append(question(3, prompt_text="Repeated"))
+            records += [record for record, _ in INVALID]
+            for record in records:
+                importer.add(record)
+            result = importer.merge()
+
+            problems = dict(result.invalid)
+            for number, (_, expected) in enumerate(INVALID, start=7):
+                problem = problems.get(number, "accepted")
+                check(expected in problem, f"rejects {expected!r}: {problem}")
+            check([number for number, _ in result.duplicates] == [6],
+                  f"skips the repeated source: {result.duplicates}")
+            check((result.inserted, result.updated) == (5, 0),
+                  f"first import: {result.inserted} inserted, {result.updated} updated")
+            rows = imported(conn)
+            check(sorted(rows) == [1, 2, 3, 4, 5] and rows[3].prompt_text == "Soal 3",
+                  "the first record of a source wins")
+            check(rows[1].id == default_question_id(2019, PACKAGE, 1) == "UN_2019_TEST_PAKET_01_001"
+                  and rows[1].correct_option == "B" and rows[1].options[0] == "A) 1",
+                  f"ID from the source identity, answer upper-cased: {rows[1].id}, {rows[1].correct_option}")
+            check(rows[5].prompt_text == MULTILINE_PROMPT, "tabs, newlines and backslashes survive COPY")
+            check(catalog_version(conn) == version + 1, "catalog version bumped")
+
+            importer = QuestionImporter(conn)
+            for record in [
+                question(1),  # unchanged
+                question(2, prompt_text="Soal 2 (revisi)", correct_option="C"),  # updated in place
+                question(3, id="UN_RENAMED_003"),  # same source, another ID: keeps its ID
+                question(6),  # new
+                question(7, id="TEST_IMPORT_HAND"),  # ID of a question without a source
+            ]:
+                importer.add(record)
+            result = importer.merge()
+            check((result.inserted, result.updated, result.unchanged) == (1, 1, 2),
+                  f"re-import: {result.inserted} inserted, {result.updated} updated, {result.unchanged} unchanged")
+            check(result.taken_ids == ["TEST_IMPORT_HAND"], f"ID of another question skipped: {result.taken_ids}")
+            rows = imported(conn)
+            check(rows[2].prompt_text == "Soal 2 (revisi)" and rows[2].correct_option == "C"
+                  and rows[2].id == default_question_id(2019, PACKAGE, 2), "known source updated in place")
+            check(rows[3].id == default_question_id(2019, PACKAGE, 3), "a source keeps its question ID")
+            check(7 not in rows, "hand-written question left alone")
+            check(catalog_version(conn) == version + 2, "catalog version bumped again")
+
+            importer = QuestionImporter(conn)
+            importer.add(question(1))
+            result = importer.merge()
+            check(result.unchanged == 1 and result.catalog_version is None,
+                  "nothing changed: catalog version kept")
+        finally:
+            transaction.rollback()
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    run_test()
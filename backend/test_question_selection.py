@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Regression check for session question selection.
+Compares the selection used by POST /api/sessions (one query + in-memory
+sampling) against the original three-query algorithm (due -> new -> fallback)
+on fixture data.
+Everything runs in one transaction that is rolled back at the end.
+
+Usage: python test_question_selection.py   (needs DATABASE_URL in .env)
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.models.database import AsyncSessionLocal
+from app.models.models import Question, Topic, User, UserQuestionState
+from app.services.question_selection import (
+    PRIORITY_DUE,
+    PRIORITY_FALLBACK,
+    PRIORITY_NEW,
+    select_session_questions,
+)
+
+USER_ID = "00000000"
+TOPIC_ID = "TEST_SELECTION"
+CLASS_LEVEL = 8
+JUST_DUE = timedelta(seconds=1)
+
+async def legacy_selection(db, user_id, topic_id, class_level, limit, now):
+    """The original create_session algorithm: three separate queries"""
+    due_ids = list((await db.execute(
+        select(Question.id)
+        .join(UserQuestionState, Question.id == UserQuestionState.question_id)
+        .where(
+            UserQuestionState.user_id == user_id,
+            Question.topic_id == topic_id,
+            UserQuestionState.next_due_at <= now,
+            Question.class_level == class_level
+        )
+        .order_by(UserQuestionState.next_due_at.asc())
+        .limit(limit)
+    )).scalars().all())
+
+    new_ids = []
+    remaining = limit - len(due_ids)
+    if remaining > 0:
+        seen = select(UserQuestionState.question_id).where(UserQuestionState.user_id == user_id)
+        new_ids = list((await db.execute(
+            select(Question.id).where(
+                Question.topic_id == topic_id,
+                Question.class_level == class_level,
+                ~Question.id.in_(seen)
+            ).order_by(func.random()).limit(remaining)
+        )).scalars().all())
+
+    extra_ids = []
+    remaining = limit - len(due_ids) - len(new_ids)
+    if remaining > 0:
+        extra_ids = list((await db.execute(
+            select(Question.id).where(
+                Question.topic_id == topic_id,
+                Question.class_level == class_level,
+                ~Question.id.in_(due_ids + new_ids)
+            ).order_by(func.random()).limit(remaining)
+        )).scalars().all())
+
+    return due_ids, new_ids, extra_ids
+
+async def seed(db, now):
+    db.add(User(id=USER_ID, grade_level="SMP", class_level=CLASS_LEVEL))
+    db.add(Topic(id=TOPIC_ID, name="Test", short_code="TEST", grade_level="SMP", class_levels=[CLASS_LEVEL]))
+    await db.flush()
+    for i in range(30):
+        db.add(Question(
+            id=f"{TOPIC_ID}_{i:03d}", topic_id=TOPIC_ID, grade_level="SMP",
+            class_level=CLASS_LEVEL, prompt_text="?", type="mcq",
+            options=["A) 1", "B) 2"], correct_option="A",
+        ))
+    # Another class level in the same topic must never be picked
+    db.add(Question(
+        id=f"{TOPIC_ID}_OTHER", topic_id=TOPIC_ID, grade_level="SMP",
+        class_level=CLASS_LEVEL + 1, prompt_text="?", type="mcq",
+        options=["A) 1", "B) 2"], correct_option="A",
+    ))
+    await db.flush()
+    # 0-4: due (different due times; 4 only a second ago, e.g. a learning
+    # step), 5-9: seen but not due, 10-29: new
+    for i in range(10):
+        due = now - timedelta(hours=10 - i) if i < 4 else now - JUST_DUE if i == 4 else now + timedelta(days=i)
+        db.add(UserQuestionState(
+            user_id=USER_ID, question_id=f"{TOPIC_ID}_{i:03d}",
+            state="review", stability=1, difficulty=5, next_due_at=due,
+        ))
+    await db.flush()
+
+def pool_for_class(class_level):
+    """Stands in for the catalog cache, which doesn't know the fixture questions"""
+    if class_level != CLASS_LEVEL:
+        return []
+    return [f"{TOPIC_ID}_{i:03d}" for i in range(30)]
+
+async def run_test():
+    print("Testing session question selection...")
+    # Half past the hour: a card due a second ago is served right away, not
+    # from the next full hour
+    now = datetime.now(timezone.utc).replace(minute=30, second=0, microsecond=0)
+    failures = 0
+
+    async with AsyncSessionLocal() as db:
+        try:
+            await seed(db, now)
+
+            for limit in (3, 8, 28, 40):
+                legacy_due, legacy_new, legacy_extra = await legacy_selection(
+                    db, USER_ID, TOPIC_ID, CLASS_LEVEL, limit, now
+                )
+                selection = await select_session_questions(
+                    db, USER_ID, TOPIC_ID, limit, now, pool_for_class=pool_for_class
+                )
+                by_priority = {PRIORITY_DUE: [], PRIORITY_NEW: [], PRIORITY_FALLBACK: []}
+                for qid, priority in zip(selection.question_ids, selection.priorities):
+                    by_priority[priority].append(qid)
+
+                checks = [
+                    ("class level", selection.class_level == CLASS_LEVEL),
+                    ("size", len(selection.question_ids) == len(legacy_due + legacy_new + legacy_extra)),
+                    ("due order", by_priority[PRIORITY_DUE] == legacy_due),
+                    ("due the moment it reaches next_due_at",
+                     by_priority[PRIORITY_DUE] == [f"{TOPIC_ID}_{i:03d}" for i in range(5)][:limit]),
+                    ("new count", len(by_priority[PRIORITY_NEW]) == len(legacy_new)),
+                    ("new pool", set(by_priority[PRIORITY_NEW]) <= {f"{TOPIC_ID}_{i:03d}" for i in range(10, 30)}),
+                    ("fallback count", len(by_priority[PRIORITY_FALLBACK]) == len(legacy_extra)),
+                    ("fallback pool", set(by_priority[PRIORITY_FALLBACK]) <= {f"{TOPIC_ID}_{i:03d}" for i in range(5, 10)}),
+                    ("priority order", selection.priorities == sorted(selection.priorities)),
+                    ("no duplicates", len(set(selection.question_ids)) == len(selection.question_ids)),
+                ]
+                failed = [name for name, ok in checks if not ok]
+                if failed:
+                    failures += 1
+                    print(f"❌ limit={limit}: {', '.join(failed)}")
+                else:
+                    print(f"✅ limit={limit}: matches legacy selection")
+
+            missing = await select_session_questions(
+                db, "99999999x", TOPIC_ID, 15, now, pool_for_class=pool_for_class
+            )
+            if missing.class_level is None and not missing.question_ids:
+                print("✅ unknown user: reported as missing")
+            else:
+                failures += 1
+                print("❌ unknown user: expected no class level")
+        finally:
+            await db.rollback()
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
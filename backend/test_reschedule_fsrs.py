@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Check bulk re-scheduling (app/services/fsrs_reschedule.py) on cards
+scheduled by real session completions: a fixture user answers the same
+questions in several sessions with every rating, then
+1. replaying with the default parameters moves no card (Hard and Easy
+   intervals included),
+2. a lower requested retention moves cards, only later,
+3. a card reviewed again after the read keeps its due date,
+4. a card without the replay inputs (reviewed before migration 014) is skipped.
+Everything runs in one transaction that is rolled back at the end.
+
+Usage: python test_reschedule_fsrs.py   (needs DATABASE_URL in .env, numpy)
+"""
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.models.database import AsyncSessionLocal
+from app.models.models import Question, Topic, User
+from app.services.fsrs_batch import BatchParameters
+from app.services.fsrs_reschedule import SELECT_REVIEW_CARDS_SQL, reschedule_chunk, write_chunk
+from app.services.session_store import complete_session, insert_session_with_items, load_session_for_completion
+
+USER_ID = "00000005"
+TOPIC_ID = "TEST_RESCHEDULE"
+QUESTIONS = 16
+# Session start times, odd hours apart so whole-day counting matters
+STARTS = [datetime(2025, 3, 1, 8, 0, tzinfo=timezone.utc) + timedelta(days=d, hours=h)
+          for d, h in ((0, 0), (0, 0.5), (1, 3), (3, 20), (9, 5), (24, 13), (61, 2))]
+# (is_correct, confidence): Again, Hard, Good, Easy
+ANSWERS = [(False, None), (True, "guessed"), (True, "pretty_sure"), (True, "very_sure")]
+LEGACY_QUESTION = f"{TOPIC_ID}_LEGACY"
+
+USER_CARDS_SQL = text(f"{SELECT_REVIEW_CARDS_SQL.text} AND user_id = :user_id ORDER BY question_id")
+
+async def answer_session(db, rng, number, started_at):
+    session_id = f"test-reschedule-{number}"
+    question_ids = [f"{TOPIC_ID}_{i:02d}" for i in range(QUESTIONS)]
+    await insert_session_with_items(db, session_id, USER_ID, TOPIC_ID, 8, started_at, question_ids)
+    for question_id in question_ids:
+        is_correct, confidence = rng.choice(ANSWERS)
+        await db.execute(text("""
+            UPDATE session_items SET user_answer = 'A', is_correct = :is_correct, confidence = :confidence
+            WHERE session_id = :session_id AND question_id = :question_id
+        """), {"is_correct": is_correct, "confidence": confidence,
+               "session_id": session_id, "question_id": question_id})
+    session = await load_session_for_completion(db, session_id)
+    await complete_session(db, session_id, session, started_at + timedelta(minutes=20))
+
+async def run_test():
+    print("Testing bulk FSRS re-scheduling...")
+    rng = random.Random(3)
+    failures = 0
+
+    def check(ok, message):
+        nonlocal failures
+        print(f"{'✅' if ok else '❌'} {message}")
+        failures += not ok
+
+    async with AsyncSessionLocal() as db:
+        try:
+            db.add(User(id=USER_ID, grade_level="SMP", class_level=8))
+            db.add(Topic(id=TOPIC_ID, name="Test", short_code="TEST", grade_level="SMP", class_levels=[8]))
+            await db.flush()
+            for i in range(QUESTIONS):
+                db.add(Question(id=f"{TOPIC_ID}_{i:02d}", topic_id=TOPIC_ID, grade_level="SMP", class_level=8,
+                                prompt_text="?", type="mcq", options=["A) 1", "B) 2"], correct_option="A"))
+            db.add(Question(id=LEGACY_QUESTION, topic_id=TOPIC_ID, grade_level="SMP", class_level=8,
+                            prompt_text="?", type="mcq", options=["A) 1", "B) 2"], correct_option="A"))
+            await db.flush()
+            for number, started_at in enumerate(STARTS, 1):
+                await answer_session(db, rng, number, started_at)
+            await db.execute(text("""
+                INSERT INTO user_question_state (user_id, question_id, state, stability, difficulty, reps,
+                                                 last_reviewed_at, next_due_at)
+                VALUES (:user_id, :question_id, 'review', 10, 5, 3, '2025-03-01 08:00', '2025-03-11 08:00')
+            """), {"user_id": USER_ID, "question_id": LEGACY_QUESTION})
+
+            rows = (await db.execute(USER_CARDS_SQL, {"user_id": USER_ID})).all()
+            ratings = {row.last_rating for row in rows if row.last_rating is not None}
+            check(len(rows) > QUESTIONS // 2 and {1, 3} <= ratings,
+                  f"{len(rows)} review cards, last ratings {sorted(ratings)} (Hard and Easy included)")
+
+            # 1. Default parameters give the stored due dates back
+            chunk = reschedule_chunk(rows, BatchParameters())
+            check(not chunk.user_ids, f"default parameters: {len(chunk.user_ids)} of {len(rows)} cards move")
+
+            # 4. The card without replay inputs is left alone
+            check(chunk.skipped == 1, f"card without replay inputs skipped ({chunk.skipped})")
+
+            # 2. A lower retention spaces reviews further apart
+            chunk = reschedule_chunk(rows, BatchParameters(request_retention=0.8))
+            current = {row.question_id: row.next_due_at for row in rows}
+            later = all(due > current[q] for q, due in zip(chunk.question_ids, chunk.next_due_at))
+            check(bool(chunk.user_ids) and later and LEGACY_QUESTION not in chunk.question_ids,
+                  f"retention 0.8: {len(chunk.user_ids)} cards move, all later")
+
+            # 3. A review between the read and the write wins
+            reviewed_again = chunk.question_ids[0]
+            await db.execute(text("""
+                UPDATE user_question_state
+                SET last_reviewed_at = last_reviewed_at + interval '1 day', next_due_at = '2030-01-01'
+                WHERE user_id = :user_id AND question_id = :question_id
+            """), {"user_id": USER_ID, "question_id": reviewed_again})
+            await db.run_sync(lambda session: write_chunk(session, chunk, datetime.now(timezone.utc)))
+            written = {row.question_id: row.next_due_at
+                       for row in (await db.execute(USER_CARDS_SQL, {"user_id": USER_ID})).all()}
+            expected = dict(zip(chunk.question_ids, chunk.next_due_at))
+            check(written[reviewed_again] == datetime(2030, 1, 1),
+                  f"card reviewed since the read keeps its due date ({written[reviewed_again]})")
+            check(all(written[q] == due for q, due in expected.items() if q != reviewed_again),
+                  "every other moved card got its new due date")
+        finally:
+            await db.rollback()
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -63,6 +63,17 @@ def run_test():
         else:
             print("❌ Failed to submit answer")
 
+    # 5. Complete Session
+    print("Completing session...")
+    resp = requests.post(f"{BASE_URL}/api/sessions/{session_id}/complete", json={
+        "user_id": user_id
+    })
+    print(f"Complete Response: {resp.text}")
+    if resp.status_code == 200:
+        print("✅ Session completed successfully")
+    else:
+        print("❌ Failed to complete session")
+
 if __name__ == "__main__":
     try:
         run_test()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Check the precomputed session queues (app/services/session_queue.py) on
+fixture data: a built queue is served, its prefix is the session a fresh
+selection would give, serving a session consumes its ids, and it stops being
+served when a card becomes due, the catalog changes or the user's queues
+are invalidated.
+Uses an in-memory cache; the fixture transaction is rolled back at the end.
+
+Usage: python test_session_queue.py   (needs DATABASE_URL in .env)
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.models.database import AsyncSessionLocal
+from app.models.models import Question, Topic, User, UserQuestionState
+from app.services.cache import MemoryCache
+from app.services.session_queue import SessionQueues
+
+USER_ID = "00000000"
+TOPIC_ID = "TEST_QUEUE"
+CLASS_LEVEL = 8
+CATALOG_VERSION = 1
+
+async def seed(db, now):
+    db.add(User(id=USER_ID, grade_level="SMP", class_level=CLASS_LEVEL))
+    db.add(Topic(id=TOPIC_ID, name="Test", short_code="TEST", grade_level="SMP", class_levels=[CLASS_LEVEL]))
+    await db.flush()
+    for i in range(30):
+        db.add(Question(
+            id=f"{TOPIC_ID}_{i:03d}", topic_id=TOPIC_ID, grade_level="SMP",
+            class_level=CLASS_LEVEL, prompt_text="?", type="mcq",
+            options=["A) 1", "B) 2"], correct_option="A",
+        ))
+    await db.flush()
+    # 0-4: due (different due times), 5-9: seen but not due, 10-29: new
+    for i in range(10):
+        due = now - timedelta(hours=10 - i) if i < 5 else now + timedelta(days=i)
+        db.add(UserQuestionState(
+            user_id=USER_ID, question_id=f"{TOPIC_ID}_{i:03d}",
+            state="review", stability=1, difficulty=5, next_due_at=due,
+        ))
+    await db.flush()
+
+def pool_for_class(class_level):
+    """Stands in for the catalog cache, which doesn't know the fixture questions"""
+    if class_level != CLASS_LEVEL:
+        return []
+    return [f"{TOPIC_ID}_{i:03d}" for i in range(30)]
+
+async def run_test():
+    print("Testing precomputed session queues...")
+    now = datetime.now(timezone.utc)
+    queues = SessionQueues(MemoryCache(), enabled=True)
+    results = []
+
+    async with AsyncSessionLocal() as db:
+        try:
+            await seed(db, now)
+
+            queue, stamp = await queues.lookup(USER_ID, TOPIC_ID, CATALOG_VERSION, now)
+            results.append(("no queue before the first build", queue is None and stamp is not None))
+
+            selection = await queues.build(
+                db, USER_ID, TOPIC_ID, stamp, CATALOG_VERSION, pool_for_class, now, limit=5
+            )
+            queue, _ = await queues.lookup(USER_ID, TOPIC_ID, CATALOG_VERSION, now)
+            results.append(("built queue is served", queue is not None))
+            if queue is None:
+                raise SystemExit("❌ built queue is not served; nothing else to check")
+
+            due = [f"{TOPIC_ID}_{i:03d}" for i in range(5)]
+            results.append(("first ids are the due cards, oldest first", queue.take(5) == due))
+            results.append(("queue is the selection", queue.question_ids == selection.question_ids))
+            results.append(("all 30 questions queued", sorted(queue.question_ids) == pool_for_class(CLASS_LEVEL)))
+            results.append(("longer sessions served from a complete queue", len(queue.take(40) or []) == 30))
+            results.append(("class level kept", queue.class_level == CLASS_LEVEL))
+            first_not_due = (now + timedelta(days=5)).timestamp()
+            results.append(("valid until the next card is due", abs(queue.valid_until - first_not_due) < 1e-3))
+
+            # Serving consumes the queue: the next start gets the rest
+            await queues.consume(USER_ID, TOPIC_ID, queue, 5)
+            rest, _ = await queues.lookup(USER_ID, TOPIC_ID, CATALOG_VERSION, now)
+            results.append(("served ids are not served again",
+                            rest is not None and rest.take(5) == selection.question_ids[5:10]))
+            results.append(("longer sessions no longer served from the rest", rest is not None and rest.take(40) is None))
+
+            # A queue built at click time is stored without the session it started
+            await queues.build(db, USER_ID, TOPIC_ID, stamp, CATALOG_VERSION, pool_for_class, now, limit=5, served=5)
+            rest, _ = await queues.lookup(USER_ID, TOPIC_ID, CATALOG_VERSION, now)
+            results.append(("click-time build stores the rest",
+                            rest is not None and due[0] not in rest.question_ids and len(rest.question_ids) == 25))
+
+            later, _ = await queues.lookup(USER_ID, TOPIC_ID, CATALOG_VERSION, now + timedelta(days=5, seconds=1))
+            results.append(("not served once a card became due", later is None))
+
+            other_catalog, _ = await queues.lookup(USER_ID, TOPIC_ID, CATALOG_VERSION + 1, now)
+            results.append(("not served for another catalog version", other_catalog is None))
+
+            await queues.invalidate(USER_ID)
+            invalidated, new_stamp = await queues.lookup(USER_ID, TOPIC_ID, CATALOG_VERSION, now)
+            results.append(("not served after invalidation", invalidated is None and new_stamp != stamp))
+
+            # A build that read its stamp before the invalidation must not be served
+            await queues.build(db, USER_ID, TOPIC_ID, stamp, CATALOG_VERSION, pool_for_class, now)
+            raced, _ = await queues.lookup(USER_ID, TOPIC_ID, CATALOG_VERSION, now)
+            results.append(("stale build not served", raced is None))
+
+            missing = await queues.build(db, "99999999x", TOPIC_ID, "x", CATALOG_VERSION, pool_for_class, now)
+            missing_queue, _ = await queues.lookup("99999999x", TOPIC_ID, CATALOG_VERSION, now)
+            results.append(("unknown user: nothing queued", missing.class_level is None and missing_queue is None))
+        finally:
+            await db.rollback()
+
+    failures = 0
+    for name, ok in results:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failures += not ok
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Check the incrementally maintained streak counters (user_streaks).
+Starts sessions for a fixture user at chosen UTC times and compares the
+dashboard totals with streaks computed in Python from Asia/Jakarta dates.
+Everything runs in one transaction that is rolled back at the end.
+
+Usage: python test_streaks.py   (needs DATABASE_URL in .env)
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.models.database import AsyncSessionLocal
+from app.models.models import Topic, User
+from app.services.session_store import insert_session_with_items
+from app.services.topic_stats import get_user_totals
+
+USER_ID = "00000001"
+TOPIC_ID = "TEST_STREAKS"
+WIB = timezone(timedelta(hours=7))  # Asia/Jakarta, no DST
+
+# Session start times in UTC. 17:00 UTC is midnight in Jakarta, so
+# 2025-03-01 18:00 UTC already counts as March 2nd.
+STARTS = [
+    datetime(2025, 3, 1, 2, 0),
+    datetime(2025, 3, 1, 9, 0),     # same Jakarta day
+    datetime(2025, 3, 1, 18, 0),    # Mar 2 in Jakarta
+    datetime(2025, 3, 3, 16, 59),   # Mar 3, one minute before Jakarta midnight
+    datetime(2025, 3, 6, 1, 0),     # gap: new run
+    datetime(2025, 3, 6, 23, 0),    # Mar 7
+]
+
+def expected_streaks(starts, now):
+    days = sorted({s.replace(tzinfo=timezone.utc).astimezone(WIB).date() for s in starts})
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous == day - timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    today = now.astimezone(WIB).date()
+    current = run if days and days[-1] >= today - timedelta(days=1) else 0
+    return current, longest
+
+async def run_test():
+    print("Testing streak counters...")
+    failures = 0
+
+    async with AsyncSessionLocal() as db:
+        try:
+            db.add(User(id=USER_ID, grade_level="SMP", class_level=8))
+            db.add(Topic(id=TOPIC_ID, name="Test", short_code="TEST", grade_level="SMP", class_levels=[8]))
+            await db.flush()
+
+            for i, start in enumerate(STARTS, 1):
+                await insert_session_with_items(
+                    db,
+                    session_id=f"test-streak-{i}",
+                    user_id=USER_ID,
+                    topic_id=TOPIC_ID,
+                    class_level=8,
+                    started_at=start.replace(tzinfo=timezone.utc),
+                    question_ids=[],
+                )
+                for now in (start + timedelta(hours=1), start + timedelta(days=1), start + timedelta(days=3)):
+                    now = now.replace(tzinfo=timezone.utc)
+                    totals = await get_user_totals(db, USER_ID, now)
+                    got = (totals.current_streak, totals.longest_streak)
+                    want = expected_streaks(STARTS[:i], now)
+                    if got != want:
+                        failures += 1
+                        print(f"❌ after {start} UTC, now={now:%Y-%m-%d %H:%M}: got {got}, expected {want}")
+            if not failures:
+                print(f"✅ {len(STARTS)} sessions: current/longest streak match at every step")
+        finally:
+            await db.rollback()
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for user ID allocation.
+
+1. Checks the ID permutation offline: a range of sequence values maps to
+   distinct 8-digit IDs that do not look sequential.
+2. Creates --users users (default 100,000) from several processes at once,
+   each running many concurrent signups through the same code path as
+   POST /api/users, then checks there were zero duplicate IDs.
+   The test users are deleted at the end (the sequence values stay used).
+
+Usage: python test_user_id_concurrency.py [--users 100000] [--processes 4] [--concurrency 12]
+       (needs DATABASE_URL in .env and migrations applied)
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+PERMUTATION_SAMPLE = 200_000
+
+def check_permutation():
+    from app.services.user_id_service import ID_SPACE, user_id_for
+
+    key = b"test-key"
+    values = list(range(PERMUTATION_SAMPLE)) + list(range(ID_SPACE - 1000, ID_SPACE))
+    ids = [user_id_for(v, key) for v in values]
+    checks = [
+        ("distinct", len(set(ids)) == len(ids)),
+        ("8 digits", all(len(i) == 8 and i[0] != "0" for i in ids)),
+        ("not sequential", sum(int(b) == int(a) + 1 for a, b in zip(ids, ids[1:])) < 10),
+        ("other key differs", user_id_for(0, b"other-key") != ids[0] or user_id_for(1, b"other-key") != ids[1]),
+    ]
+    failed = [name for name, ok in checks if not ok]
+    if failed:
+        print(f"❌ permutation: {', '.join(failed)}")
+    else:
+        print(f"✅ permutation: {len(ids)} sequence values -> distinct, non-sequential 8-digit IDs")
+    return not failed
+
+async def _create_users(count, concurrency):
+    from app.models.database import AsyncSessionLocal, async_engine
+    from app.services.user_id_service import create_user_with_new_id
+
+    ids = []
+    remaining = count
+
+    async def worker():
+        nonlocal remaining
+        async with AsyncSessionLocal() as db:
+            while remaining > 0:
+                remaining -= 1
+                user = await create_user_with_new_id(db, "SMP", 7)
+                await db.commit()
+                ids.append(user.id)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await async_engine.dispose()
+    return ids
+
+def _process_main(args):
+    count, concurrency = args
+    return asyncio.run(_create_users(count, concurrency))
+
+async def _count_and_delete(ids):
+    from sqlalchemy import text
+    from app.models.database import AsyncSessionLocal, async_engine
+
+    async with AsyncSessionLocal() as db:
+        found = await db.scalar(
+            text("SELECT count(*) FROM users WHERE id = ANY(CAST(:ids AS text[]))"), {"ids": ids}
+        )
+        await db.execute(text("DELETE FROM users WHERE id = ANY(CAST(:ids AS text[]))"), {"ids": ids})
+        await db.commit()
+    await async_engine.dispose()
+    return found
+
+def run_test():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=12, help="concurrent signups per process")
+    args = parser.parse_args()
+
+    print("Testing user ID allocation...")
+    failures = 0 if check_permutation() else 1
+
+    per_process = [args.users // args.processes] * args.processes
+    per_process[0] += args.users - sum(per_process)
+
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+        results = pool.map(_process_main, [(n, args.concurrency) for n in per_process])
+    elapsed = time.perf_counter() - start
+
+    ids = [user_id for batch in results for user_id in batch]
+    duplicates = len(ids) - len(set(ids))
+    found = asyncio.run(_count_and_delete(ids))
+
+    print(f"   {len(ids)} users from {args.processes} processes x {args.concurrency} concurrent signups "
+          f"in {elapsed:.1f}s ({len(ids) / elapsed:,.0f}/s)")
+    if duplicates == 0 and found == len(ids) == args.users:
+        print("✅ concurrent signups: zero collisions")
+    else:
+        failures += 1
+        print(f"❌ concurrent signups: {duplicates} duplicate IDs, {found}/{args.users} users in the database")
+
+    print("\nAll checks passed" if not failures else f"\n{failures} check(s) failed")
+
+if __name__ == "__main__":
+    run_test()